@@ -1,34 +1,278 @@
 # -*- coding: utf-8 -*-
 import os
+import re
 import json
+import time
+import queue
+import atexit
+import joblib
+import threading
 import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from graphlib import TopologicalSorter
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
-from sqlalchemy import create_engine, Column, Integer, String, Text, Boolean, DateTime, Float, ForeignKey
+from sqlalchemy import create_engine, select, bindparam, update, Column, Integer, String, Text, Boolean, DateTime, Float, ForeignKey, Index, UniqueConstraint, extract, func, insert, delete, text
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship, sessionmaker
+from sqlalchemy.orm import relationship, selectinload, sessionmaker
+
+from occurrence_forecast import SeasonalRateModel
+from forecast_backtest import rolling_origin_backtest
 
 Base = declarative_base()
 
+class StaleWatermarkError(Exception):
+    """A marca d'água da análise foi avançada por outra execução durante esta"""
+
+# Períodos do dia (hora inicial, hora final); a noite cruza a meia-noite
+DAY_PERIODS = {'manhã': (6, 12), 'tarde': (12, 18), 'noite': (18, 6)}
+
+# Horizonte das previsões por dimensão do padrão: (quantidade, intervalo em dias, queda da probabilidade por passo)
+PREDICTION_HORIZONS = {
+    'weekday': (4, 7, 0.1),
+    'hour': (7, 1, 0.05),
+    'unit': (30, 1, 0.02),
+    'type': (14, 1, 0.03)
+}
+# Categorias de ocorrência e palavras-chave; a primeira categoria com alguma palavra no texto vence
+OCCURRENCE_CATEGORIES = {
+    'barulho': ['barulho', 'som', 'ruído', 'música', 'festa'],
+    'obras': ['obra', 'reforma', 'construção', 'manutenção'],
+    'animais': ['animal', 'cachorro', 'gato', 'pet', 'latido'],
+    'estacionamento': ['estacionamento', 'vaga', 'garagem', 'veículo', 'carro'],
+    'áreas_comuns': ['área comum', 'piscina', 'salão', 'playground', 'academia'],
+    'segurança': ['segurança', 'incêndio', 'emergência', 'acidente'],
+    'lixo': ['lixo', 'resíduo', 'descarte', 'sujeira']
+}
+# Categorias do modelo de taxas sazonais (índice = posição), histórico usado no ajuste e meia-vida dos pesos (dias)
+FORECAST_CATEGORIES = list(OCCURRENCE_CATEGORIES) + ['outros']
+FORECAST_TRAINING_DAYS = 365
+FORECAST_HALF_LIFE_DAYS = 180
+# Tentativas da análise incremental quando outra execução avança a marca d'água ao mesmo tempo
+ANALYSIS_MAX_ATTEMPTS = 3
+# Características usadas pelo modelo de previsão de tipo de ocorrência, na ordem das colunas
+MODEL_FEATURES = ['weekday', 'month', 'hour', 'unit_number']
+# Intervalo mínimo entre verificações de nova versão do modelo (segundos)
+MODEL_RECHECK_SECONDS = 60
+# Ocorrências novas necessárias para retreinar o modelo, e árvores acrescentadas no treino incremental
+RETRAIN_MIN_NEW_ROWS = 500
+WARM_START_TREES = 20
+# Modelos carregados neste processo, por pasta: {'version', 'model', 'scaler', 'checked_at'}
+_LOADED_MODELS = {}
+# Etapas do pipeline de IA e suas dependências (cada etapa só roda se as anteriores tiverem sucesso)
+PIPELINE_STAGES = {
+    'analyze': [],
+    'train': [],
+    'lifecycle': [],
+    'predict': ['analyze'],
+    'measures': ['predict', 'lifecycle'],
+    'alerts': ['predict', 'lifecycle'],
+    'rules': ['analyze', 'predict', 'lifecycle']
+}
+# Execução periódica, intervalo mínimo entre execuções disparadas por ocorrências novas e verificação (segundos)
+PIPELINE_INTERVAL_SECONDS = 6 * 3600
+PIPELINE_MIN_GAP_SECONDS = 300
+PIPELINE_CHECK_SECONDS = 60
+# Dias após o fim do período previsto em que previsões encerradas são arquivadas, e previsões por lote de arquivamento
+PREDICTION_RETENTION_DAYS = 180
+ARCHIVE_BATCH_SIZE = 5000
+# Validade máxima dos dados do dashboard em cache (escritas de outros processos fora do pipeline)
+DASHBOARD_CACHE_SECONDS = 300
+PREDICTION_TYPES = {'weekday': 'sazonal', 'month': 'sazonal', 'hour': 'sazonal', 'unit': 'localização', 'type': 'tipo'}
+
+# Catálogo de medidas preventivas por tipo
+PREVENTIVE_CATALOG = {
+    'barulho': [
+        {
+            'title': 'Comunicado sobre horários de silêncio',
+            'description': 'Enviar comunicado relembrando os horários de silêncio conforme regimento interno.',
+            'effectiveness': 7,
+            'difficulty': 2
+        },
+        {
+            'title': 'Inspeção acústica preventiva',
+            'description': 'Realizar inspeção acústica nas áreas comuns e unidades com histórico de reclamações.',
+            'effectiveness': 8,
+            'difficulty': 6
+        }
+    ],
+    'obras': [
+        {
+            'title': 'Comunicado sobre horários de obras',
+            'description': 'Enviar comunicado relembrando os horários permitidos para obras conforme regimento interno.',
+            'effectiveness': 7,
+            'difficulty': 2
+        },
+        {
+            'title': 'Vistoria preventiva',
+            'description': 'Realizar vistoria nas unidades com obras em andamento para verificar conformidade.',
+            'effectiveness': 9,
+            'difficulty': 7
+        }
+    ],
+    'animais': [
+        {
+            'title': 'Comunicado sobre regras para animais',
+            'description': 'Enviar comunicado relembrando as regras para criação de animais no condomínio.',
+            'effectiveness': 6,
+            'difficulty': 2
+        },
+        {
+            'title': 'Campanha de conscientização',
+            'description': 'Realizar campanha de conscientização sobre cuidados com animais de estimação em condomínios.',
+            'effectiveness': 8,
+            'difficulty': 5
+        }
+    ],
+    'estacionamento': [
+        {
+            'title': 'Verificação de vagas',
+            'description': 'Realizar verificação das vagas de estacionamento para identificar uso irregular.',
+            'effectiveness': 8,
+            'difficulty': 4
+        },
+        {
+            'title': 'Comunicado sobre regras de estacionamento',
+            'description': 'Enviar comunicado relembrando as regras de uso das vagas de estacionamento.',
+            'effectiveness': 6,
+            'difficulty': 2
+        }
+    ],
+    'áreas_comuns': [
+        {
+            'title': 'Inspeção das áreas comuns',
+            'description': 'Realizar inspeção preventiva nas áreas comuns para identificar possíveis problemas.',
+            'effectiveness': 8,
+            'difficulty': 5
+        },
+        {
+            'title': 'Comunicado sobre uso de áreas comuns',
+            'description': 'Enviar comunicado relembrando as regras de uso das áreas comuns do condomínio.',
+            'effectiveness': 7,
+            'difficulty': 2
+        }
+    ],
+    'segurança': [
+        {
+            'title': 'Verificação de equipamentos de segurança',
+            'description': 'Realizar verificação dos equipamentos de segurança (câmeras, alarmes, etc.).',
+            'effectiveness': 9,
+            'difficulty': 6
+        },
+        {
+            'title': 'Comunicado sobre procedimentos de segurança',
+            'description': 'Enviar comunicado sobre procedimentos de segurança e prevenção de acidentes.',
+            'effectiveness': 7,
+            'difficulty': 3
+        }
+    ],
+    'lixo': [
+        {
+            'title': 'Inspeção das áreas de descarte',
+            'description': 'Realizar inspeção preventiva nas áreas de descarte de lixo e recicláveis.',
+            'effectiveness': 8,
+            'difficulty': 4
+        },
+        {
+            'title': 'Comunicado sobre descarte correto',
+            'description': 'Enviar comunicado sobre procedimentos corretos para descarte de lixo e recicláveis.',
+            'effectiveness': 7,
+            'difficulty': 2
+        }
+    ],
+    'outros': [
+        {
+            'title': 'Reunião preventiva com síndico',
+            'description': 'Realizar reunião com síndico para discutir medidas preventivas gerais.',
+            'effectiveness': 8,
+            'difficulty': 5
+        },
+        {
+            'title': 'Comunicado geral sobre regimento',
+            'description': 'Enviar comunicado geral relembrando pontos importantes do regimento interno.',
+            'effectiveness': 6,
+            'difficulty': 3
+        }
+    ]
+}
+
+# Medidas gerais para todos os tipos de ocorrência
+GENERAL_MEASURES = [
+    {
+        'title': 'Reforço na comunicação do regimento',
+        'description': 'Enviar cópia do regimento interno com destaque para os artigos mais relevantes.',
+        'effectiveness': 6,
+        'difficulty': 3
+    },
+    {
+        'title': 'Presença intensificada de funcionários',
+        'description': 'Aumentar a presença de funcionários nas áreas e horários com maior probabilidade de ocorrências.',
+        'effectiveness': 7,
+        'difficulty': 6
+    }
+]
+
+
 # Modelos para o sistema de IA e advertências automatizadas
 class OccurrencePattern(Base):
     __tablename__ = 'occurrence_pattern'
+    __table_args__ = (
+        UniqueConstraint('pattern_type', 'dimension', 'dimension_value', name='uq_occurrence_pattern'),
+    )
     
     id = Column(Integer, primary_key=True)
     pattern_type = Column(String(50), nullable=False)  # sazonal, localização, tipo
+    dimension = Column(String(20))  # weekday, month, hour, unit, type
+    dimension_value = Column(String(100))
+    # Parâmetros tipados do padrão (preenchidos conforme a dimensão)
+    weekday = Column(Integer)  # 0 = segunda-feira
+    month = Column(Integer)  # 1-12
+    hour_start = Column(Integer)  # Período do dia; hour_end < hour_start cruza a meia-noite
+    hour_end = Column(Integer)
+    unit = Column(String(20))
+    occurrence_type = Column(String(100))
     description = Column(Text, nullable=False)
     confidence = Column(Float, default=0.0)
+    version = Column(Integer, default=1)  # Incrementada a cada mudança de descrição/confiança
+    predicted_version = Column(Integer)  # Versão para a qual as previsões atuais foram geradas
+    is_active = Column(Boolean, default=True)
     discovery_date = Column(DateTime, default=datetime.utcnow)
     last_updated = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relacionamentos
     predictions = relationship("OccurrencePrediction", back_populates="pattern", cascade="all, delete-orphan")
+    history = relationship("OccurrencePatternHistory", back_populates="pattern", cascade="all, delete-orphan")
+
+class OccurrencePatternHistory(Base):
+    """Versões anteriores de um padrão (confiança e descrição a cada mudança)"""
+    __tablename__ = 'occurrence_pattern_history'
+    
+    id = Column(Integer, primary_key=True)
+    pattern_id = Column(Integer, ForeignKey('occurrence_pattern.id'), nullable=False, index=True)
+    version = Column(Integer, nullable=False)
+    description = Column(Text, nullable=False)
+    confidence = Column(Float, default=0.0)
+    is_active = Column(Boolean, default=True)
+    recorded_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Relacionamentos
+    pattern = relationship("OccurrencePattern", back_populates="history")
 
 class OccurrencePrediction(Base):
     __tablename__ = 'occurrence_prediction'
+    __table_args__ = (
+        # Contagem por status do dashboard (GROUP BY status) só com o índice, sem ler as linhas
+        Index('ix_occurrence_prediction_status', 'status'),
+        # Índices parciais: só as previsões ativas (o conjunto de trabalho das etapas do pipeline) são indexadas;
+        # o status já está fixado pelo WHERE do índice, então basta a data
+        Index('ix_occurrence_prediction_active_start', 'predicted_date_start',
+              postgresql_where=text("status = 'ativa'"), sqlite_where=text("status = 'ativa'")),
+        Index('ix_occurrence_prediction_active_end', 'predicted_date_end',
+              postgresql_where=text("status = 'ativa'"), sqlite_where=text("status = 'ativa'")),
+    )
     
     id = Column(Integer, primary_key=True)
     pattern_id = Column(Integer, ForeignKey('occurrence_pattern.id'), nullable=False)
@@ -47,6 +291,22 @@ class OccurrencePrediction(Base):
     preventive_alerts = relationship("PreventiveAlert", back_populates="prediction")
     measure_mappings = relationship("PredictionMeasureMapping", back_populates="prediction")
 
+class OccurrencePredictionArchive(Base):
+    """Previsões antigas retiradas de occurrence_prediction pelo ciclo de vida das previsões"""
+    __tablename__ = 'occurrence_prediction_archive'
+    
+    id = Column(Integer, primary_key=True, autoincrement=False)  # Mesmo id da previsão original
+    pattern_id = Column(Integer, nullable=False)
+    prediction_type = Column(String(50), nullable=False)
+    predicted_date_start = Column(DateTime)
+    predicted_date_end = Column(DateTime)
+    location = Column(String(100))
+    occurrence_type = Column(String(100))
+    probability = Column(Float, default=0.0)
+    status = Column(String(20))
+    created_at = Column(DateTime)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
 class PreventiveMeasure(Base):
     __tablename__ = 'preventive_measure'
     
@@ -63,6 +323,9 @@ class PreventiveMeasure(Base):
 
 class PredictionMeasureMapping(Base):
     __tablename__ = 'prediction_measure_mapping'
+    __table_args__ = (
+        UniqueConstraint('prediction_id', 'measure_id', name='uq_prediction_measure'),
+    )
     
     id = Column(Integer, primary_key=True)
     prediction_id = Column(Integer, ForeignKey('occurrence_prediction.id'), nullable=False)
@@ -78,7 +341,8 @@ class PreventiveAlert(Base):
     __tablename__ = 'preventive_alert'
     
     id = Column(Integer, primary_key=True)
-    prediction_id = Column(Integer, ForeignKey('occurrence_prediction.id'), nullable=False)
+    # Um alerta por previsão: execuções concorrentes (rota manual e pipeline) não duplicam alertas
+    prediction_id = Column(Integer, ForeignKey('occurrence_prediction.id'), nullable=False, index=True, unique=True)
     alert_level = Column(String(20), nullable=False)  # baixo, médio, alto
     title = Column(String(255), nullable=False)
     message = Column(Text, nullable=False)
@@ -110,10 +374,16 @@ class AutomatedWarningRule(Base):
 
 class AutomatedWarning(Base):
     __tablename__ = 'automated_warning'
+    __table_args__ = (
+        # Cada regra gera no máximo uma advertência por previsão e por padrão
+        UniqueConstraint('rule_id', 'prediction_id', name='uq_automated_warning_prediction'),
+        UniqueConstraint('rule_id', 'pattern_id', name='uq_automated_warning_pattern'),
+    )
     
     id = Column(Integer, primary_key=True)
     rule_id = Column(Integer, ForeignKey('automated_warning_rule.id'), nullable=False)
     prediction_id = Column(Integer, ForeignKey('occurrence_prediction.id'))
+    pattern_id = Column(Integer, ForeignKey('occurrence_pattern.id'))
     generation_date = Column(DateTime, default=datetime.utcnow)
     status = Column(String(20), default='pendente')  # pendente, aprovada, enviada, cancelada
     approval_user_id = Column(Integer)  # Referência ao usuário
@@ -126,49 +396,188 @@ class AutomatedWarning(Base):
     rule = relationship("AutomatedWarningRule", back_populates="automated_warnings")
     prediction = relationship("OccurrencePrediction", back_populates="automated_warnings")
 
+class OccurrenceAggregate(Base):
+    """Contagem acumulada de ocorrências por dimensão (dia da semana, mês, hora, unidade, tipo)"""
+    __tablename__ = 'occurrence_aggregate'
+    __table_args__ = (
+        UniqueConstraint('dimension', 'value', name='uq_occurrence_aggregate'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    dimension = Column(String(20), nullable=False)  # weekday, month, hour, unit, type
+    value = Column(String(100), nullable=False)
+    count = Column(Integer, default=0)
+    last_updated = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class AnalysisWatermark(Base):
+    """Última ocorrência já processada por cada análise incremental"""
+    __tablename__ = 'analysis_watermark'
+    
+    id = Column(Integer, primary_key=True)
+    name = Column(String(50), unique=True, nullable=False)
+    last_occurrence_id = Column(Integer, default=0)
+    last_updated = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class PredictionModelVersion(Base):
+    """Versão treinada do modelo de previsão, serializada em disco"""
+    __tablename__ = 'prediction_model_version'
+    
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, unique=True, nullable=False)
+    file_name = Column(String(255), nullable=False)
+    training_watermark = Column(Integer)  # Maior id de ocorrência usado no treino (nulo para dados fornecidos)
+    training_rows = Column(Integer, default=0)
+    accuracy = Column(Float)
+    metrics = Column(Text)  # JSON
+    base_version = Column(Integer)  # Versão de origem de um treino incremental
+    is_active = Column(Boolean, default=True)
+    trained_at = Column(DateTime, default=datetime.utcnow)
+
+class PipelineRun(Base):
+    """Execução do pipeline de IA (análise, treino, previsões, medidas, alertas e regras)"""
+    __tablename__ = 'ai_pipeline_run'
+    __table_args__ = (
+        # No máximo uma execução em andamento: o INSERT da segunda falha, mesmo entre processos
+        Index('uq_ai_pipeline_run_executando', 'status', unique=True,
+              postgresql_where=text("status = 'executando'"), sqlite_where=text("status = 'executando'")),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    trigger = Column(String(20), nullable=False)  # agendado, novos_dados, manual
+    status = Column(String(20), default='executando')  # executando, concluida, falhou
+    last_occurrence_id = Column(Integer, default=0)  # Maior id de ocorrência existente no início da execução
+    started_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime)
+    duration_ms = Column(Integer)
+    
+    stages = relationship("PipelineStageRun", back_populates="run", order_by="PipelineStageRun.id")
+
+class PipelineStageRun(Base):
+    """Resultado de uma etapa em uma execução do pipeline"""
+    __tablename__ = 'ai_pipeline_stage_run'
+    
+    id = Column(Integer, primary_key=True)
+    run_id = Column(Integer, ForeignKey('ai_pipeline_run.id'), nullable=False, index=True)
+    stage = Column(String(20), nullable=False)
+    status = Column(String(20), nullable=False)  # concluida, falhou, ignorada
+    row_count = Column(Integer, default=0)
+    duration_ms = Column(Integer, default=0)
+    error = Column(Text)
+    started_at = Column(DateTime, default=datetime.utcnow)
+    
+    run = relationship("PipelineRun", back_populates="stages")
+
+# Versão dos dados do dashboard de IA neste processo, incrementada a cada escrita do pipeline ou das rotas de IA
+AI_DASHBOARD_STATE = {'version': 0}
+
+def _bump_ai_dashboard_version():
+    AI_DASHBOARD_STATE['version'] += 1
+
 # Classe para gerenciar o sistema de IA e advertências automatizadas
 class AIWarningManager:
-    def __init__(self, db_session):
+    def __init__(self, db_session, models_folder=None):
         self.db_session = db_session
-        self.model = None
-        self.scaler = None
+        self.models_folder = models_folder or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'modelos_ia')
+        self._dashboard_cache = None
+        self._forecast = None
+    
+    @property
+    def model(self):
+        """Modelo da versão ativa, carregado sob demanda"""
+        return self._loaded_model()['model']
+    
+    @property
+    def scaler(self):
+        """Normalizador da versão ativa, carregado sob demanda"""
+        return self._loaded_model()['scaler']
+    
+    def _loaded_model(self):
+        """Versão ativa do modelo neste processo; o banco é consultado no máximo a cada MODEL_RECHECK_SECONDS"""
+        now = time.monotonic()
+        cached = _LOADED_MODELS.get(self.models_folder)
+        if cached and now - cached['checked_at'] < MODEL_RECHECK_SECONDS:
+            return cached
+        
+        current = self.db_session.query(PredictionModelVersion).filter_by(is_active=True).order_by(
+            PredictionModelVersion.version.desc()).first()
+        if cached and current and cached['version'] == current.version:
+            cached['checked_at'] = now
+            return cached
+        
+        entry = {'version': None, 'model': None, 'scaler': None, 'checked_at': now}
+        if current is not None:
+            try:
+                # Arquivo sem compressão: os arrays das árvores são mapeados em memória e compartilhados entre processos
+                stored = joblib.load(os.path.join(self.models_folder, current.file_name), mmap_mode='r')
+                entry.update(version=current.version, model=stored['model'], scaler=stored['scaler'])
+            except (OSError, KeyError, ValueError) as e:
+                print(f"Erro ao carregar o modelo v{current.version}: {e}")
+        _LOADED_MODELS[self.models_folder] = entry
+        return entry
+    
+    def _save_model_version(self, model, scaler, training_watermark, training_rows, metrics, base_version=None):
+        """Serializa o modelo em disco e registra a nova versão como ativa"""
+        last_version = self.db_session.query(func.max(PredictionModelVersion.version)).scalar() or 0
+        version = last_version + 1
+        file_name = f"modelo_previsao_v{version}.joblib"
+        path = os.path.join(self.models_folder, file_name)
+        os.makedirs(self.models_folder, exist_ok=True)
+        # Gravar em arquivo temporário e renomear: nenhum processo lê um arquivo pela metade
+        joblib.dump({'model': model, 'scaler': scaler, 'features': MODEL_FEATURES}, path + '.tmp')
+        os.replace(path + '.tmp', path)
+        
+        try:
+            self.db_session.query(PredictionModelVersion).filter_by(is_active=True).update(
+                {'is_active': False}, synchronize_session=False)
+            record = PredictionModelVersion(
+                version=version,
+                file_name=file_name,
+                training_watermark=training_watermark,
+                training_rows=training_rows,
+                accuracy=metrics.get('accuracy'),
+                metrics=json.dumps(metrics),
+                base_version=base_version,
+                is_active=True
+            )
+            self.db_session.add(record)
+            self.db_session.commit()
+        except Exception:
+            self.db_session.rollback()
+            os.remove(path)
+            raise
+        
+        _LOADED_MODELS[self.models_folder] = {'version': version, 'model': model, 'scaler': scaler,
+                                              'checked_at': time.monotonic()}
+        return record
     
-    def train_prediction_model(self, historical_data=None):
-        """Treina o modelo de previsão com dados históricos"""
+    def train_prediction_model(self, historical_data=None, force=False):
+        """Treina o modelo de previsão com dados históricos e salva uma nova versão.
+        
+        Sem dados fornecidos, só retreina quando chegam RETRAIN_MIN_NEW_ROWS ocorrências novas (ou com force=True);
+        se as ocorrências novas cobrem as mesmas categorias do modelo atual, apenas acrescenta árvores (warm start).
+        """
+        training_watermark = None
         # Se não forem fornecidos dados históricos, buscar do banco de dados
         if historical_data is None:
-            # Aqui seria a lógica para buscar ocorrências históricas
-            # Por simplicidade, vamos criar dados de exemplo
             from models import Occurrence
-            occurrences = self.db_session.query(Occurrence).all()
             
-            if not occurrences:
+            training_watermark = self.db_session.query(func.max(Occurrence.id)).scalar() or 0
+            current = self.db_session.query(PredictionModelVersion).filter_by(is_active=True).order_by(
+                PredictionModelVersion.version.desc()).first()
+            if current is not None and current.training_watermark is not None and not force:
+                new_rows = self.db_session.query(func.count(Occurrence.id)).filter(
+                    Occurrence.id > current.training_watermark, Occurrence.id <= training_watermark).scalar()
+                if new_rows < RETRAIN_MIN_NEW_ROWS:
+                    print(f"Modelo v{current.version} atualizado ({new_rows} ocorrências novas); treino dispensado")
+                    return True
+                new_data = self._load_training_data(current.training_watermark, training_watermark)
+                if self._warm_start_model(current, new_data, training_watermark):
+                    return True
+            
+            historical_data = self._load_training_data(0, training_watermark)
+            if historical_data.empty:
                 print("Sem dados históricos suficientes para treinar o modelo")
                 return False
-            
-            # Preparar dados para treinamento
-            data = []
-            for occurrence in occurrences:
-                # Extrair características relevantes
-                weekday = occurrence.created_at.weekday()
-                month = occurrence.created_at.month
-                hour = occurrence.created_at.hour
-                
-                # Extrair informações da unidade
-                unit_number = int(occurrence.unit_number) if occurrence.unit_number and occurrence.unit_number.isdigit() else 0
-                
-                # Extrair tipo de ocorrência (simplificado)
-                occurrence_type = self._categorize_occurrence_type(occurrence.title, occurrence.description)
-                
-                data.append({
-                    'weekday': weekday,
-                    'month': month,
-                    'hour': hour,
-                    'unit_number': unit_number,
-                    'occurrence_type': occurrence_type
-                })
-            
-            historical_data = pd.DataFrame(data)
         
         # Verificar se há dados suficientes
         if len(historical_data) < 10:  # Número mínimo arbitrário
@@ -176,84 +585,297 @@ class AIWarningManager:
             return False
         
         # Preparar features e target
-        X = historical_data.drop('occurrence_type', axis=1)
+        X = historical_data[MODEL_FEATURES]
         y = historical_data['occurrence_type']
         
         # Normalizar dados
-        self.scaler = StandardScaler()
-        X_scaled = self.scaler.fit_transform(X)
+        scaler = StandardScaler()
+        X_scaled = scaler.fit_transform(X)
         
         # Dividir em treino e teste
         X_train, X_test, y_train, y_test = train_test_split(X_scaled, y, test_size=0.2, random_state=42)
         
         # Treinar modelo
-        self.model = RandomForestClassifier(n_estimators=100, random_state=42)
-        self.model.fit(X_train, y_train)
+        model = RandomForestClassifier(n_estimators=100, random_state=42)
+        model.fit(X_train, y_train)
         
         # Avaliar modelo
-        accuracy = self.model.score(X_test, y_test)
+        accuracy = model.score(X_test, y_test)
         print(f"Modelo treinado com acurácia: {accuracy:.2f}")
         
+        self._save_model_version(model, scaler, training_watermark, len(historical_data), {
+            'accuracy': accuracy,
+            'train_rows': len(X_train),
+            'test_rows': len(X_test),
+            'classes': [str(label) for label in model.classes_]
+        })
         return True
     
+    def _warm_start_model(self, current, new_data, training_watermark):
+        """Acrescenta ao modelo atual árvores treinadas só com as ocorrências novas.
+        
+        Retorna False quando o treino incremental não se aplica (categorias diferentes das do modelo atual).
+        """
+        try:
+            # Cópia em memória (sem mapeamento): o modelo compartilhado pelo processo não é alterado
+            stored = joblib.load(os.path.join(self.models_folder, current.file_name))
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Erro ao carregar o modelo v{current.version}: {e}")
+            return False
+        model, scaler = stored['model'], stored['scaler']
+        # As árvores existentes codificam as categorias pela posição em classes_: o conjunto precisa ser o mesmo
+        if len(new_data) < 10 or set(new_data['occurrence_type']) != set(model.classes_):
+            return False
+        
+        # As árvores novas usam o mesmo normalizador das antigas
+        X_scaled = scaler.transform(new_data[MODEL_FEATURES])
+        X_train, X_test, y_train, y_test = train_test_split(
+            X_scaled, new_data['occurrence_type'], test_size=0.2, random_state=42)
+        if set(y_train) != set(model.classes_):
+            return False
+        model.set_params(warm_start=True, n_estimators=model.n_estimators + WARM_START_TREES)
+        model.fit(X_train, y_train)
+        
+        accuracy = model.score(X_test, y_test)
+        print(f"Modelo v{current.version} atualizado com {len(new_data)} ocorrências novas, acurácia: {accuracy:.2f}")
+        
+        self._save_model_version(model, scaler, training_watermark, (current.training_rows or 0) + len(new_data), {
+            'accuracy': accuracy,
+            'train_rows': len(X_train),
+            'test_rows': len(X_test),
+            'classes': [str(label) for label in model.classes_],
+            'warm_start': True
+        }, base_version=current.version)
+        return True
+    
+    def _load_training_data(self, after_id=0, upto_id=None):
+        """Carrega as características de treino com uma única consulta, direto para um DataFrame colunar"""
+        from models import Occurrence
+        
+        query = select(Occurrence.created_at, Occurrence.unit_number, Occurrence.title, Occurrence.description).where(
+            Occurrence.id > after_id)
+        if upto_id is not None:
+            query = query.where(Occurrence.id <= upto_id)
+        frame = pd.read_sql(query, self.db_session.connection())
+        created_at = pd.to_datetime(frame['created_at'])
+        unit_number = frame['unit_number'].fillna('').astype(str)
+        return pd.DataFrame({
+            'weekday': created_at.dt.weekday,
+            'month': created_at.dt.month,
+            'hour': created_at.dt.hour,
+            'unit_number': pd.to_numeric(unit_number.where(unit_number.str.isdigit(), '0')).astype('int64'),
+            'occurrence_type': self._categorize_occurrence_types(frame['title'], frame['description'])
+        })
+    
     def _categorize_occurrence_type(self, title, description):
         """Categoriza o tipo de ocorrência com base no título e descrição"""
         text = (title + " " + description).lower()
         
-        categories = {
-            'barulho': ['barulho', 'som', 'ruído', 'música', 'festa'],
-            'obras': ['obra', 'reforma', 'construção', 'manutenção'],
-            'animais': ['animal', 'cachorro', 'gato', 'pet', 'latido'],
-            'estacionamento': ['estacionamento', 'vaga', 'garagem', 'veículo', 'carro'],
-            'áreas_comuns': ['área comum', 'piscina', 'salão', 'playground', 'academia'],
-            'segurança': ['segurança', 'incêndio', 'emergência', 'acidente'],
-            'lixo': ['lixo', 'resíduo', 'descarte', 'sujeira']
-        }
-        
-        for category, keywords in categories.items():
+        for category, keywords in OCCURRENCE_CATEGORIES.items():
             if any(keyword in text for keyword in keywords):
                 return category
         
         return 'outros'
     
-    def analyze_patterns(self):
-        """Analisa os dados históricos para identificar padrões"""
+    def _categorize_occurrence_types(self, titles, descriptions):
+        """Versão vetorizada de _categorize_occurrence_type para colunas (Series) de títulos e descrições"""
+        text = (titles.fillna('') + " " + descriptions.fillna('')).str.lower()
+        categories = np.full(len(text), 'outros', dtype=object)
+        pending = np.arange(len(text))
+        for category, keywords in OCCURRENCE_CATEGORIES.items():
+            # Só os textos ainda sem categoria são testados, preservando a precedência da ordem das categorias
+            matched = text.iloc[pending].str.contains('|'.join(map(re.escape, keywords)), regex=True).to_numpy(dtype=bool)
+            categories[pending[matched]] = category
+            pending = pending[~matched]
+            if not len(pending):
+                break
+        return pd.Series(categories, index=text.index)
+    
+    def _load_forecast_events(self, since, upto_id=None):
+        """Ocorrências desde a data informada como arrays (unidade, índice da categoria, horário), numa única consulta"""
         from models import Occurrence
-        occurrences = self.db_session.query(Occurrence).all()
         
-        if not occurrences:
-            return []
+        query = select(Occurrence.created_at, Occurrence.unit_number, Occurrence.title, Occurrence.description).where(
+            Occurrence.created_at >= since, Occurrence.unit_number.isnot(None), Occurrence.unit_number != '')
+        if upto_id is not None:
+            query = query.where(Occurrence.id <= upto_id)
+        frame = pd.read_sql(query, self.db_session.connection())
+        units = frame['unit_number'].astype(str).to_numpy()
+        categories = self._categorize_occurrence_types(frame['title'], frame['description'])
+        category_index = pd.Categorical(categories, categories=FORECAST_CATEGORIES).codes.astype(np.int64)
+        timestamps = pd.to_datetime(frame['created_at']).to_numpy().astype('datetime64[m]')
+        return units, category_index, timestamps
+    
+    def _occurrence_forecast(self, today=None):
+        """Modelo de taxas sazonais ajustado ao último ano; reajustado só quando há ocorrências novas ou muda o dia"""
+        from models import Occurrence
         
-        # Análise de padrões sazonais
-        weekday_counts = {}
-        month_counts = {}
-        hour_counts = {}
-        location_counts = {}
-        type_counts = {}
-        
-        for occurrence in occurrences:
-            # Contagem por dia da semana
-            weekday = occurrence.created_at.weekday()
-            weekday_counts[weekday] = weekday_counts.get(weekday, 0) + 1
-            
-            # Contagem por mês
-            month = occurrence.created_at.month
-            month_counts[month] = month_counts.get(month, 0) + 1
-            
-            # Contagem por hora
-            hour = occurrence.created_at.hour
-            hour_counts[hour] = hour_counts.get(hour, 0) + 1
-            
-            # Contagem por localização (unidade)
-            location = occurrence.unit_number
-            location_counts[location] = location_counts.get(location, 0) + 1
+        today = np.datetime64(today or datetime.utcnow().date(), 'D')
+        watermark = self.db_session.query(func.max(Occurrence.id)).scalar()
+        if not watermark:
+            return None
+        if self._forecast and self._forecast['key'] == (watermark, today):
+            return self._forecast
+        
+        start = today - FORECAST_TRAINING_DAYS
+        units, category_index, timestamps = self._load_forecast_events(start.astype(datetime), watermark)
+        if not units.size:
+            return None
+        unit_names, unit_index = np.unique(units, return_inverse=True)
+        # O dia corrente ainda está incompleto: o ajuste vai até ontem
+        model = SeasonalRateModel(len(unit_names), len(FORECAST_CATEGORIES), periods=DAY_PERIODS,
+                                  half_life_days=FORECAST_HALF_LIFE_DAYS)
+        model.fit(unit_index, category_index, timestamps, start=start, end=today)
+        self._forecast = {
+            'key': (watermark, today),
+            'model': model,
+            'units': {unit: index for index, unit in enumerate(unit_names.tolist())},
+            'categories': {category: index for index, category in enumerate(FORECAST_CATEGORIES)}
+        }
+        return self._forecast
+    
+    def backtest_forecast(self, origins=4, horizon_days=7, today=None):
+        """Calibração do modelo de taxas sazonais nas últimas semanas (ajuste antes de cada corte, avaliação depois)"""
+        today = np.datetime64(today or datetime.utcnow().date(), 'D')
+        cutoffs = today - horizon_days * np.arange(origins, 0, -1)
+        units, category_index, timestamps = self._load_forecast_events(
+            (cutoffs[0] - FORECAST_TRAINING_DAYS).astype(datetime))
+        # Ocorrências de hoje ficam de fora: o dia ainda não terminou
+        before_today = timestamps < today
+        units, category_index, timestamps = units[before_today], category_index[before_today], timestamps[before_today]
+        if not units.size:
+            return {'samples': 0, 'origins': [str(cutoff) for cutoff in cutoffs], 'horizon_days': horizon_days}
+        unit_names, unit_index = np.unique(units, return_inverse=True)
+        return rolling_origin_backtest(
+            unit_index, category_index, timestamps, len(unit_names), len(FORECAST_CATEGORIES), cutoffs,
+            horizon_days=horizon_days, training_days=FORECAST_TRAINING_DAYS,
+            periods=DAY_PERIODS, half_life_days=FORECAST_HALF_LIFE_DAYS
+        )
+    
+    def _lock_watermark(self, name):
+        """Linha da marca d'água travada (SELECT ... FOR UPDATE) até o fim da transação, criada se não existir"""
+        query = self.db_session.query(AnalysisWatermark).filter_by(name=name).with_for_update().populate_existing()
+        watermark = query.first()
+        if watermark is None:
+            try:
+                with self.db_session.begin_nested():
+                    self.db_session.add(AnalysisWatermark(name=name, last_occurrence_id=0))
+            except IntegrityError:
+                pass  # Criada ao mesmo tempo por outra execução
+            watermark = query.one()
+        return watermark
+    
+    def _update_occurrence_aggregates(self, full=False):
+        """Soma às contagens acumuladas as ocorrências novas desde a última análise (GROUP BY no banco).
+        
+        Retorna {dimensão: {valor: contagem}} com os totais. Edições e exclusões de ocorrências antigas
+        só são refletidas numa reanálise completa (full=True). Execuções concorrentes são serializadas pela
+        trava da marca d'água; onde o banco ignora FOR UPDATE (SQLite), o avanço condicional da marca faz a
+        execução atrasada levantar StaleWatermarkError antes de alterar qualquer contagem.
+        """
+        from models import Occurrence
+        
+        watermark = self._lock_watermark('analyze_patterns')
+        # Limite superior fixo: todas as contagens enxergam o mesmo conjunto de ocorrências
+        claimed_id = watermark.last_occurrence_id or 0
+        last_id = 0 if full else claimed_id
+        max_id = self.db_session.query(func.max(Occurrence.id)).scalar() or 0
+        
+        deltas = {}
+        if max_id > last_id:
+            in_range = (Occurrence.id > last_id, Occurrence.id <= max_id)
+            # extract('dow') começa no domingo (0); weekday() do Python começa na segunda
+            columns = {
+                'weekday': extract('dow', Occurrence.created_at),
+                'month': extract('month', Occurrence.created_at),
+                'hour': extract('hour', Occurrence.created_at),
+                'unit': Occurrence.unit_number
+            }
+            for dimension, column in columns.items():
+                counts = deltas.setdefault(dimension, {})
+                for value, count in self.db_session.query(column, func.count(Occurrence.id)).filter(*in_range).group_by(column):
+                    if dimension == 'weekday':
+                        value = (int(value) + 6) % 7
+                    elif dimension in ('month', 'hour'):
+                        value = int(value)
+                    key = str(value)
+                    counts[key] = counts.get(key, 0) + count
             
-            # Contagem por tipo
-            occurrence_type = self._categorize_occurrence_type(occurrence.title, occurrence.description)
-            type_counts[occurrence_type] = type_counts.get(occurrence_type, 0) + 1
+            # O tipo depende do texto: classificar apenas as ocorrências novas, sem carregar objetos ORM
+            type_counts = deltas.setdefault('type', {})
+            rows = self.db_session.query(Occurrence.title, Occurrence.description).filter(*in_range)
+            for title, description in rows.yield_per(1000):
+                occurrence_type = self._categorize_occurrence_type(title or '', description or '')
+                type_counts[occurrence_type] = type_counts.get(occurrence_type, 0) + 1
+        
+        # Avança a marca só se ninguém a moveu desde a leitura; é a primeira escrita da transação
+        advanced = self.db_session.execute(
+            update(AnalysisWatermark).where(
+                AnalysisWatermark.id == watermark.id,
+                AnalysisWatermark.last_occurrence_id == watermark.last_occurrence_id
+            ).values(last_occurrence_id=max(last_id, max_id), last_updated=datetime.utcnow()),
+            execution_options={'synchronize_session': False}
+        ).rowcount
+        if not advanced:
+            raise StaleWatermarkError("Outra análise avançou a marca d'água ao mesmo tempo")
+        
+        if full:
+            self.db_session.query(OccurrenceAggregate).delete(synchronize_session=False)
+        existing = {
+            (dimension, value)
+            for dimension, value in self.db_session.query(OccurrenceAggregate.dimension, OccurrenceAggregate.value)
+        }
+        increments = []
+        inserts = []
+        for dimension, counts in deltas.items():
+            for value, count in counts.items():
+                row = {'dimension': dimension, 'value': value, 'count': count}
+                (increments if (dimension, value) in existing else inserts).append(row)
+        if increments:
+            # Incremento no próprio banco, sem ler e regravar o total
+            self.db_session.execute(
+                update(OccurrenceAggregate.__table__).where(
+                    OccurrenceAggregate.dimension == bindparam('b_dimension'),
+                    OccurrenceAggregate.value == bindparam('b_value')
+                ).values(count=OccurrenceAggregate.count + bindparam('b_count'), last_updated=datetime.utcnow()),
+                [{'b_dimension': row['dimension'], 'b_value': row['value'], 'b_count': row['count']} for row in increments]
+            )
+        if inserts:
+            self.db_session.bulk_insert_mappings(OccurrenceAggregate, inserts)
+        
+        totals = {}
+        for dimension, value, count in self.db_session.query(
+            OccurrenceAggregate.dimension, OccurrenceAggregate.value, OccurrenceAggregate.count
+        ):
+            totals.setdefault(dimension, {})[value] = count
+        return totals
+    
+    def analyze_patterns(self, full=False):
+        """Analisa os dados históricos para identificar padrões (incremental: só processa ocorrências novas)"""
+        for attempt in range(ANALYSIS_MAX_ATTEMPTS):
+            try:
+                aggregates = self._update_occurrence_aggregates(full)
+                break
+            except StaleWatermarkError:
+                # Outra execução contou essas ocorrências: descartar e recomeçar a partir da nova marca
+                self.db_session.rollback()
+                if attempt == ANALYSIS_MAX_ATTEMPTS - 1:
+                    raise
+        
+        # Análise de padrões sazonais
+        weekday_counts = {int(value): count for value, count in aggregates.get('weekday', {}).items()}
+        month_counts = {int(value): count for value, count in aggregates.get('month', {}).items()}
+        hour_counts = {int(value): count for value, count in aggregates.get('hour', {}).items()}
+        location_counts = aggregates.get('unit', {})
+        type_counts = aggregates.get('type', {})
+        
+        if not sum(weekday_counts.values()):
+            self.db_session.commit()
+            _bump_ai_dashboard_version()
+            return []
         
         # Identificar padrões significativos
-        patterns = []
+        detected = []
         
         # Padrão de dia da semana
         if weekday_counts:
@@ -263,13 +885,14 @@ class AIWarningManager:
             weekday_percentage = (weekday_counts[max_weekday] / total_occurrences) * 100
             
             if weekday_percentage > 25:  # Limiar arbitrário
-                pattern = OccurrencePattern(
-                    pattern_type='sazonal',
-                    description=f"Concentração de ocorrências às {weekday_names[max_weekday]}s ({weekday_percentage:.1f}%)",
-                    confidence=min(weekday_percentage / 100, 0.95)
-                )
-                self.db_session.add(pattern)
-                patterns.append(pattern)
+                detected.append({
+                    'pattern_type': 'sazonal',
+                    'dimension': 'weekday',
+                    'dimension_value': str(max_weekday),
+                    'weekday': max_weekday,
+                    'description': f"Concentração de ocorrências às {weekday_names[max_weekday]}s ({weekday_percentage:.1f}%)",
+                    'confidence': min(weekday_percentage / 100, 0.95)
+                })
         
         # Padrão de mês
         if month_counts:
@@ -280,13 +903,14 @@ class AIWarningManager:
             month_percentage = (month_counts[max_month] / total_occurrences) * 100
             
             if month_percentage > 15:  # Limiar arbitrário
-                pattern = OccurrencePattern(
-                    pattern_type='sazonal',
-                    description=f"Concentração de ocorrências em {month_names[max_month-1]} ({month_percentage:.1f}%)",
-                    confidence=min(month_percentage / 100, 0.9)
-                )
-                self.db_session.add(pattern)
-                patterns.append(pattern)
+                detected.append({
+                    'pattern_type': 'sazonal',
+                    'dimension': 'month',
+                    'dimension_value': str(max_month),
+                    'month': max_month,
+                    'description': f"Concentração de ocorrências em {month_names[max_month-1]} ({month_percentage:.1f}%)",
+                    'confidence': min(month_percentage / 100, 0.9)
+                })
         
         # Padrão de hora
         if hour_counts:
@@ -296,13 +920,16 @@ class AIWarningManager:
             
             if hour_percentage > 20:  # Limiar arbitrário
                 period = "manhã" if 6 <= max_hour < 12 else "tarde" if 12 <= max_hour < 18 else "noite"
-                pattern = OccurrencePattern(
-                    pattern_type='sazonal',
-                    description=f"Concentração de ocorrências no período da {period} ({hour_percentage:.1f}%)",
-                    confidence=min(hour_percentage / 100, 0.9)
-                )
-                self.db_session.add(pattern)
-                patterns.append(pattern)
+                hour_start, hour_end = DAY_PERIODS[period]
+                detected.append({
+                    'pattern_type': 'sazonal',
+                    'dimension': 'hour',
+                    'dimension_value': period,
+                    'hour_start': hour_start,
+                    'hour_end': hour_end,
+                    'description': f"Concentração de ocorrências no período da {period} ({hour_percentage:.1f}%)",
+                    'confidence': min(hour_percentage / 100, 0.9)
+                })
         
         # Padrão de localização
         if location_counts:
@@ -311,13 +938,14 @@ class AIWarningManager:
             location_percentage = (location_counts[max_location] / total_occurrences) * 100
             
             if location_percentage > 15:  # Limiar arbitrário
-                pattern = OccurrencePattern(
-                    pattern_type='localização',
-                    description=f"Concentração de ocorrências na unidade {max_location} ({location_percentage:.1f}%)",
-                    confidence=min(location_percentage / 100, 0.85)
-                )
-                self.db_session.add(pattern)
-                patterns.append(pattern)
+                detected.append({
+                    'pattern_type': 'localização',
+                    'dimension': 'unit',
+                    'dimension_value': max_location,
+                    'unit': max_location,
+                    'description': f"Concentração de ocorrências na unidade {max_location} ({location_percentage:.1f}%)",
+                    'confidence': min(location_percentage / 100, 0.85)
+                })
         
         # Padrão de tipo
         if type_counts:
@@ -326,368 +954,426 @@ class AIWarningManager:
             type_percentage = (type_counts[max_type] / total_occurrences) * 100
             
             if type_percentage > 30:  # Limiar arbitrário
-                pattern = OccurrencePattern(
-                    pattern_type='tipo',
-                    description=f"Predominância de ocorrências do tipo '{max_type}' ({type_percentage:.1f}%)",
-                    confidence=min(type_percentage / 100, 0.9)
-                )
-                self.db_session.add(pattern)
-                patterns.append(pattern)
+                detected.append({
+                    'pattern_type': 'tipo',
+                    'dimension': 'type',
+                    'dimension_value': max_type,
+                    'occurrence_type': max_type,
+                    'description': f"Predominância de ocorrências do tipo '{max_type}' ({type_percentage:.1f}%)",
+                    'confidence': min(type_percentage / 100, 0.9)
+                })
         
-        # Salvar padrões no banco de dados
+        # Salvar padrões no banco de dados (atualizando os já conhecidos em vez de duplicá-los)
+        patterns = self._upsert_patterns(detected)
         self.db_session.commit()
+        _bump_ai_dashboard_version()
         
         return patterns
     
-    def generate_predictions(self):
-        """Gera previsões baseadas nos padrões identificados"""
-        # Buscar padrões ativos
-        patterns = self.db_session.query(OccurrencePattern).all()
+    def _upsert_patterns(self, detected):
+        """Cria ou atualiza os padrões detectados pela chave (tipo, dimensão, valor), versionando as mudanças.
+        
+        Padrões conhecidos que deixaram de ser detectados são desativados.
+        """
+        existing = {
+            (pattern.pattern_type, pattern.dimension, pattern.dimension_value): pattern
+            for pattern in self.db_session.query(OccurrencePattern).filter(OccurrencePattern.dimension.isnot(None))
+        }
+        
+        patterns = []
+        seen = set()
+        for data in detected:
+            key = (data['pattern_type'], data['dimension'], data['dimension_value'])
+            seen.add(key)
+            pattern = existing.get(key)
+            if pattern is None:
+                pattern = OccurrencePattern(version=1, is_active=True, **data)
+                self.db_session.add(pattern)
+            elif not pattern.is_active or pattern.description != data['description'] or \
+                 abs((pattern.confidence or 0) - data['confidence']) >= 0.005:
+                pattern.description = data['description']
+                pattern.confidence = data['confidence']
+                pattern.is_active = True
+                pattern.version = (pattern.version or 0) + 1
+            else:
+                patterns.append(pattern)
+                continue
+            pattern.history.append(OccurrencePatternHistory(
+                version=pattern.version, description=pattern.description, confidence=pattern.confidence, is_active=True
+            ))
+            patterns.append(pattern)
+        
+        for key, pattern in existing.items():
+            if key not in seen and pattern.is_active:
+                pattern.is_active = False
+                pattern.version = (pattern.version or 0) + 1
+                pattern.history.append(OccurrencePatternHistory(
+                    version=pattern.version, description=pattern.description, confidence=pattern.confidence, is_active=False
+                ))
+        
+        return patterns
+    
+    def generate_predictions(self, use_forecast=True):
+        """Gera previsões para os padrões criados ou alterados desde a última geração.
+        
+        Todas as linhas são calculadas de uma vez e gravadas com um único INSERT em lote, na mesma
+        transação que expira as previsões ativas anteriores dos mesmos padrões. Com use_forecast, as
+        probabilidades vêm do modelo de taxas sazonais ajustado às ocorrências (ver _prediction_rows).
+        """
+        # Padrões cuja versão ainda não tem previsões (inclusive os desativados, para expirar as antigas)
+        patterns = self.db_session.query(OccurrencePattern).filter(
+            (OccurrencePattern.predicted_version.is_(None)) |
+            (OccurrencePattern.predicted_version < OccurrencePattern.version)
+        ).all()
         
         if not patterns:
             return []
         
-        predictions = []
+        rows = self._prediction_rows([pattern for pattern in patterns if pattern.is_active is not False],
+                                     forecast=self._occurrence_forecast() if use_forecast else None)
+        try:
+            # Previsões ainda ativas das versões anteriores desses padrões deixam de valer
+            self.db_session.query(OccurrencePrediction).filter(
+                OccurrencePrediction.pattern_id.in_([pattern.id for pattern in patterns]),
+                OccurrencePrediction.status == 'ativa'
+            ).update({'status': 'expirada'}, synchronize_session=False)
+            for pattern in patterns:
+                pattern.predicted_version = pattern.version or 1
+            
+            if rows:
+                ids = self.db_session.scalars(
+                    insert(OccurrencePrediction).returning(OccurrencePrediction.id, sort_by_parameter_order=True),
+                    rows
+                ).all()
+                for row, prediction_id in zip(rows, ids):
+                    row['id'] = prediction_id
+            
+            # Salvar previsões no banco de dados
+            self.db_session.commit()
+            _bump_ai_dashboard_version()
+        except Exception:
+            self.db_session.rollback()
+            raise
+        
+        return rows
+    
+    def _prediction_rows(self, patterns, today=None, forecast=None):
+        """Calcula as linhas de previsão de todos os padrões, vetorizado por dimensão (padrões x datas).
+        
+        Com forecast (ver _occurrence_forecast), a probabilidade é a fração das ocorrências esperadas pelo modelo
+        de taxas sazonais que cai no recorte do padrão (dia da semana, período, unidade ou categoria), a mesma
+        grandeza da confiança, limitada a 0,95 e com queda por passo. Sem ele, para unidades e categorias sem
+        histórico e para padrões de mês (o modelo não tem sazonalidade mensal), vale a confiança do padrão.
+        A chance de ao menos uma ocorrência no condomínio inteiro seria quase 1 e não diferenciaria os padrões.
+        """
+        today = np.datetime64(today or datetime.utcnow().date(), 'D')
+        one_day = np.timedelta64(1, 'D')
+        end_of_day = one_day - np.timedelta64(1, 'us')  # Equivale a datetime.max.time()
+        created_at = datetime.utcnow()
         
+        model = forecast['model'] if forecast else None
+        
+        by_dimension = {}
         for pattern in patterns:
-            # Diferentes estratégias de previsão baseadas no tipo de padrão
-            if pattern.pattern_type == 'sazonal':
-                if 'Segunda' in pattern.description or 'Terça' in pattern.description or 'Quarta' in pattern.description or \
-                   'Quinta' in pattern.description or 'Sexta' in pattern.description or 'Sábado' in pattern.description or \
-                   'Domingo' in pattern.description:
-                    # Padrão de dia da semana
-                    weekday_map = {'Segunda': 0, 'Terça': 1, 'Quarta': 2, 'Quinta': 3, 'Sexta': 4, 'Sábado': 5, 'Domingo': 6}
-                    for day_name, day_num in weekday_map.items():
-                        if day_name in pattern.description:
-                            # Prever próximas 4 ocorrências deste dia da semana
-                            for i in range(1, 5):
-                                # Calcular próxima data com este dia da semana
-                                today = datetime.utcnow().date()
-                                days_ahead = (day_num - today.weekday()) % 7
-                                if days_ahead == 0:
-                                    days_ahead = 7  # Se for hoje, pular para próxima semana
-                                next_date = today + timedelta(days=days_ahead + (i-1)*7)
-                                
-                                prediction = OccurrencePrediction(
-                                    pattern_id=pattern.id,
-                                    prediction_type='sazonal',
-                                    predicted_date_start=datetime.combine(next_date, datetime.min.time()),
-                                    predicted_date_end=datetime.combine(next_date, datetime.max.time()),
-                                    probability=pattern.confidence * (1 - (i-1)*0.1)  # Diminui confiança para datas mais distantes
-                                )
-                                self.db_session.add(prediction)
-                                predictions.append(prediction)
-                
-                elif 'Janeiro' in pattern.description or 'Fevereiro' in pattern.description or 'Março' in pattern.description or \
-                     'Abril' in pattern.description or 'Maio' in pattern.description or 'Junho' in pattern.description or \
-                     'Julho' in pattern.description or 'Agosto' in pattern.description or 'Setembro' in pattern.description or \
-                     'Outubro' in pattern.description or 'Novembro' in pattern.description or 'Dezembro' in pattern.description:
-                    # Padrão de mês
-                    month_map = {'Janeiro': 1, 'Fevereiro': 2, 'Março': 3, 'Abril': 4, 'Maio': 5, 'Junho': 6,
-                                'Julho': 7, 'Agosto': 8, 'Setembro': 9, 'Outubro': 10, 'Novembro': 11, 'Dezembro': 12}
-                    for month_name, month_num in month_map.items():
-                        if month_name in pattern.description:
-                            # Prever próxima ocorrência neste mês
-                            today = datetime.utcnow().date()
-                            current_year = today.year
-                            next_year = current_year if today.month <= month_num else current_year + 1
-                            
-                            start_date = datetime(next_year, month_num, 1)
-                            end_date = datetime(next_year, month_num + 1, 1) if month_num < 12 else datetime(next_year + 1, 1, 1)
-                            end_date = end_date - timedelta(days=1)
-                            
-                            prediction = OccurrencePrediction(
-                                pattern_id=pattern.id,
-                                prediction_type='sazonal',
-                                predicted_date_start=start_date,
-                                predicted_date_end=end_date,
-                                probability=pattern.confidence
-                            )
-                            self.db_session.add(prediction)
-                            predictions.append(prediction)
-                
-                elif 'manhã' in pattern.description or 'tarde' in pattern.description or 'noite' in pattern.description:
-                    # Padrão de período do dia
-                    period_map = {'manhã': (6, 12), 'tarde': (12, 18), 'noite': (18, 6)}
-                    for period_name, (start_hour, end_hour) in period_map.items():
-                        if period_name in pattern.description:
-                            # Prever próximos 7 dias neste período
-                            for i in range(1, 8):
-                                next_date = datetime.utcnow().date() + timedelta(days=i)
-                                
-                                if end_hour > start_hour:
-                                    start_time = datetime.combine(next_date, datetime.min.time().replace(hour=start_hour))
-                                    end_time = datetime.combine(next_date, datetime.min.time().replace(hour=end_hour))
-                                else:
-                                    # Período noturno que cruza a meia-noite
-                                    start_time = datetime.combine(next_date, datetime.min.time().replace(hour=start_hour))
-                                    end_time = datetime.combine(next_date + timedelta(days=1), datetime.min.time().replace(hour=end_hour))
-                                
-                                prediction = OccurrencePrediction(
-                                    pattern_id=pattern.id,
-                                    prediction_type='sazonal',
-                                    predicted_date_start=start_time,
-                                    predicted_date_end=end_time,
-                                    probability=pattern.confidence * (1 - (i-1)*0.05)  # Diminui confiança para datas mais distantes
-                                )
-                                self.db_session.add(prediction)
-                                predictions.append(prediction)
+            by_dimension.setdefault(pattern.dimension, []).append(pattern)
+        
+        columns = {'pattern_id': [], 'start': [], 'end': [], 'probability': [], 'prediction_type': [],
+                   'location': [], 'occurrence_type': []}
+        
+        def add(group, starts, ends, probabilities, dimension):
+            per_pattern = starts.shape[1]
+            columns['pattern_id'].extend(np.repeat([pattern.id for pattern in group], per_pattern).tolist())
+            columns['start'].extend(starts.ravel().astype('datetime64[us]').tolist())
+            columns['end'].extend(ends.ravel().astype('datetime64[us]').tolist())
+            columns['probability'].extend(probabilities.ravel().tolist())
+            columns['prediction_type'].extend([PREDICTION_TYPES[dimension]] * starts.size)
+            for pattern in group:
+                columns['location'].extend([pattern.unit if dimension == 'unit' else None] * per_pattern)
+                columns['occurrence_type'].extend([pattern.occurrence_type if dimension == 'type' else None] * per_pattern)
+        
+        def calibrated(shares, steps, decay):
+            """Frações do modelo (padrão x data, ou só padrão) limitadas a 0,95 e com a queda por passo"""
+            shares = np.minimum(shares, 0.95)
+            return (shares if shares.ndim == 2 else shares[:, None]) * (1 - steps[None, :] * decay)
+        
+        for dimension, (count, step, decay) in PREDICTION_HORIZONS.items():
+            group = [
+                pattern for pattern in by_dimension.get(dimension, [])
+                if (dimension != 'weekday' or pattern.weekday is not None)
+                and (dimension != 'hour' or (pattern.hour_start is not None and pattern.hour_end is not None))
+                and (dimension != 'unit' or pattern.unit)
+                and (dimension != 'type' or pattern.occurrence_type)
+            ]
+            if not group:
+                continue
             
-            elif pattern.pattern_type == 'localização':
-                # Extrair unidade da descrição
-                import re
-                unit_match = re.search(r'unidade (\w+)', pattern.description)
-                if unit_match:
-                    unit = unit_match.group(1)
-                    
-                    # Prever próximos 30 dias para esta unidade
-                    for i in range(1, 31):
-                        next_date = datetime.utcnow().date() + timedelta(days=i)
-                        
-                        prediction = OccurrencePrediction(
-                            pattern_id=pattern.id,
-                            prediction_type='localização',
-                            predicted_date_start=datetime.combine(next_date, datetime.min.time()),
-                            predicted_date_end=datetime.combine(next_date, datetime.max.time()),
-                            location=unit,
-                            probability=pattern.confidence * (1 - (i-1)*0.02)  # Diminui confiança para datas mais distantes
-                        )
-                        self.db_session.add(prediction)
-                        predictions.append(prediction)
+            steps = np.arange(count)
+            confidences = np.array([pattern.confidence or 0.0 for pattern in group])
+            # Diminui confiança para datas mais distantes
+            probabilities = confidences[:, None] * (1 - steps[None, :] * decay)
             
-            elif pattern.pattern_type == 'tipo':
-                # Extrair tipo da descrição
-                import re
-                type_match = re.search(r"tipo '(\w+)'", pattern.description)
-                if type_match:
-                    occurrence_type = type_match.group(1)
-                    
-                    # Prever próximos 14 dias para este tipo
-                    for i in range(1, 15):
-                        next_date = datetime.utcnow().date() + timedelta(days=i)
-                        
-                        prediction = OccurrencePrediction(
-                            pattern_id=pattern.id,
-                            prediction_type='tipo',
-                            predicted_date_start=datetime.combine(next_date, datetime.min.time()),
-                            predicted_date_end=datetime.combine(next_date, datetime.max.time()),
-                            occurrence_type=occurrence_type,
-                            probability=pattern.confidence * (1 - (i-1)*0.03)  # Diminui confiança para datas mais distantes
-                        )
-                        self.db_session.add(prediction)
-                        predictions.append(prediction)
-        
-        # Salvar previsões no banco de dados
-        self.db_session.commit()
+            if dimension == 'weekday':
+                # Próximas ocorrências deste dia da semana (se for hoje, a partir da próxima semana)
+                today_weekday = (int(today.astype('int64')) + 3) % 7  # 1970-01-01 foi uma quinta-feira (3)
+                days_ahead = (np.array([pattern.weekday for pattern in group]) - today_weekday) % 7
+                days_ahead[days_ahead == 0] = 7
+                days = today + days_ahead[:, None] * one_day + steps[None, :] * step * one_day
+                if model is not None:
+                    probabilities = calibrated(model.expected_share('weekday')[[pattern.weekday for pattern in group]], steps, decay)
+                add(group, days, days + end_of_day, probabilities, dimension)
+            elif dimension == 'hour':
+                days = today + (steps[None, :] + 1) * one_day
+                hour_start = np.array([pattern.hour_start for pattern in group])[:, None]
+                hour_end = np.array([pattern.hour_end for pattern in group])[:, None]
+                starts = days + hour_start * np.timedelta64(1, 'h')
+                # Período noturno cruza a meia-noite
+                ends = days + (hour_end <= hour_start) * one_day + hour_end * np.timedelta64(1, 'h')
+                if model is not None:
+                    # Período do modelo que contém a hora inicial do padrão
+                    periods = model.hour_period[hour_start[:, 0] % 24]
+                    probabilities = calibrated(model.expected_share('period', days[0])[periods], steps, decay)
+                add(group, starts, ends, np.broadcast_to(probabilities, starts.shape), dimension)
+            else:
+                days = np.broadcast_to(today + (steps[None, :] + 1) * one_day, (len(group), count))
+                if model is not None and dimension == 'unit':
+                    index = np.array([forecast['units'].get(pattern.unit, -1) for pattern in group])
+                    known = index >= 0
+                    if known.any():
+                        probabilities[known] = calibrated(model.expected_share('unit', days[0])[index[known]], steps, decay)
+                elif model is not None:
+                    index = np.array([forecast['categories'].get(pattern.occurrence_type, -1) for pattern in group])
+                    known = index >= 0
+                    if known.any():
+                        probabilities[known] = calibrated(model.expected_share('category', days[0])[index[known]], steps, decay)
+                add(group, days, days + end_of_day, probabilities, dimension)
+        
+        # Padrões de mês: uma previsão cobrindo o próximo mês correspondente
+        today_date = today.astype(datetime)
+        for pattern in by_dimension.get('month', []):
+            if not pattern.month:
+                continue
+            year = today_date.year if today_date.month <= pattern.month else today_date.year + 1
+            start_date = datetime(year, pattern.month, 1)
+            end_date = datetime(year, pattern.month + 1, 1) if pattern.month < 12 else datetime(year + 1, 1, 1)
+            columns['pattern_id'].append(pattern.id)
+            columns['start'].append(start_date)
+            columns['end'].append(end_date - timedelta(days=1))
+            # O modelo não tem sazonalidade mensal: a probabilidade é a confiança do padrão
+            columns['probability'].append(pattern.confidence)
+            columns['prediction_type'].append('sazonal')
+            columns['location'].append(None)
+            columns['occurrence_type'].append(None)
+        
+        return [
+            {
+                'pattern_id': pattern_id,
+                'prediction_type': prediction_type,
+                'predicted_date_start': start,
+                'predicted_date_end': end,
+                'location': location,
+                'occurrence_type': occurrence_type,
+                'probability': probability,
+                'status': 'ativa',
+                'created_at': created_at
+            }
+            for pattern_id, prediction_type, start, end, location, occurrence_type, probability in zip(
+                columns['pattern_id'], columns['prediction_type'], columns['start'], columns['end'],
+                columns['location'], columns['occurrence_type'], columns['probability']
+            )
+        ]
+    
+    def expire_predictions(self, now=None):
+        """Marca como expiradas, num único UPDATE, as previsões ativas cujo período já terminou"""
+        now = now or datetime.utcnow()
+        try:
+            expired = self.db_session.query(OccurrencePrediction).filter(
+                OccurrencePrediction.status == 'ativa',
+                OccurrencePrediction.predicted_date_end < now
+            ).update({'status': 'expirada'}, synchronize_session=False)
+            self.db_session.commit()
+            _bump_ai_dashboard_version()
+        except Exception:
+            self.db_session.rollback()
+            raise
+        return expired
+    
+    def archive_predictions(self, retention_days=PREDICTION_RETENTION_DAYS, batch_size=ARCHIVE_BATCH_SIZE):
+        """Move para occurrence_prediction_archive as previsões encerradas há mais de retention_days dias.
         
-        return predictions
+        Previsões com alertas ou advertências ficam na tabela principal, pois esses registros as referenciam;
+        as sugestões de medidas das arquivadas são descartadas. Cada lote é uma transação.
+        """
+        cutoff = datetime.utcnow() - timedelta(days=retention_days)
+        columns = ['id', 'pattern_id', 'prediction_type', 'predicted_date_start', 'predicted_date_end',
+                   'location', 'occurrence_type', 'probability', 'status', 'created_at']
+        archived = 0
+        while True:
+            prediction_ids = self.db_session.scalars(select(OccurrencePrediction.id).where(
+                OccurrencePrediction.status != 'ativa',
+                OccurrencePrediction.predicted_date_end < cutoff,
+                ~select(PreventiveAlert.id).where(PreventiveAlert.prediction_id == OccurrencePrediction.id).exists(),
+                ~select(AutomatedWarning.id).where(AutomatedWarning.prediction_id == OccurrencePrediction.id).exists()
+            ).order_by(OccurrencePrediction.id).limit(batch_size)).all()
+            if not prediction_ids:
+                break
+            
+            try:
+                self.db_session.execute(insert(OccurrencePredictionArchive).from_select(
+                    columns,
+                    select(*(getattr(OccurrencePrediction, column) for column in columns)).where(
+                        OccurrencePrediction.id.in_(prediction_ids))
+                ))
+                self.db_session.execute(delete(PredictionMeasureMapping).where(
+                    PredictionMeasureMapping.prediction_id.in_(prediction_ids)))
+                self.db_session.execute(delete(OccurrencePrediction).where(
+                    OccurrencePrediction.id.in_(prediction_ids)))
+                self.db_session.commit()
+                _bump_ai_dashboard_version()
+            except Exception:
+                self.db_session.rollback()
+                raise
+            archived += len(prediction_ids)
+            if len(prediction_ids) < batch_size:
+                break
+        return archived
+    
+    def run_prediction_lifecycle(self):
+        """Expira as previsões vencidas e arquiva as antigas; retorna as quantidades"""
+        return {
+            'expired': self.expire_predictions(),
+            'archived': self.archive_predictions()
+        }
     
     def generate_preventive_measures(self, prediction_id=None):
-        """Gera medidas preventivas para previsões"""
-        # Buscar previsões ativas
-        query = self.db_session.query(OccurrencePrediction).filter(OccurrencePrediction.status == 'ativa')
+        """Gera medidas preventivas para previsões.
+        
+        O catálogo é carregado uma vez, as medidas ausentes são criadas num único lote e os mapeamentos novos
+        são gravados com um INSERT em lote; pares previsão/medida já existentes são mantidos.
+        """
+        # Buscar previsões ativas (só as colunas usadas)
+        active = select(OccurrencePrediction.id).where(OccurrencePrediction.status == 'ativa')
         if prediction_id:
-            query = query.filter(OccurrencePrediction.id == prediction_id)
+            active = active.where(OccurrencePrediction.id == prediction_id)
         
-        predictions = query.all()
+        predictions = self.db_session.query(
+            OccurrencePrediction.id, OccurrencePrediction.occurrence_type, OccurrencePrediction.probability
+        ).filter(OccurrencePrediction.id.in_(active)).all()
         
         if not predictions:
             return []
         
-        # Catálogo de medidas preventivas por tipo
-        preventive_catalog = {
-            'barulho': [
-                {
-                    'title': 'Comunicado sobre horários de silêncio',
-                    'description': 'Enviar comunicado relembrando os horários de silêncio conforme regimento interno.',
-                    'effectiveness': 7,
-                    'difficulty': 2
-                },
-                {
-                    'title': 'Inspeção acústica preventiva',
-                    'description': 'Realizar inspeção acústica nas áreas comuns e unidades com histórico de reclamações.',
-                    'effectiveness': 8,
-                    'difficulty': 6
-                }
-            ],
-            'obras': [
-                {
-                    'title': 'Comunicado sobre horários de obras',
-                    'description': 'Enviar comunicado relembrando os horários permitidos para obras conforme regimento interno.',
-                    'effectiveness': 7,
-                    'difficulty': 2
-                },
-                {
-                    'title': 'Vistoria preventiva',
-                    'description': 'Realizar vistoria nas unidades com obras em andamento para verificar conformidade.',
-                    'effectiveness': 9,
-                    'difficulty': 7
-                }
-            ],
-            'animais': [
-                {
-                    'title': 'Comunicado sobre regras para animais',
-                    'description': 'Enviar comunicado relembrando as regras para criação de animais no condomínio.',
-                    'effectiveness': 6,
-                    'difficulty': 2
-                },
-                {
-                    'title': 'Campanha de conscientização',
-                    'description': 'Realizar campanha de conscientização sobre cuidados com animais de estimação em condomínios.',
-                    'effectiveness': 8,
-                    'difficulty': 5
-                }
-            ],
-            'estacionamento': [
-                {
-                    'title': 'Verificação de vagas',
-                    'description': 'Realizar verificação das vagas de estacionamento para identificar uso irregular.',
-                    'effectiveness': 8,
-                    'difficulty': 4
-                },
-                {
-                    'title': 'Comunicado sobre regras de estacionamento',
-                    'description': 'Enviar comunicado relembrando as regras de uso das vagas de estacionamento.',
-                    'effectiveness': 6,
-                    'difficulty': 2
-                }
-            ],
-            'áreas_comuns': [
-                {
-                    'title': 'Inspeção das áreas comuns',
-                    'description': 'Realizar inspeção preventiva nas áreas comuns para identificar possíveis problemas.',
-                    'effectiveness': 8,
-                    'difficulty': 5
-                },
-                {
-                    'title': 'Comunicado sobre uso de áreas comuns',
-                    'description': 'Enviar comunicado relembrando as regras de uso das áreas comuns do condomínio.',
-                    'effectiveness': 7,
-                    'difficulty': 2
-                }
-            ],
-            'segurança': [
-                {
-                    'title': 'Verificação de equipamentos de segurança',
-                    'description': 'Realizar verificação dos equipamentos de segurança (câmeras, alarmes, etc.).',
-                    'effectiveness': 9,
-                    'difficulty': 6
-                },
-                {
-                    'title': 'Comunicado sobre procedimentos de segurança',
-                    'description': 'Enviar comunicado sobre procedimentos de segurança e prevenção de acidentes.',
-                    'effectiveness': 7,
-                    'difficulty': 3
-                }
-            ],
-            'lixo': [
-                {
-                    'title': 'Inspeção das áreas de descarte',
-                    'description': 'Realizar inspeção preventiva nas áreas de descarte de lixo e recicláveis.',
-                    'effectiveness': 8,
-                    'difficulty': 4
-                },
-                {
-                    'title': 'Comunicado sobre descarte correto',
-                    'description': 'Enviar comunicado sobre procedimentos corretos para descarte de lixo e recicláveis.',
-                    'effectiveness': 7,
-                    'difficulty': 2
-                }
-            ],
-            'outros': [
-                {
-                    'title': 'Reunião preventiva com síndico',
-                    'description': 'Realizar reunião com síndico para discutir medidas preventivas gerais.',
-                    'effectiveness': 8,
-                    'difficulty': 5
-                },
-                {
-                    'title': 'Comunicado geral sobre regimento',
-                    'description': 'Enviar comunicado geral relembrando pontos importantes do regimento interno.',
-                    'effectiveness': 6,
-                    'difficulty': 3
-                }
-            ]
-        }
-        
-        # Medidas gerais para todos os tipos
-        general_measures = [
-            {
-                'title': 'Reforço na comunicação do regimento',
-                'description': 'Enviar cópia do regimento interno com destaque para os artigos mais relevantes.',
-                'effectiveness': 6,
-                'difficulty': 3
-            },
-            {
-                'title': 'Presença intensificada de funcionários',
-                'description': 'Aumentar a presença de funcionários nas áreas e horários com maior probabilidade de ocorrências.',
-                'effectiveness': 7,
-                'difficulty': 6
-            }
-        ]
-        
-        mappings = []
-        
-        for prediction in predictions:
-            # Determinar tipo de ocorrência prevista
-            occurrence_type = prediction.occurrence_type or 'outros'
-            
-            # Selecionar medidas específicas para o tipo
-            specific_measures = preventive_catalog.get(occurrence_type, preventive_catalog['outros'])
+        try:
+            measures = self._get_preventive_measures()
+            existing = set(self.db_session.query(
+                PredictionMeasureMapping.prediction_id, PredictionMeasureMapping.measure_id
+            ).filter(PredictionMeasureMapping.prediction_id.in_(active)))
             
-            # Combinar com medidas gerais
-            all_measures = specific_measures + general_measures
+            mappings = []
+            for prediction_id, occurrence_type, probability in predictions:
+                # Medidas específicas para o tipo previsto, combinadas com as medidas gerais
+                specific_measures = PREVENTIVE_CATALOG.get(occurrence_type or 'outros', PREVENTIVE_CATALOG['outros'])
+                for measure_data in specific_measures + GENERAL_MEASURES:
+                    measure_id, effectiveness, difficulty = measures[measure_data['title']]
+                    if (prediction_id, measure_id) in existing:
+                        continue
+                    existing.add((prediction_id, measure_id))
+                    mappings.append({
+                        'prediction_id': prediction_id,
+                        'measure_id': measure_id,
+                        'relevance_score': min(10, int(probability * 10) + effectiveness - difficulty)
+                    })
             
-            for measure_data in all_measures:
-                # Verificar se a medida já existe
-                measure = self.db_session.query(PreventiveMeasure).filter_by(
-                    title=measure_data['title']
-                ).first()
-                
-                # Se não existir, criar
-                if not measure:
-                    measure = PreventiveMeasure(
-                        title=measure_data['title'],
-                        description=measure_data['description'],
-                        effectiveness_rating=measure_data.get('effectiveness', 5),
-                        implementation_difficulty=measure_data.get('difficulty', 5)
-                    )
-                    self.db_session.add(measure)
-                    self.db_session.flush()  # Para obter o ID
-                
-                # Criar mapeamento entre previsão e medida
-                mapping = PredictionMeasureMapping(
-                    prediction_id=prediction.id,
-                    measure_id=measure.id,
-                    relevance_score=min(10, int(prediction.probability * 10) + measure.effectiveness_rating - measure.implementation_difficulty)
-                )
-                self.db_session.add(mapping)
-                mappings.append(mapping)
-        
-        # Salvar no banco de dados
-        self.db_session.commit()
+            if mappings:
+                self.db_session.execute(insert(PredictionMeasureMapping), mappings)
+            self.db_session.commit()
+            _bump_ai_dashboard_version()
+        except Exception:
+            self.db_session.rollback()
+            raise
         
         return mappings
     
+    def _get_preventive_measures(self):
+        """{título: (id, efetividade, dificuldade)} das medidas do catálogo, criando as ausentes num único lote"""
+        catalog = {}
+        for measure_data in [m for measures in PREVENTIVE_CATALOG.values() for m in measures] + GENERAL_MEASURES:
+            catalog.setdefault(measure_data['title'], measure_data)
+        
+        columns = (PreventiveMeasure.id, PreventiveMeasure.title,
+                   PreventiveMeasure.effectiveness_rating, PreventiveMeasure.implementation_difficulty)
+        measures = {}
+        for measure_id, title, effectiveness, difficulty in self.db_session.query(*columns).filter(
+                PreventiveMeasure.title.in_(list(catalog))).order_by(PreventiveMeasure.id):
+            # Títulos duplicados: vale a medida mais antiga, como na busca anterior por título
+            measures.setdefault(title, (measure_id, effectiveness or 0, difficulty or 0))
+        
+        missing = [{
+            'title': title,
+            'description': measure_data['description'],
+            'effectiveness_rating': measure_data.get('effectiveness', 5),
+            'implementation_difficulty': measure_data.get('difficulty', 5)
+        } for title, measure_data in catalog.items() if title not in measures]
+        if missing:
+            created = self.db_session.execute(insert(PreventiveMeasure).returning(*columns, sort_by_parameter_order=True), missing)
+            for measure_id, title, effectiveness, difficulty in created:
+                measures[title] = (measure_id, effectiveness, difficulty)
+        return measures
+    
     def generate_preventive_alerts(self, prediction_id=None, min_probability=0.6):
-        """Gera alertas preventivos para previsões com alta probabilidade"""
-        # Buscar previsões ativas com probabilidade acima do limiar
-        query = self.db_session.query(OccurrencePrediction).filter(
+        """Gera alertas preventivos para previsões com alta probabilidade que ainda não têm alerta.
+        
+        Previsões e suas três medidas mais relevantes vêm de uma única consulta (ROW_NUMBER por previsão);
+        os alertas são gravados com um INSERT em lote. Previsões alertadas por uma execução concorrente
+        (índice único em prediction_id) ficam de fora do resultado.
+        """
+        # Três medidas mais relevantes por previsão
+        ranked = select(
+            PredictionMeasureMapping.prediction_id,
+            PredictionMeasureMapping.measure_id,
+            func.row_number().over(
+                partition_by=PredictionMeasureMapping.prediction_id,
+                order_by=(PredictionMeasureMapping.relevance_score.desc(), PredictionMeasureMapping.id)
+            ).label('rank')
+        ).subquery()
+        
+        # Buscar previsões ativas com probabilidade acima do limiar e sem alerta
+        query = self.db_session.query(
+            OccurrencePrediction.id,
+            OccurrencePrediction.prediction_type,
+            OccurrencePrediction.predicted_date_start,
+            OccurrencePrediction.predicted_date_end,
+            OccurrencePrediction.location,
+            OccurrencePrediction.occurrence_type,
+            OccurrencePrediction.probability,
+            PreventiveMeasure.title,
+            PreventiveMeasure.description
+        ).outerjoin(
+            ranked, (ranked.c.prediction_id == OccurrencePrediction.id) & (ranked.c.rank <= 3)
+        ).outerjoin(
+            PreventiveMeasure, PreventiveMeasure.id == ranked.c.measure_id
+        ).filter(
             OccurrencePrediction.status == 'ativa',
-            OccurrencePrediction.probability >= min_probability
+            OccurrencePrediction.probability >= min_probability,
+            ~select(PreventiveAlert.id).where(PreventiveAlert.prediction_id == OccurrencePrediction.id).exists()
         )
         
         if prediction_id:
             query = query.filter(OccurrencePrediction.id == prediction_id)
         
-        predictions = query.all()
+        predictions = {}
+        for row in query.order_by(OccurrencePrediction.id, ranked.c.rank):
+            measures = predictions.setdefault(row.id, (row, []))[1]
+            if row.title is not None:
+                measures.append((row.title, row.description))
         
         if not predictions:
             return []
         
+        recipients = json.dumps(['admin', 'sindico'])  # Simplificado
+        # Bloco de recomendações renderizado uma vez por combinação de medidas (o catálogo é pequeno)
+        recommendations = {}
         alerts = []
-        
-        for prediction in predictions:
+        for prediction, measures in predictions.values():
             # Determinar nível de alerta baseado na probabilidade
             if prediction.probability >= 0.8:
                 alert_level = 'alto'
@@ -696,68 +1382,94 @@ class AIWarningManager:
             else:
                 alert_level = 'baixo'
             
-            # Criar título e mensagem baseados no tipo de previsão
-            if prediction.prediction_type == 'sazonal':
-                title = f"Alerta Preventivo: Possível ocorrência em {prediction.predicted_date_start.strftime('%d/%m/%Y')}"
-                
-                if prediction.predicted_date_start and prediction.predicted_date_end and \
-                   prediction.predicted_date_start.date() == prediction.predicted_date_end.date():
-                    # Previsão para um dia específico
-                    message = f"Nosso sistema de IA identificou uma possível ocorrência para o dia {prediction.predicted_date_start.strftime('%d/%m/%Y')}. "
-                else:
-                    # Previsão para um período
-                    start_str = prediction.predicted_date_start.strftime('%d/%m/%Y') if prediction.predicted_date_start else "data não especificada"
-                    end_str = prediction.predicted_date_end.strftime('%d/%m/%Y') if prediction.predicted_date_end else "data não especificada"
-                    message = f"Nosso sistema de IA identificou uma possível ocorrência no período de {start_str} a {end_str}. "
-            
-            elif prediction.prediction_type == 'localização':
-                title = f"Alerta Preventivo: Possível ocorrência na unidade {prediction.location}"
-                message = f"Nosso sistema de IA identificou uma possível ocorrência relacionada à unidade {prediction.location}. "
-            
-            elif prediction.prediction_type == 'tipo':
-                title = f"Alerta Preventivo: Possível ocorrência do tipo '{prediction.occurrence_type}'"
-                message = f"Nosso sistema de IA identificou uma possível ocorrência do tipo '{prediction.occurrence_type}'. "
-            
-            else:
-                title = "Alerta Preventivo: Possível ocorrência detectada"
-                message = "Nosso sistema de IA identificou uma possível ocorrência. "
+            title, message = self._alert_text(prediction)
             
             # Adicionar informações sobre a probabilidade
             message += f"A probabilidade estimada é de {prediction.probability*100:.1f}%. "
             
             # Adicionar recomendações baseadas nas medidas preventivas
-            mappings = self.db_session.query(PredictionMeasureMapping).filter_by(
-                prediction_id=prediction.id
-            ).order_by(PredictionMeasureMapping.relevance_score.desc()).limit(3).all()
-            
-            if mappings:
-                message += "Recomendamos as seguintes medidas preventivas:\n\n"
-                for i, mapping in enumerate(mappings, 1):
-                    measure = self.db_session.query(PreventiveMeasure).filter_by(
-                        id=mapping.measure_id
-                    ).first()
-                    
-                    if measure:
-                        message += f"{i}. {measure.title}: {measure.description}\n"
+            if measures:
+                key = tuple(measures)
+                if key not in recommendations:
+                    recommendations[key] = "Recomendamos as seguintes medidas preventivas:\n\n" + ''.join(
+                        f"{i}. {measure_title}: {measure_description}\n"
+                        for i, (measure_title, measure_description) in enumerate(measures, 1)
+                    )
+                message += recommendations[key]
             
-            # Criar alerta
-            alert = PreventiveAlert(
-                prediction_id=prediction.id,
-                alert_level=alert_level,
-                title=title,
-                message=message,
-                recipients=json.dumps(['admin', 'sindico'])  # Simplificado
-            )
-            self.db_session.add(alert)
-            alerts.append(alert)
+            alerts.append({
+                'prediction_id': prediction.id,
+                'alert_level': alert_level,
+                'title': title,
+                'message': message,
+                'recipients': recipients
+            })
         
         # Salvar no banco de dados
-        self.db_session.commit()
+        try:
+            try:
+                # Sem exigir a ordem do RETURNING o INSERT é feito em lotes de várias linhas; cada previsão tem um único alerta
+                with self.db_session.begin_nested():
+                    alert_ids = dict(self.db_session.execute(
+                        insert(PreventiveAlert).returning(PreventiveAlert.prediction_id, PreventiveAlert.id), alerts
+                    ).all())
+            except IntegrityError:
+                # Outra execução alertou algumas dessas previsões depois da consulta: gravar um a um, pulando essas
+                alert_ids = {}
+                for alert in alerts:
+                    try:
+                        with self.db_session.begin_nested():
+                            alert_ids[alert['prediction_id']] = self.db_session.execute(
+                                insert(PreventiveAlert).returning(PreventiveAlert.id), alert
+                            ).scalar_one()
+                    except IntegrityError:
+                        pass
+                alerts = [alert for alert in alerts if alert['prediction_id'] in alert_ids]
+            self.db_session.commit()
+            _bump_ai_dashboard_version()
+        except Exception:
+            self.db_session.rollback()
+            raise
         
+        for alert in alerts:
+            alert['id'] = alert_ids[alert['prediction_id']]
         return alerts
     
+    def _alert_text(self, prediction):
+        """Título e início da mensagem do alerta, conforme o tipo de previsão"""
+        if prediction.prediction_type == 'sazonal':
+            title = f"Alerta Preventivo: Possível ocorrência em {prediction.predicted_date_start.strftime('%d/%m/%Y')}"
+            
+            if prediction.predicted_date_start and prediction.predicted_date_end and \
+               prediction.predicted_date_start.date() == prediction.predicted_date_end.date():
+                # Previsão para um dia específico
+                message = f"Nosso sistema de IA identificou uma possível ocorrência para o dia {prediction.predicted_date_start.strftime('%d/%m/%Y')}. "
+            else:
+                # Previsão para um período
+                start_str = prediction.predicted_date_start.strftime('%d/%m/%Y') if prediction.predicted_date_start else "data não especificada"
+                end_str = prediction.predicted_date_end.strftime('%d/%m/%Y') if prediction.predicted_date_end else "data não especificada"
+                message = f"Nosso sistema de IA identificou uma possível ocorrência no período de {start_str} a {end_str}. "
+        
+        elif prediction.prediction_type == 'localização':
+            title = f"Alerta Preventivo: Possível ocorrência na unidade {prediction.location}"
+            message = f"Nosso sistema de IA identificou uma possível ocorrência relacionada à unidade {prediction.location}. "
+        
+        elif prediction.prediction_type == 'tipo':
+            title = f"Alerta Preventivo: Possível ocorrência do tipo '{prediction.occurrence_type}'"
+            message = f"Nosso sistema de IA identificou uma possível ocorrência do tipo '{prediction.occurrence_type}'. "
+        
+        else:
+            title = "Alerta Preventivo: Possível ocorrência detectada"
+            message = "Nosso sistema de IA identificou uma possível ocorrência. "
+        
+        return title, message
+    
     def process_automated_warning_rules(self):
-        """Processa regras de advertências automatizadas"""
+        """Processa regras de advertências automatizadas.
+        
+        A condição de cada regra vira uma cláusula WHERE: uma consulta por regra traz só as previsões (ou padrões)
+        que a atendem e ainda não geraram advertência por ela.
+        """
         # Buscar regras ativas
         rules = self.db_session.query(AutomatedWarningRule).filter_by(is_active=True).all()
         
@@ -767,75 +1479,109 @@ class AIWarningManager:
         warnings = []
         
         for rule in rules:
-            # Processar regra baseada no tipo de gatilho
-            if rule.trigger_type == 'previsão':
-                # Buscar previsões que atendem à condição
-                predictions = self.db_session.query(OccurrencePrediction).filter(
-                    OccurrencePrediction.status == 'ativa'
-                ).all()
+            try:
+                # Processar regra baseada no tipo de gatilho
+                if rule.trigger_type == 'previsão':
+                    clause = self._prediction_condition_clause(rule.trigger_condition, rule.trigger_value)
+                    if clause is None:
+                        continue
+                    # Previsões ativas que atendem à condição e ainda não têm advertência desta regra
+                    predictions = self.db_session.query(OccurrencePrediction).filter(
+                        OccurrencePrediction.status == 'ativa',
+                        clause,
+                        ~select(AutomatedWarning.id).where(
+                            AutomatedWarning.rule_id == rule.id,
+                            AutomatedWarning.prediction_id == OccurrencePrediction.id
+                        ).exists()
+                    )
+                    warnings.extend(self._generate_automated_warning(rule, prediction) for prediction in predictions)
                 
-                for prediction in predictions:
-                    # Verificar se a previsão atende à condição da regra
-                    if self._check_prediction_condition(prediction, rule.trigger_condition, rule.trigger_value):
-                        # Gerar advertência automatizada
-                        warning = self._generate_automated_warning(rule, prediction)
-                        warnings.append(warning)
-            
-            elif rule.trigger_type == 'padrão':
-                # Buscar padrões que atendem à condição
-                patterns = self.db_session.query(OccurrencePattern).all()
+                elif rule.trigger_type == 'padrão':
+                    clause = self._pattern_condition_clause(rule.trigger_condition, rule.trigger_value)
+                    if clause is None:
+                        continue
+                    patterns = self.db_session.query(OccurrencePattern).filter(
+                        OccurrencePattern.is_active.is_(True),
+                        clause,
+                        ~select(AutomatedWarning.id).where(
+                            AutomatedWarning.rule_id == rule.id,
+                            AutomatedWarning.pattern_id == OccurrencePattern.id
+                        ).exists()
+                    )
+                    warnings.extend(self._generate_automated_warning(rule, pattern=pattern) for pattern in patterns)
                 
-                for pattern in patterns:
-                    # Verificar se o padrão atende à condição da regra
-                    if self._check_pattern_condition(pattern, rule.trigger_condition, rule.trigger_value):
-                        # Gerar advertência automatizada
-                        warning = self._generate_automated_warning(rule, pattern=pattern)
-                        warnings.append(warning)
-            
-            elif rule.trigger_type == 'limiar':
-                # Implementação simplificada para limiares
-                # Na prática, isso dependeria de contadores ou métricas específicas
-                pass
-        
-        # Salvar no banco de dados
-        self.db_session.commit()
+                elif rule.trigger_type == 'limiar':
+                    # Implementação simplificada para limiares
+                    # Na prática, isso dependeria de contadores ou métricas específicas
+                    pass
+            except ValueError:
+                print(f"Regra {rule.id} ignorada: valor '{rule.trigger_value}' inválido para a condição {rule.trigger_condition}")
+        
+        if not warnings:
+            return []
         
+        # Salvar no banco de dados (INSERT em lote)
+        try:
+            rows = self.db_session.execute(insert(AutomatedWarning).returning(
+                AutomatedWarning.rule_id, AutomatedWarning.prediction_id, AutomatedWarning.pattern_id, AutomatedWarning.id
+            ), warnings).all()
+            self.db_session.commit()
+            _bump_ai_dashboard_version()
+        except Exception:
+            self.db_session.rollback()
+            raise
+        
+        warning_ids = {(rule_id, prediction_id, pattern_id): warning_id for rule_id, prediction_id, pattern_id, warning_id in rows}
+        for warning in warnings:
+            warning['id'] = warning_ids[(warning['rule_id'], warning['prediction_id'], warning['pattern_id'])]
         return warnings
     
-    def _check_prediction_condition(self, prediction, condition, value):
-        """Verifica se uma previsão atende a uma condição específica"""
+    def _prediction_condition_clause(self, condition, value):
+        """Cláusula SQL equivalente a uma condição de regra sobre previsões (None para condição desconhecida)"""
         if condition == 'probabilidade_acima':
-            return prediction.probability >= float(value)
+            return OccurrencePrediction.probability >= float(value)
         
         elif condition == 'tipo_ocorrencia':
-            return prediction.occurrence_type == value
+            return OccurrencePrediction.occurrence_type == value
         
         elif condition == 'localizacao':
-            return prediction.location == value
+            return OccurrencePrediction.location == value
         
         elif condition == 'data_proxima':
-            # Verificar se a data prevista está dentro dos próximos X dias
-            days = int(value)
-            if prediction.predicted_date_start:
-                return (prediction.predicted_date_start.date() - datetime.utcnow().date()).days <= days
+            # Data prevista dentro dos próximos X dias (até o fim do X-ésimo dia)
+            limit = datetime.combine(datetime.utcnow().date() + timedelta(days=int(value) + 1), datetime.min.time())
+            return OccurrencePrediction.predicted_date_start < limit
         
-        return False
+        return None
     
-    def _check_pattern_condition(self, pattern, condition, value):
-        """Verifica se um padrão atende a uma condição específica"""
+    def _pattern_condition_clause(self, condition, value):
+        """Cláusula SQL equivalente a uma condição de regra sobre padrões (None para condição desconhecida)"""
         if condition == 'confianca_acima':
-            return pattern.confidence >= float(value)
+            return OccurrencePattern.confidence >= float(value)
         
         elif condition == 'tipo_padrao':
-            return pattern.pattern_type == value
+            return OccurrencePattern.pattern_type == value
         
         elif condition == 'descricao_contem':
-            return value.lower() in pattern.description.lower()
+            return func.lower(OccurrencePattern.description).contains(value.lower(), autoescape=True)
+        
+        # Condições sobre os parâmetros tipados do padrão
+        elif condition == 'dia_semana':
+            return OccurrencePattern.weekday == int(value)
+        
+        elif condition == 'mes':
+            return OccurrencePattern.month == int(value)
         
-        return False
+        elif condition == 'unidade':
+            return OccurrencePattern.unit == value
+        
+        elif condition == 'tipo_ocorrencia':
+            return OccurrencePattern.occurrence_type == value
+        
+        return None
     
     def _generate_automated_warning(self, rule, prediction=None, pattern=None):
-        """Gera uma advertência automatizada baseada em uma regra"""
+        """Monta a linha de uma advertência automatizada baseada em uma regra"""
         # Determinar conteúdo da advertência
         if prediction:
             # Baseado na previsão
@@ -850,23 +1596,16 @@ class AIWarningManager:
             content = self._generate_generic_warning_content(rule.warning_template_id)
             target_units = []
         
-        # Criar advertência
-        warning = AutomatedWarning(
-            rule_id=rule.id,
-            prediction_id=prediction.id if prediction else None,
-            warning_content=content,
-            target_units=json.dumps(target_units),
-            status='aprovada' if rule.auto_send else 'pendente'
-        )
-        
-        # Se for envio automático, definir data de envio
-        if rule.auto_send:
-            warning.sent_date = datetime.utcnow()
-        
-        self.db_session.add(warning)
-        self.db_session.flush()  # Para obter o ID
-        
-        return warning
+        return {
+            'rule_id': rule.id,
+            'prediction_id': prediction.id if prediction else None,
+            'pattern_id': pattern.id if pattern else None,
+            'warning_content': content,
+            'target_units': json.dumps(target_units),
+            'status': 'aprovada' if rule.auto_send else 'pendente',
+            # Se for envio automático, definir data de envio
+            'sent_date': datetime.utcnow() if rule.auto_send else None
+        }
     
     def _generate_warning_content_from_prediction(self, prediction, template_id):
         """Gera conteúdo de advertência baseado em uma previsão"""
@@ -958,12 +1697,8 @@ class AIWarningManager:
     
     def _determine_target_units_from_pattern(self, pattern):
         """Determina unidades alvo com base em um padrão"""
-        if pattern.pattern_type == 'localização':
-            # Extrair unidade da descrição
-            import re
-            unit_match = re.search(r'unidade (\w+)', pattern.description)
-            if unit_match:
-                return [unit_match.group(1)]
+        if pattern.unit:
+            return [pattern.unit]
         
         # Caso contrário, simplificado para exemplo
         return []
@@ -983,6 +1718,7 @@ class AIWarningManager:
         warning.approval_date = datetime.utcnow()
         
         self.db_session.commit()
+        _bump_ai_dashboard_version()
         return True
     
     def send_automated_warning(self, warning_id):
@@ -1002,6 +1738,7 @@ class AIWarningManager:
         warning.sent_date = datetime.utcnow()
         
         self.db_session.commit()
+        _bump_ai_dashboard_version()
         return True
     
     def cancel_automated_warning(self, warning_id, reason=None):
@@ -1016,42 +1753,174 @@ class AIWarningManager:
         warning.status = 'cancelada'
         
         self.db_session.commit()
+        _bump_ai_dashboard_version()
         return True
     
-    def get_dashboard_data(self):
-        """Obtém dados para o dashboard de IA"""
-        # Contagem de padrões por tipo
-        pattern_counts = {}
-        patterns = self.db_session.query(OccurrencePattern).all()
-        for pattern in patterns:
-            pattern_counts[pattern.pattern_type] = pattern_counts.get(pattern.pattern_type, 0) + 1
+    def _pipeline_stages(self):
+        """Funções de cada etapa do pipeline; cada uma retorna o número de linhas produzidas"""
+        def train():
+            before = self.db_session.query(func.max(PredictionModelVersion.version)).scalar()
+            if not self.train_prediction_model():
+                return 0
+            current = self.db_session.query(PredictionModelVersion).filter_by(is_active=True).order_by(
+                PredictionModelVersion.version.desc()).first()
+            return current.training_rows if current and current.version != before else 0
         
-        # Contagem de previsões por status
-        prediction_status_counts = {}
-        predictions = self.db_session.query(OccurrencePrediction).all()
-        for prediction in predictions:
-            prediction_status_counts[prediction.status] = prediction_status_counts.get(prediction.status, 0) + 1
+        return {
+            'analyze': lambda: len(self.analyze_patterns()),
+            'train': train,
+            'lifecycle': lambda: sum(self.run_prediction_lifecycle().values()),
+            'predict': lambda: len(self.generate_predictions()),
+            'measures': lambda: len(self.generate_preventive_measures()),
+            'alerts': lambda: len(self.generate_preventive_alerts()),
+            'rules': lambda: len(self.process_automated_warning_rules())
+        }
+    
+    def _claim_pipeline_run(self, trigger, stale_after=PIPELINE_INTERVAL_SECONDS):
+        """Registra a execução como 'executando', ou None se outra já estiver em andamento.
         
-        # Contagem de advertências automatizadas por status
-        warning_status_counts = {}
-        warnings = self.db_session.query(AutomatedWarning).all()
-        for warning in warnings:
-            warning_status_counts[warning.status] = warning_status_counts.get(warning.status, 0) + 1
+        A exclusividade vem do índice único parcial uq_ai_pipeline_run_executando: de dois INSERTs
+        concorrentes (mesmo de processos diferentes) só um é gravado.
+        """
+        from models import Occurrence
+        
+        now = datetime.utcnow()
+        # Execuções 'executando' mais antigas que o intervalo ficaram de processos interrompidos: liberar a vaga
+        self.db_session.query(PipelineRun).filter(
+            PipelineRun.status == 'executando',
+            PipelineRun.started_at < now - timedelta(seconds=stale_after)
+        ).update({'status': 'falhou', 'finished_at': now}, synchronize_session=False)
+        run = PipelineRun(
+            trigger=trigger,
+            status='executando',
+            started_at=now,
+            last_occurrence_id=self.db_session.query(func.max(Occurrence.id)).scalar() or 0
+        )
+        self.db_session.add(run)
+        try:
+            self.db_session.commit()
+        except IntegrityError:
+            self.db_session.rollback()
+            return None
+        return run
+    
+    def run_pipeline(self, trigger='manual'):
+        """Executa as etapas na ordem do grafo PIPELINE_STAGES, registrando tempo e linhas de cada uma.
+        
+        Uma etapa que falha não interrompe as independentes dela; as que dependem dela são ignoradas.
+        Retorna None, sem executar, se outra execução já estiver em andamento.
+        """
+        run = self._claim_pipeline_run(trigger)
+        if run is None:
+            print("Pipeline de IA já em execução; disparo ignorado.")
+            return None
+        _bump_ai_dashboard_version()
+        
+        stages = self._pipeline_stages()
+        failed = set()
+        started = time.perf_counter()
+        for name in TopologicalSorter(PIPELINE_STAGES).static_order():
+            stage = PipelineStageRun(run_id=run.id, stage=name, started_at=datetime.utcnow())
+            if failed.intersection(PIPELINE_STAGES[name]):
+                stage.status = 'ignorada'
+                failed.add(name)
+            else:
+                stage_started = time.perf_counter()
+                try:
+                    stage.row_count = stages[name]()
+                    stage.status = 'concluida'
+                except Exception as e:
+                    self.db_session.rollback()
+                    print(f"Erro na etapa {name} do pipeline de IA: {e}")
+                    stage.status = 'falhou'
+                    stage.error = str(e)[:1000]
+                    failed.add(name)
+                stage.duration_ms = int((time.perf_counter() - stage_started) * 1000)
+            self.db_session.add(stage)
+            self.db_session.commit()
+            _bump_ai_dashboard_version()
+        
+        run.status = 'falhou' if failed else 'concluida'
+        run.finished_at = datetime.utcnow()
+        run.duration_ms = int((time.perf_counter() - started) * 1000)
+        self.db_session.commit()
+        _bump_ai_dashboard_version()
+        return run
+    
+    def get_pipeline_runs(self, limit=10):
+        """Histórico das últimas execuções do pipeline, com as etapas"""
+        runs = self.db_session.query(PipelineRun).options(selectinload(PipelineRun.stages)).order_by(
+            PipelineRun.id.desc()).limit(limit)
+        return [{
+            'id': run.id,
+            'trigger': run.trigger,
+            'status': run.status,
+            'started_at': run.started_at.strftime('%Y-%m-%d %H:%M'),
+            'duration_ms': run.duration_ms,
+            'stages': [{
+                'stage': stage.stage,
+                'status': stage.status,
+                'row_count': stage.row_count,
+                'duration_ms': stage.duration_ms,
+                'error': stage.error
+            } for stage in run.stages]
+        } for run in runs]
+    
+    def get_dashboard_data(self):
+        """Obtém dados para o dashboard de IA, em cache até a próxima escrita do pipeline.
         
-        # Previsões para os próximos 30 dias
+        Escritas deste processo invalidam na hora; etapas do pipeline executadas por outros processos são
+        percebidas pelo id da última etapa registrada, e as demais escritas em até DASHBOARD_CACHE_SECONDS.
+        """
         today = datetime.utcnow().date()
+        last_stage_id = self.db_session.query(func.max(PipelineStageRun.id)).scalar()
+        key = (AI_DASHBOARD_STATE['version'], last_stage_id, today)
+        cached = self._dashboard_cache
+        if cached and cached['key'] == key and time.monotonic() - cached['computed_at'] < DASHBOARD_CACHE_SECONDS:
+            return cached['data']
+        
+        data = self._compute_dashboard_data(today)
+        self._dashboard_cache = {'key': key, 'data': data, 'computed_at': time.monotonic()}
+        return data
+    
+    def _compute_dashboard_data(self, today, days=30):
+        """Contagens por tipo/status com GROUP BY e a série de previsões dos próximos dias numa única consulta"""
+        def count_by(column, model):
+            return {value: count for value, count in self.db_session.query(column, func.count(model.id)).group_by(column)}
+        
+        # Contagem de padrões por tipo, previsões e advertências automatizadas por status
+        pattern_counts = count_by(OccurrencePattern.pattern_type, OccurrencePattern)
+        prediction_status_counts = count_by(OccurrencePrediction.status, OccurrencePrediction)
+        warning_status_counts = count_by(AutomatedWarning.status, AutomatedWarning)
+        
+        # Previsões para os próximos dias: previsões ativas agrupadas por (dia inicial, dia final) e
+        # distribuídas nos dias do intervalo com um vetor de diferenças
+        start_day = func.date(OccurrencePrediction.predicted_date_start)
+        end_day = func.date(OccurrencePrediction.predicted_date_end)
+        intervals = self.db_session.query(start_day, end_day, func.count(OccurrencePrediction.id)).filter(
+            OccurrencePrediction.status == 'ativa',
+            OccurrencePrediction.predicted_date_start < datetime.combine(today + timedelta(days=days), datetime.min.time()),
+            OccurrencePrediction.predicted_date_end >= datetime.combine(today, datetime.min.time())
+        ).group_by(start_day, end_day)
+        
+        differences = [0] * (days + 1)
+        for first_day, last_day, count in intervals:
+            # SQLite devolve a data como texto
+            first_day = first_day if isinstance(first_day, date) else date.fromisoformat(first_day)
+            last_day = last_day if isinstance(last_day, date) else date.fromisoformat(last_day)
+            first = max((first_day - today).days, 0)
+            last = min((last_day - today).days, days - 1)
+            if first <= last:
+                differences[first] += count
+                differences[last + 1] -= count
+        
         upcoming_predictions = []
-        for i in range(30):
-            date = today + timedelta(days=i)
-            count = self.db_session.query(OccurrencePrediction).filter(
-                OccurrencePrediction.predicted_date_start <= datetime.combine(date, datetime.max.time()),
-                OccurrencePrediction.predicted_date_end >= datetime.combine(date, datetime.min.time()),
-                OccurrencePrediction.status == 'ativa'
-            ).count()
-            
+        running = 0
+        for i in range(days):
+            running += differences[i]
             upcoming_predictions.append({
-                'date': date.strftime('%Y-%m-%d'),
-                'count': count
+                'date': (today + timedelta(days=i)).strftime('%Y-%m-%d'),
+                'count': running
             })
         
         # Alertas recentes
@@ -1070,9 +1939,87 @@ class AIWarningManager:
             'prediction_status_counts': prediction_status_counts,
             'warning_status_counts': warning_status_counts,
             'upcoming_predictions': upcoming_predictions,
-            'recent_alerts': recent_alerts
+            'recent_alerts': recent_alerts,
+            'pipeline_runs': self.get_pipeline_runs()
         }
 
+class AIPipelineWorker:
+    """Executa o pipeline de IA em segundo plano: periodicamente, quando chegam ocorrências novas ou sob demanda.
+    
+    Usa sessão própria; a decisão de executar consulta o histórico no banco, compartilhado entre processos.
+    """
+    
+    def __init__(self, engine_getter, models_folder=None, interval=PIPELINE_INTERVAL_SECONDS, min_gap=PIPELINE_MIN_GAP_SECONDS):
+        self._engine_getter = engine_getter
+        self._models_folder = models_folder
+        self.interval = interval
+        self.min_gap = min_gap
+        self._queue = queue.Queue()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._manager = None
+    
+    def start(self):
+        """Inicia a thread do pipeline em segundo plano"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='ai-pipeline', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+    
+    def stop(self):
+        """Interrompe a thread, aguardando até 5 s o fim da execução em andamento"""
+        self._stopped.set()
+        self._queue.put(None)
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=5)
+    
+    def trigger(self):
+        """Agenda uma execução imediata"""
+        self._queue.put('manual')
+    
+    def _get_manager(self):
+        if self._manager is None:
+            session = sessionmaker(bind=self._engine_getter())()
+            self._manager = AIWarningManager(session, self._models_folder)
+        return self._manager
+    
+    def _due_trigger(self):
+        """Motivo para executar agora (agendado ou novos_dados), ou None"""
+        from models import Occurrence
+        
+        session = self._get_manager().db_session
+        last = session.query(PipelineRun).order_by(PipelineRun.id.desc()).first()
+        if last is None:
+            return 'agendado'
+        elapsed = (datetime.utcnow() - last.started_at).total_seconds()
+        if last.status == 'executando' and elapsed < self.interval:
+            return None  # Outra execução em andamento; a exclusividade é garantida em _claim_pipeline_run
+        if elapsed >= self.interval:
+            return 'agendado'
+        if elapsed >= self.min_gap:
+            max_id = session.query(func.max(Occurrence.id)).scalar() or 0
+            if max_id > (last.last_occurrence_id or 0):
+                return 'novos_dados'
+        return None
+    
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                trigger = self._queue.get(timeout=PIPELINE_CHECK_SECONDS)
+            except queue.Empty:
+                trigger = None
+            if self._stopped.is_set():
+                break
+            try:
+                trigger = trigger or self._due_trigger()
+                if trigger:
+                    self._get_manager().run_pipeline(trigger)
+            except Exception as e:
+                print(f"Erro ao executar o pipeline de IA: {e}")
+                self._get_manager().db_session.rollback()
+
 # Função para criar tabelas no banco de dados
 def create_ai_warning_tables(engine):
     """Cria as tabelas necessárias para o sistema de IA e advertências automatizadas"""
@@ -1081,7 +2028,16 @@ def create_ai_warning_tables(engine):
 # Rotas Flask para o sistema de IA e advertências automatizadas (a serem integradas ao app.py)
 def register_ai_warning_routes(app, db):
     """Registra as rotas para o sistema de IA e advertências automatizadas"""
-    ai_manager = AIWarningManager(db.session)
+    models_folder = os.path.join(app.root_path, 'modelos_ia')
+    ai_manager = AIWarningManager(db.session, models_folder)
+    
+    def get_engine():
+        with app.app_context():
+            return db.engine
+    
+    # Pipeline completo (análise -> previsões -> medidas -> alertas -> regras) em segundo plano
+    pipeline_worker = AIPipelineWorker(get_engine, models_folder)
+    pipeline_worker.start()
     
     @app.route('/ai/dashboard')
     @login_required
@@ -1129,7 +2085,7 @@ def register_ai_warning_routes(app, db):
     @login_required
     def ai_analyze():
         """Rota para analisar padrões"""
-        patterns = ai_manager.analyze_patterns()
+        patterns = ai_manager.analyze_patterns(full=request.form.get('full') == 'true')
         
         return jsonify({
             'success': True,
@@ -1146,7 +2102,7 @@ def register_ai_warning_routes(app, db):
         return jsonify({
             'success': True,
             'message': f'Previsão concluída. {len(predictions)} previsões geradas.',
-            'predictions': [{'id': p.id, 'type': p.prediction_type, 'probability': p.probability} for p in predictions]
+            'predictions': [{'id': p['id'], 'type': p['prediction_type'], 'probability': p['probability']} for p in predictions]
         })
     
     @app.route('/ai/generate-measures', methods=['POST'])
@@ -1182,7 +2138,7 @@ def register_ai_warning_routes(app, db):
         return jsonify({
             'success': True,
             'message': f'{len(alerts)} alertas preventivos gerados.',
-            'alerts': [{'id': a.id, 'title': a.title, 'level': a.alert_level} for a in alerts]
+            'alerts': [{'id': a['id'], 'title': a['title'], 'level': a['alert_level']} for a in alerts]
         })
     
     @app.route('/ai/process-rules', methods=['POST'])
@@ -1194,9 +2150,35 @@ def register_ai_warning_routes(app, db):
         return jsonify({
             'success': True,
             'message': f'{len(warnings)} advertências automatizadas geradas.',
-            'warnings': [{'id': w.id, 'status': w.status} for w in warnings]
+            'warnings': [{'id': w['id'], 'status': w['status']} for w in warnings]
         })
     
+    @app.route('/ai/pipeline/run', methods=['POST'])
+    @login_required
+    def ai_run_pipeline():
+        """Rota para agendar uma execução imediata do pipeline de IA"""
+        pipeline_worker.trigger()
+        
+        return jsonify({
+            'success': True,
+            'message': 'Pipeline agendado. Acompanhe o andamento no histórico de execuções.'
+        }), 202
+    
+    @app.route('/api/ai/pipeline-runs')
+    @login_required
+    def api_ai_pipeline_runs():
+        """API para obter o histórico de execuções do pipeline de IA"""
+        limit = min(request.args.get('limit', 10, type=int), 100)
+        return jsonify(ai_manager.get_pipeline_runs(limit))
+    
+    @app.route('/api/ai/forecast-calibration')
+    @login_required
+    def api_ai_forecast_calibration():
+        """API para obter a calibração do modelo de taxas sazonais nas últimas semanas"""
+        origins = min(max(request.args.get('origins', 4, type=int), 1), 12)
+        horizon_days = min(max(request.args.get('horizon_days', 7, type=int), 1), 30)
+        return jsonify(ai_manager.backtest_forecast(origins, horizon_days))
+    
     @app.route('/ai/approve-warning/<int:warning_id>', methods=['POST'])
     @login_required
     def ai_approve_warning(warning_id):
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""Benchmark de AIWarningManager.get_dashboard_data (usado por /api/ai/dashboard-data).
+
+Cenário: 50.000 previsões espalhadas em 90 dias, 1.000 padrões e 5.000 advertências, em SQLite em memória.
+
+Uso (a partir de agente_advertencias/backend):
+    python benchmarks/bench_ai_dashboard.py [--predictions 50000]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from ai_warning_system import (Base, OccurrencePattern, OccurrencePrediction, AutomatedWarningRule, AutomatedWarning,
+                               AIWarningManager, _bump_ai_dashboard_version)
+
+
+def populate(session, prediction_count, rng):
+    """Insere padrões, previsões e advertências sintéticos"""
+    session.bulk_insert_mappings(OccurrencePattern, [{
+        'pattern_type': rng.choice(['sazonal', 'localização', 'tipo']),
+        'dimension': 'sintético',
+        'dimension_value': str(i),
+        'description': f"Padrão sintético {i}",
+        'confidence': rng.random()
+    } for i in range(1000)])
+    session.add(AutomatedWarningRule(name='Regra', description='Regra sintética', trigger_type='previsão',
+                                     trigger_condition='probabilidade_acima', trigger_value='0.5'))
+    session.flush()
+    start = datetime.utcnow() - timedelta(days=30)
+    predictions = []
+    for i in range(prediction_count):
+        begin = start + timedelta(days=rng.randrange(90), hours=rng.randrange(24))
+        predictions.append({
+            'pattern_id': 1 + i % 1000,
+            'prediction_type': 'sazonal',
+            'probability': rng.random(),
+            'predicted_date_start': begin,
+            'predicted_date_end': begin + timedelta(hours=rng.choice([1, 12, 36, 24 * 30])),
+            'status': rng.choice(['ativa', 'ativa', 'ativa', 'expirada', 'confirmada'])
+        })
+    session.bulk_insert_mappings(OccurrencePrediction, predictions)
+    session.bulk_insert_mappings(AutomatedWarning, [{
+        'rule_id': 1,
+        'prediction_id': i + 1,
+        'status': rng.choice(['pendente', 'aprovada', 'enviada', 'cancelada'])
+    } for i in range(5000)])
+    session.commit()
+
+
+def timed(function, repeat=1):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--predictions', type=int, default=50000)
+    args = parser.parse_args()
+
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    populate(session, args.predictions, random.Random(42))
+    manager = AIWarningManager(session)
+
+    print(f"{args.predictions} previsões")
+    print(f"Sem cache: {timed(manager.get_dashboard_data):.1f} ms")
+    print(f"Com cache: {timed(manager.get_dashboard_data, repeat=100):.2f} ms")
+    _bump_ai_dashboard_version()
+    print(f"Após invalidação: {timed(manager.get_dashboard_data):.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
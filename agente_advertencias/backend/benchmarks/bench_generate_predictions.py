@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""Benchmark de AIWarningManager.generate_predictions.
+
+Cenário: 1.000 padrões (dia da semana, período do dia, mês, unidade e tipo), em SQLite em memória.
+Mede a geração das linhas sem o modelo de taxas sazonais (ver bench_occurrence_forecast.py).
+
+Uso (a partir de agente_advertencias/backend):
+    python benchmarks/bench_generate_predictions.py [--patterns 1000]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from ai_warning_system import Base, OccurrencePattern, OccurrencePrediction, AIWarningManager, DAY_PERIODS
+
+
+def populate_patterns(session, pattern_count, rng):
+    """Insere padrões sintéticos com parâmetros tipados"""
+    patterns = []
+    for i in range(pattern_count):
+        dimension = ['weekday', 'hour', 'month', 'unit', 'type'][i % 5]
+        pattern = {
+            'pattern_type': {'unit': 'localização', 'type': 'tipo'}.get(dimension, 'sazonal'),
+            'dimension': dimension,
+            'dimension_value': f"{dimension}-{i}",
+            'description': f"Padrão sintético {i}",
+            'confidence': rng.uniform(0.3, 0.95),
+            'version': 1
+        }
+        if dimension == 'weekday':
+            pattern['weekday'] = rng.randrange(7)
+        elif dimension == 'hour':
+            pattern['hour_start'], pattern['hour_end'] = rng.choice(list(DAY_PERIODS.values()))
+        elif dimension == 'month':
+            pattern['month'] = rng.randint(1, 12)
+        elif dimension == 'unit':
+            pattern['unit'] = str(100 + i)
+        else:
+            pattern['occurrence_type'] = rng.choice(['barulho', 'obras', 'animais', 'lixo'])
+        patterns.append(pattern)
+    session.bulk_insert_mappings(OccurrencePattern, patterns)
+    session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--patterns', type=int, default=1000)
+    args = parser.parse_args()
+
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    populate_patterns(session, args.patterns, random.Random(42))
+    manager = AIWarningManager(session)
+
+    started = time.perf_counter()
+    predictions = manager.generate_predictions(use_forecast=False)
+    elapsed = time.perf_counter() - started
+    print(f"{args.patterns} padrões: {len(predictions)} previsões em {elapsed * 1000:.1f} ms "
+          f"({len(predictions) / elapsed:,.0f} linhas/s)")
+
+    # Nova versão de todos os padrões: as previsões anteriores são substituídas na mesma transação
+    session.query(OccurrencePattern).update({'version': OccurrencePattern.version + 1})
+    session.commit()
+    started = time.perf_counter()
+    predictions = manager.generate_predictions(use_forecast=False)
+    elapsed = time.perf_counter() - started
+    active = session.query(OccurrencePrediction).filter_by(status='ativa').count()
+    print(f"Regeneração: {len(predictions)} previsões em {elapsed * 1000:.1f} ms "
+          f"({len(predictions) / elapsed:,.0f} linhas/s), {active} ativas")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""Benchmark de LawIntegrationManager.analyze_regulation_for_law_references.
+
+Cenário: 5.000 leis ativas e uma convenção de 300 artigos, em SQLite em memória.
+
+Uso (a partir de agente_advertencias/backend):
+    python benchmarks/bench_law_references.py [--laws 5000] [--articles 300]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from law_integration import Base, Law, LawArticle, RegulationLawMapping, LawIntegrationManager
+
+
+def populate_laws(session, law_count):
+    """Insere leis sintéticas (com dois artigos cada) em lote"""
+    laws = []
+    articles = []
+    for i in range(1, law_count + 1):
+        laws.append({
+            'id': i,
+            'title': f"Lei de Convivência Condominial {i}",
+            'number': f"Lei Municipal nº {i}/{2000 + i % 25}",
+            'jurisdiction': 'municipal',
+            'category': 'geral',
+            'summary': f"Lei sintética {i}",
+            'full_text': f"Art. 1º - Disposição {i}. Art. 2º - Disposição complementar {i}.",
+            'is_active': True
+        })
+        articles.append({'law_id': i, 'article_number': 'Art. 1º', 'content': f"Disposição {i}."})
+        articles.append({'law_id': i, 'article_number': 'Art. 2º', 'content': f"Disposição complementar {i}."})
+    session.bulk_insert_mappings(Law, laws)
+    session.bulk_insert_mappings(LawArticle, articles)
+    session.commit()
+
+
+def write_convention(folder, article_count, law_count):
+    """Gera uma convenção sintética em que cerca de um terço dos artigos cita alguma lei"""
+    rng = random.Random(42)
+    articles = []
+    for i in range(1, article_count + 1):
+        text = (
+            "Os condôminos devem respeitar as normas de convivência, o sossego e a segurança dos demais moradores, "
+            "observados os horários definidos pelo síndico e aprovados em assembleia. "
+        ) * 3
+        if i % 3 == 0:
+            law = rng.randint(1, law_count)
+            text += f"Aplica-se o disposto na Lei Municipal nº {law}/{2000 + law % 25}."
+        articles.append({'title': f"Artigo {i}", 'text': text})
+    with open(os.path.join(folder, 'convencao_condominial_artigos.json'), 'w', encoding='utf-8') as f:
+        json.dump(articles, f, ensure_ascii=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--laws', type=int, default=5000)
+    parser.add_argument('--articles', type=int, default=300)
+    args = parser.parse_args()
+
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    populate_laws(session, args.laws)
+
+    with tempfile.TemporaryDirectory() as folder:
+        write_convention(folder, args.articles, args.laws)
+        manager = LawIntegrationManager(session, folder)
+
+        start = time.perf_counter()
+        manager.analyze_regulation_for_law_references()
+        cold = time.perf_counter() - start
+
+        # Segunda execução: autômato já compilado, mapeamentos existentes são atualizados
+        start = time.perf_counter()
+        manager.analyze_regulation_for_law_references()
+        warm = time.perf_counter() - start
+
+    mappings = session.query(RegulationLawMapping).count()
+    print(f"{args.laws} leis x {args.articles} artigos")
+    print(f"  primeira análise (compila o autômato): {cold * 1000:.1f} ms")
+    print(f"  reanálise (upsert dos mapeamentos):    {warm * 1000:.1f} ms")
+    print(f"  mapeamentos gravados: {mappings}")
+
+
+if __name__ == '__main__':
+    main()
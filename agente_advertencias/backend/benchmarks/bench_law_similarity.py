@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""Benchmark do motor de similaridade TF-IDF (law_similarity).
+
+Cenário: 10.000 artigos de regimento/convenção contra 10.000 artigos de lei sintéticos, com palavras
+sorteadas de um vocabulário de 20.000 termos segundo uma distribuição de Zipf (como em textos reais).
+
+Uso (a partir de agente_advertencias/backend):
+    python benchmarks/bench_law_similarity.py [--regulation 10000] [--laws 10000] [--top-k 3]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from law_similarity import HashedTfidfVectorizer, top_k_cosine
+
+DOMAIN_WORDS = (
+    "condômino síndico assembleia convenção regimento unidade área comum garagem vaga veículo "
+    "barulho ruído silêncio horário noturno obra reforma manutenção animal cachorro coleira "
+    "piscina salão festa lixo coleta reciclagem segurança portaria visitante multa advertência "
+    "despesa rateio fundo reserva quórum votação locação inquilino proprietário fachada janela "
+    "elevador mudança entrega limpeza infração penalidade prazo notificação recurso"
+).split()
+
+
+VOCABULARY = DOMAIN_WORDS + [f"termo{i}" for i in range(20000 - len(DOMAIN_WORDS))]
+# Pesos de Zipf: a n-ésima palavra mais comum aparece com frequência proporcional a 1/n
+ZIPF_WEIGHTS = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+
+
+def synthetic_texts(count, rng, words=40):
+    return [' '.join(rng.choices(VOCABULARY, weights=ZIPF_WEIGHTS, k=words)) for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--regulation', type=int, default=10000)
+    parser.add_argument('--laws', type=int, default=10000)
+    parser.add_argument('--top-k', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    regulation = synthetic_texts(args.regulation, rng)
+    laws = synthetic_texts(args.laws, rng, words=60)
+
+    started = time.perf_counter()
+    vectorizer = HashedTfidfVectorizer()
+    vectors = vectorizer.fit_transform(regulation + laws)
+    vectorized = time.perf_counter()
+    rows, cols, scores = top_k_cosine(vectors[:len(regulation)], vectors[len(regulation):], k=args.top_k)
+    finished = time.perf_counter()
+
+    print(f"{args.regulation} x {args.laws} artigos, top-{args.top_k}")
+    print(f"Vetorização: {vectorized - started:.2f} s")
+    print(f"Similaridade (produto esparso em lotes): {finished - vectorized:.2f} s")
+    print(f"Total: {finished - started:.2f} s, {len(scores)} pares candidatos")
+
+
+if __name__ == '__main__':
+    main()
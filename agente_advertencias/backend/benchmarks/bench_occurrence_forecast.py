@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""Benchmark do modelo de taxas sazonais (occurrence_forecast) e da sua calibração (forecast_backtest).
+
+Cenário: 1.000 unidades x 8 categorias em 365 dias, com ocorrências sorteadas de um processo de Poisson
+cuja taxa combina a intensidade da unidade (Gamma, bem heterogênea), o perfil semanal da categoria e o
+período do dia. O backtest avalia 4 datas de corte semanais nos dias finais.
+
+Uso (a partir de agente_advertencias/backend):
+    python benchmarks/bench_occurrence_forecast.py [--units 1000] [--categories 8] [--days 365]
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_warning_system import DAY_PERIODS
+from occurrence_forecast import SeasonalRateModel, weekdays_of
+from forecast_backtest import rolling_origin_backtest, format_calibration_report
+
+
+def synthetic_occurrences(units, categories, days, rng, start=np.datetime64('2024-01-01')):
+    """Índices de unidade, categoria e horários (datetime64[m]) de ocorrências sintéticas"""
+    calendar = np.arange(start, start + days, dtype='datetime64[D]')
+    periods = list(DAY_PERIODS.values())
+    unit_intensity = rng.gamma(0.8, 1.25, size=(units, categories))
+    weekly_profile = 1 + 0.6 * np.sin(np.arange(7)[None, :] + rng.uniform(0, 2 * np.pi, size=(categories, 1)))
+    period_profile = rng.dirichlet(np.ones(len(periods)) * 2, size=categories)
+    # ~0,02 ocorrência por unidade e categoria por dia
+    rates = 0.02 * (unit_intensity[:, :, None, None]
+                    * weekly_profile[None, :, weekdays_of(calendar), None]
+                    * period_profile[None, :, None, :] * len(periods))
+    counts = rng.poisson(rates)
+
+    unit, category, day, period = np.nonzero(counts)
+    repeat = counts[unit, category, day, period]
+    unit, category, day, period = (np.repeat(a, repeat) for a in (unit, category, day, period))
+    starts = np.array([start_hour for start_hour, _ in periods])[period]
+    lengths = np.array([(end - start_hour) % 24 or 24 for start_hour, end in periods])[period]
+    minutes = (starts * 60 + (rng.random(unit.size) * lengths * 60).astype(np.int64)) % (24 * 60)
+    # Horas da madrugada pertencem ao período "noite" do próprio dia no calendário
+    timestamps = calendar[day].astype('datetime64[m]') + minutes.astype('timedelta64[m]')
+    return unit, category, timestamps, calendar
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--units', type=int, default=1000)
+    parser.add_argument('--categories', type=int, default=8)
+    parser.add_argument('--days', type=int, default=365)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    unit, category, timestamps, calendar = synthetic_occurrences(args.units, args.categories, args.days, rng)
+    print(f"{args.units} unidades x {args.categories} categorias, {args.days} dias: {unit.size} ocorrências")
+
+    started = time.perf_counter()
+    model = SeasonalRateModel(args.units, args.categories, periods=DAY_PERIODS, half_life_days=180)
+    model.fit(unit, category, timestamps)
+    fitted = time.perf_counter()
+    dates = np.arange(calendar[-1] + 1, calendar[-1] + 31, dtype='datetime64[D]')
+    cells = model.predict_proba(dates, keep=('unit', 'category', 'period'))
+    predicted = time.perf_counter()
+    print(f"Ajuste: {(fitted - started) * 1000:.1f} ms")
+    print(f"Previsão de 30 dias ({cells.size} células): {(predicted - fitted) * 1000:.1f} ms")
+
+    origins = calendar[-28::7]
+    started = time.perf_counter()
+    for distribution in ('negbin', 'poisson'):
+        report = rolling_origin_backtest(unit, category, timestamps, args.units, args.categories, origins,
+                                         periods=DAY_PERIODS, half_life_days=180, distribution=distribution)
+        print(f"\nBacktest ({distribution}, cortes {', '.join(report['origins'])}):")
+        print(format_calibration_report(report))
+    print(f"\nBacktests: {time.perf_counter() - started:.2f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""Benchmark de AIWarningManager.generate_preventive_alerts.
+
+Cenário: 10.000 previsões ativas (sazonais, por unidade e por tipo) com as medidas preventivas do catálogo,
+em SQLite em memória; conta também as consultas SQL emitidas.
+
+Uso (a partir de agente_advertencias/backend):
+    python benchmarks/bench_preventive_alerts.py [--predictions 10000]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from ai_warning_system import Base, OccurrencePattern, OccurrencePrediction, PreventiveAlert, AIWarningManager, PREVENTIVE_CATALOG
+
+
+def populate_predictions(session, prediction_count, rng):
+    """Insere previsões ativas sintéticas, ligadas a um único padrão"""
+    pattern = OccurrencePattern(pattern_type='tipo', dimension='type', dimension_value='sintético',
+                                description='Padrão sintético', confidence=0.5)
+    session.add(pattern)
+    session.flush()
+    start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    predictions = []
+    for i in range(prediction_count):
+        prediction_type = rng.choice(['sazonal', 'localização', 'tipo'])
+        day = start + timedelta(days=i % 30)
+        predictions.append({
+            'pattern_id': pattern.id,
+            'prediction_type': prediction_type,
+            'occurrence_type': rng.choice(list(PREVENTIVE_CATALOG)) if prediction_type == 'tipo' else None,
+            'location': str(100 + i % 300) if prediction_type == 'localização' else None,
+            'probability': rng.uniform(0.5, 0.95),
+            'predicted_date_start': day,
+            'predicted_date_end': day + timedelta(hours=23 if i % 2 else 36),
+            'status': 'ativa'
+        })
+    session.bulk_insert_mappings(OccurrencePrediction, predictions)
+    session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--predictions', type=int, default=10000)
+    args = parser.parse_args()
+
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    populate_predictions(session, args.predictions, random.Random(42))
+    manager = AIWarningManager(session)
+    manager.generate_preventive_measures()
+
+    statements = []
+    event.listen(engine, 'before_cursor_execute', lambda *event_args: statements.append(event_args[2]))
+    started = time.perf_counter()
+    alerts = manager.generate_preventive_alerts()
+    elapsed = time.perf_counter() - started
+    print(f"{args.predictions} previsões: {len(alerts)} alertas em {elapsed * 1000:.1f} ms "
+          f"({len(alerts) / elapsed:,.0f} alertas/s), {len(statements)} consultas SQL")
+
+    # Segunda execução: as previsões já têm alerta e nada é gerado
+    statements.clear()
+    started = time.perf_counter()
+    alerts = manager.generate_preventive_alerts()
+    elapsed = time.perf_counter() - started
+    total = session.query(PreventiveAlert).count()
+    print(f"Reexecução: {len(alerts)} alertas novos em {elapsed * 1000:.1f} ms, {len(statements)} consultas SQL, {total} no total")
+
+
+if __name__ == '__main__':
+    main()
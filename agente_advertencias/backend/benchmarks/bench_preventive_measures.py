@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""Benchmark de AIWarningManager.generate_preventive_measures.
+
+Cenário: 1.000 previsões ativas de tipos variados, em SQLite em memória; conta também as consultas SQL emitidas.
+
+Uso (a partir de agente_advertencias/backend):
+    python benchmarks/bench_preventive_measures.py [--predictions 1000]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from ai_warning_system import Base, OccurrencePattern, OccurrencePrediction, PredictionMeasureMapping, AIWarningManager, PREVENTIVE_CATALOG
+
+
+def populate_predictions(session, prediction_count, rng):
+    """Insere previsões ativas sintéticas, ligadas a um único padrão"""
+    pattern = OccurrencePattern(pattern_type='tipo', dimension='type', dimension_value='sintético',
+                                description='Padrão sintético', confidence=0.5)
+    session.add(pattern)
+    session.flush()
+    types = list(PREVENTIVE_CATALOG) + [None]
+    start = datetime.utcnow()
+    session.bulk_insert_mappings(OccurrencePrediction, [{
+        'pattern_id': pattern.id,
+        'prediction_type': 'tipo',
+        'occurrence_type': rng.choice(types),
+        'probability': rng.uniform(0.3, 0.95),
+        'predicted_date_start': start + timedelta(days=i % 30),
+        'predicted_date_end': start + timedelta(days=i % 30, hours=23),
+        'status': 'ativa'
+    } for i in range(prediction_count)])
+    session.commit()
+
+
+def timed_run(manager, statements):
+    statements.clear()
+    started = time.perf_counter()
+    mappings = manager.generate_preventive_measures()
+    return mappings, time.perf_counter() - started, len(statements)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--predictions', type=int, default=1000)
+    args = parser.parse_args()
+
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    statements = []
+    event.listen(engine, 'before_cursor_execute', lambda *event_args: statements.append(event_args[2]))
+    session = sessionmaker(bind=engine)()
+    populate_predictions(session, args.predictions, random.Random(42))
+    manager = AIWarningManager(session)
+
+    mappings, elapsed, queries = timed_run(manager, statements)
+    print(f"{args.predictions} previsões: {len(mappings)} mapeamentos em {elapsed * 1000:.1f} ms, {queries} consultas SQL")
+
+    # Segunda execução: todos os pares já existem e nada é inserido
+    mappings, elapsed, queries = timed_run(manager, statements)
+    total = session.query(PredictionMeasureMapping).count()
+    print(f"Reexecução: {len(mappings)} mapeamentos novos em {elapsed * 1000:.1f} ms, {queries} consultas SQL, {total} no total")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,13 +2,21 @@
 import os
 import re
 import json
+import time
+import atexit
+import threading
+from collections import deque, Counter
+from cachetools import TTLCache
 from flask import Flask, render_template, request, jsonify, redirect, url_for, flash
 from flask_login import login_required, current_user
-from sqlalchemy import create_engine, Column, Integer, String, Text, Boolean, DateTime, ForeignKey
+from sqlalchemy import create_engine, Column, Integer, String, Text, Boolean, DateTime, ForeignKey, func
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, sessionmaker
 from datetime import datetime
 
+from search_index import TrigramIndex, PrefixIndex, normalize_text, tokenize, highlight_terms
+from law_integration import Law
+
 Base = declarative_base()
 
 # Modelos para a interface de consulta avulsa
@@ -37,20 +45,394 @@ class DocumentFavorite(Base):
     # Relacionamento com o usuário (se implementado)
     # user = relationship("User", back_populates="favorites")
 
+# Fila de gravação do histórico de pesquisas (write-behind)
+class SearchHistoryBuffer:
+    """Mantém o histórico de pesquisas em memória e o grava em lotes, numa única transação, em segundo plano.
+    
+    Em caso de queda do processo, perdem-se no máximo os eventos de um intervalo de gravação.
+    Com o banco indisponível, a fila guarda até max_pending eventos: ao passar disso os mais antigos
+    são descartados (contados em dropped e registrados no log), preservando o histórico mais recente.
+    """
+    
+    def __init__(self, engine_getter, flush_interval=2.0, batch_size=200, max_pending=10000):
+        self._engine_getter = engine_getter
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self._pending = deque()
+        self.dropped = 0
+        self._drop_logged = False
+        self._in_flight = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        """Inicia a thread de gravação em segundo plano"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='search-history-flusher', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+    
+    def stop(self):
+        """Interrompe a thread e grava o que estiver pendente"""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=self.flush_interval * 2)
+        self.flush()
+    
+    def add(self, user_id, search_term, document_type=None):
+        """Enfileira um evento de pesquisa (sem acessar o banco)"""
+        with self._lock:
+            self._pending.append({
+                'user_id': user_id,
+                'search_term': search_term,
+                'document_type': document_type,
+                'created_at': datetime.utcnow()
+            })
+            self._drop_oldest()
+            pending_count = len(self._pending)
+        if pending_count >= self.batch_size:
+            self._wake.set()
+    
+    def pending_for_user(self, user_id):
+        """Eventos ainda não gravados de um usuário"""
+        with self._lock:
+            return [event for event in list(self._in_flight) + list(self._pending) if event['user_id'] == user_id]
+    
+    def flush(self):
+        """Grava todos os eventos pendentes em uma única transação; retorna quantos foram gravados"""
+        with self._flush_lock:
+            with self._lock:
+                batch = list(self._pending)
+                self._pending.clear()
+                self._in_flight = batch
+            if not batch:
+                return 0
+            
+            try:
+                with self._engine_getter().begin() as connection:
+                    connection.execute(DocumentSearch.__table__.insert(), batch)
+                with self._lock:
+                    # Gravado: deixa de ser listado como pendente junto com o fim da gravação
+                    self._in_flight = []
+                    if self._drop_logged:
+                        print(f"Histórico de pesquisas: gravação retomada ({self.dropped} evento(s) descartado(s) no total)")
+                    self._drop_logged = False
+                return len(batch)
+            except Exception as e:
+                print(f"Erro ao gravar histórico de pesquisas: {e}")
+                # Devolver o lote à frente da fila (é mais antigo que o que chegou durante a gravação)
+                with self._lock:
+                    self._pending.extendleft(reversed(batch))
+                    self._drop_oldest()
+                return 0
+            finally:
+                with self._lock:
+                    self._in_flight = []
+    
+    def _drop_oldest(self):
+        """Descarta os eventos mais antigos acima de max_pending (chamar com self._lock adquirido)"""
+        excess = len(self._pending) - self.max_pending
+        if excess <= 0:
+            return
+        for _ in range(excess):
+            self._pending.popleft()
+        self.dropped += excess
+        # Um registro por período de fila cheia (até a próxima gravação bem-sucedida), não um por evento
+        if not self._drop_logged:
+            self._drop_logged = True
+            print(f"Histórico de pesquisas: fila cheia, descartando os eventos mais antigos "
+                  f"({self.dropped} descartado(s) até agora)")
+    
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+# Padrões para referências a artigos ("Artigo 15", "Art. 12-A", "Art. 1.336, § 2º, inciso III")
+_ARTICLE_NUMBER_RE = re.compile(r'\bart(?:igo|\.)?\s*(\d+(?:\.\d{3})*)[º°o]?(?:-([A-Za-z])\b)?', re.IGNORECASE)
+_PARAGRAPH_RE = re.compile(r'§\s*(\d+)\s*[º°o]?|par[áa]grafo\s+([úu]nico|\d+)', re.IGNORECASE)
+_INCISO_REF_RE = re.compile(r'\b[Ii]nciso\s+([IVXLCivxlc]+)\b|,\s*([IVXLC]+)\b')
+_INCISO_TEXT_RE = re.compile(r'(?:^|(?<=[\s;:.]))([IVXLC]+)\s*[-–—)]\s', re.MULTILINE)
+
+def _article_sort_key(number):
+    """Ordenação numérica de artigos ('12' < '12-A' < '13')"""
+    base, _, suffix = number.partition('-')
+    return (int(base), suffix)
+
+def _paragraph_key(match):
+    """Chave normalizada de um parágrafo (§ 2º -> '§2', Parágrafo único -> '§unico')"""
+    value = match.group(1) or match.group(2)
+    return '§unico' if value.lower() in ('único', 'unico') else f'§{int(value)}'
+
+def parse_article_reference(reference):
+    """Converte uma referência textual em chave de índice: (artigo[, §][, inciso]) ou None"""
+    if not reference:
+        return None
+    article_match = _ARTICLE_NUMBER_RE.search(reference)
+    if not article_match:
+        # Aceitar apenas o número ("15", "15-A")
+        number_match = re.match(r'^\s*(\d+(?:\.\d{3})*)(?:-([A-Za-z]))?\s*$', reference)
+        if not number_match:
+            return None
+        article_match = number_match
+    
+    number = str(int(article_match.group(1).replace('.', '')))
+    if article_match.group(2):
+        number += '-' + article_match.group(2).upper()
+    key = [number]
+    
+    remainder = reference[article_match.end():]
+    paragraph_match = _PARAGRAPH_RE.search(remainder)
+    if paragraph_match:
+        key.append(_paragraph_key(paragraph_match))
+        remainder = remainder[paragraph_match.end():]
+    inciso_match = _INCISO_REF_RE.search(remainder)
+    if inciso_match:
+        key.append((inciso_match.group(1) or inciso_match.group(2)).upper())
+    return tuple(key)
+
+def _split_article_subdivisions(text):
+    """Extrai os trechos de parágrafos e incisos do texto de um artigo, indexados por sub-chave"""
+    subdivisions = {}
+    paragraph_matches = list(_PARAGRAPH_RE.finditer(text))
+    # O caput vai do início até o primeiro parágrafo
+    boundaries = [(None, 0)] + [(_paragraph_key(m), m.start()) for m in paragraph_matches]
+    for i, (paragraph, start) in enumerate(boundaries):
+        end = boundaries[i + 1][1] if i + 1 < len(boundaries) else len(text)
+        segment = text[start:end]
+        prefix = (paragraph,) if paragraph else ()
+        if paragraph:
+            subdivisions[prefix] = segment.strip()
+        inciso_matches = list(_INCISO_TEXT_RE.finditer(segment))
+        for j, inciso_match in enumerate(inciso_matches):
+            inciso_end = inciso_matches[j + 1].start() if j + 1 < len(inciso_matches) else len(segment)
+            subdivisions.setdefault(prefix + (inciso_match.group(1),), segment[inciso_match.start():inciso_end].strip())
+    return subdivisions
+
+# Documentos do condomínio consultáveis
+DOCUMENT_TYPES = {
+    'regimento_interno': 'Regimento Interno',
+    'convencao_condominial': 'Convenção Condominial'
+}
+
+# Citações entre artigos ("conforme o Art. 12", "arts. 3º e 4º da Convenção", "artigos 10 a 12")
+_CITATION_RE = re.compile(
+    r'\bart(?:igo)?s?\.?\s*(\d+(?:\.\d{3})*[º°o]?(?:-[A-Z]\b)?'
+    r'(?:\s*(?:,|\be\b|\ba\b|\baté\b)\s*\d+(?:\.\d{3})*[º°o]?(?:-[A-Z]\b)?)*)',
+    re.IGNORECASE
+)
+_CITATION_NUMBER_RE = re.compile(r'(\d+(?:\.\d{3})*)[º°o]?(?:-([A-Z])\b)?|(\ba\b|\baté\b)', re.IGNORECASE)
+_RELATIVE_CITATION_RE = re.compile(
+    r'\b(?:art(?:igo|\.)\s+(anterior|precedente|seguinte|subsequente)|(pr[óo]ximo)\s+artigo)\b',
+    re.IGNORECASE
+)
+# Qualificador na mesma oração da citação: indica o documento citado (ou uma lei, que não entra no grafo)
+_CITATION_TARGET_RE = re.compile(
+    r'\b(?:d[oa]s?|dest[ae]|nest[ae]|n[oa])\s+'
+    r'(regimento|conven[çc][ãa]o|lei|c[óo]digo|decreto|constitui[çc][ãa]o)',
+    re.IGNORECASE
+)
+# Fim da oração da citação: ponto (fora de números), ponto e vírgula, dois-pontos, quebra de linha, ou vírgula
+# que não continua a própria citação (parágrafo, inciso, alínea, "e ...", "do/da ...")
+_CLAUSE_END_RE = re.compile(
+    r'[;:\n]|\.(?!\d)|,(?!\s*(?:§|par[áa]grafo|incisos?\b|al[íi]neas?\b|caput\b|e\b|d[oa]s?\b|dest[ae]\b|nest[ae]\b'
+    r'|n[oa]s?\b|(?-i:[IVXLC]+)\b))',
+    re.IGNORECASE
+)
+# Lei citada logo antes do artigo ("Lei nº 4.591/64, art. 9º"): também fica fora do grafo
+_CITATION_LAW_PREFIX_RE = re.compile(r'(?:\b(?:lei|decreto)\b[^;]{0,25}?\d[\d./-]*|\bc[óo]digo\s+\w+)\s*,\s*$', re.IGNORECASE)
+MAX_CITATION_RANGE = 50
+
+def extract_article_citations(text, document_type):
+    """Extrai citações a artigos do texto: lista de (tipo_documento, número) ou (tipo_documento, 'anterior'/'seguinte')"""
+    citations = []
+    if not text:
+        return citations
+    
+    for match in _CITATION_RE.finditer(text):
+        if _CITATION_LAW_PREFIX_RE.search(text[max(0, match.start() - 40):match.start()]):
+            continue
+        target = document_type
+        clause_end = _CLAUSE_END_RE.search(text, match.end())
+        qualifier = _CITATION_TARGET_RE.search(text, match.end(), clause_end.start() if clause_end else len(text))
+        if qualifier:
+            name = normalize_text(qualifier.group(1))
+            if name.startswith('regimento'):
+                target = 'regimento_interno'
+            elif name.startswith('convencao'):
+                target = 'convencao_condominial'
+            else:
+                continue  # Citação a artigo de lei
+        
+        numbers = []
+        range_pending = False
+        for part in _CITATION_NUMBER_RE.finditer(match.group(1)):
+            if part.group(3):
+                range_pending = bool(numbers)
+                continue
+            number = int(part.group(1).replace('.', ''))
+            if range_pending and isinstance(numbers[-1], int) and 0 < number - numbers[-1] <= MAX_CITATION_RANGE:
+                numbers.extend(range(numbers[-1] + 1, number + 1))
+            else:
+                numbers.append(f"{number}-{part.group(2).upper()}" if part.group(2) else number)
+            range_pending = False
+        
+        for number in numbers:
+            citations.append((target, str(number)))
+    
+    for match in _RELATIVE_CITATION_RE.finditer(text):
+        relation = normalize_text(match.group(1) or match.group(2))
+        citations.append((document_type, 'anterior' if relation in ('anterior', 'precedente') else 'seguinte'))
+    
+    return citations
+
 # Classe para gerenciar a consulta de documentos
 class DocumentConsultManager:
-    def __init__(self, app_config):
+    # Intervalo mínimo entre verificações do arquivo JSON em disco
+    DOCUMENT_RECHECK_SECONDS = 5
+    # Intervalo mínimo entre verificações de mudanças no catálogo de leis (autocompletar)
+    LAW_SUGGESTIONS_RECHECK_SECONDS = 30
+    # Reforço de peso, por ocorrência no histórico do usuário, nas sugestões de autocompletar
+    HISTORY_WEIGHT = 1000
+    
+    def __init__(self, app_config, history_buffer=None):
         self.processed_docs_folder = app_config['PROCESSED_DOCS_FOLDER']
+        self.history_buffer = history_buffer
+        self._documents = {}  # Cache por tipo de documento, invalidado pela data de modificação do JSON
+        # Favoritos por usuário; o TTL limita a defasagem entre processos diferentes
+        self._favorites_cache = TTLCache(maxsize=1024, ttl=300)
+        self._favorites_lock = threading.Lock()
+        # Autocompletar: índice de prefixos, entradas de leis e termos pesquisados por usuário
+        self._suggestion_index = None
+        self._suggestion_signature = None
+        self._law_suggestions = None
+        self._law_checked_at = None
+        self._user_terms_cache = TTLCache(maxsize=1024, ttl=120)
+        self._user_terms_lock = threading.Lock()
+        # Grafo de citações entre artigos, reconstruído quando algum documento muda
+        self._reference_graph = None
     
-    def get_document_structure(self, document_type):
-        """Obtém a estrutura hierárquica do documento (capítulos, seções, artigos)"""
+    def _load_document(self, document_type):
+        """Carrega os artigos do documento e seu vocabulário de busca (com cache)"""
+        document = self._documents.get(document_type)
+        now = time.monotonic()
+        if document and now - document['checked_at'] < self.DOCUMENT_RECHECK_SECONDS:
+            return document
+        
         json_path = os.path.join(self.processed_docs_folder, f"{document_type}_artigos.json")
-        if not os.path.exists(json_path):
+        try:
+            mtime = os.path.getmtime(json_path)
+        except OSError:
+            self._documents.pop(document_type, None)
             return None
         
+        if document and document['mtime'] == mtime:
+            document['checked_at'] = now
+            return document
+        
+        with open(json_path, 'r', encoding='utf-8') as f:
+            articles = json.load(f)
+        
+        search_texts = [
+            normalize_text(article.get('title', '') + ' ' + article.get('text', ''))
+            for article in articles
+        ]
+        vocabulary = TrigramIndex(
+            word for article in articles
+            for word in tokenize(article.get('title', '') + ' ' + article.get('text', ''), normalize=False)
+        )
+        term_counts = Counter(term for text in search_texts for term in tokenize(text))
+        
+        # Índice por número de artigo (e sub-chaves de parágrafo/inciso) e vizinhos em ordem numérica
+        article_index = {}
+        for position, article in enumerate(articles):
+            key = parse_article_reference(article.get('title', ''))
+            if not key or key in article_index:
+                continue
+            article_index[key] = (position, None)
+            for subkey, excerpt in _split_article_subdivisions(article.get('text', '')).items():
+                article_index.setdefault(key + subkey, (position, excerpt))
+        
+        ordered = sorted(
+            (position for key, (position, excerpt) in article_index.items() if len(key) == 1),
+            key=lambda position: _article_sort_key(parse_article_reference(articles[position].get('title', ''))[0])
+        )
+        neighbors = {}
+        for i, position in enumerate(ordered):
+            neighbors[position] = (
+                ordered[i - 1] if i > 0 else None,
+                ordered[i + 1] if i + 1 < len(ordered) else None
+            )
+        
+        document = {
+            'mtime': mtime,
+            'checked_at': now,
+            'articles': articles,
+            'search_texts': search_texts,
+            'vocabulary': vocabulary,
+            'term_counts': term_counts,
+            'article_index': article_index,
+            'neighbors': neighbors
+        }
+        self._documents[document_type] = document
+        return document
+    
+    def _get_reference_graph(self):
+        """Obtém o grafo de citações entre artigos (dentro do documento e entre regimento e convenção)"""
+        documents = {document_type: self._load_document(document_type) for document_type in DOCUMENT_TYPES}
+        signature = tuple((t, d['mtime'] if d else None) for t, d in documents.items())
+        if self._reference_graph and self._reference_graph['signature'] == signature:
+            return self._reference_graph
+        
+        cites = {}
+        cited_by = {}
+        for document_type, document in documents.items():
+            if not document:
+                continue
+            for position, article in enumerate(document['articles']):
+                if position not in document['neighbors']:
+                    continue  # Artigo sem número reconhecível
+                source = (document_type, position)
+                for target_type, number in extract_article_citations(article.get('text', ''), document_type):
+                    target_document = documents.get(target_type)
+                    if not target_document:
+                        continue
+                    if number in ('anterior', 'seguinte'):
+                        previous_position, next_position = document['neighbors'].get(position, (None, None))
+                        target_position = previous_position if number == 'anterior' else next_position
+                    else:
+                        entry = target_document['article_index'].get((number,))
+                        target_position = entry[0] if entry else None
+                    
+                    target = (target_type, target_position)
+                    if target_position is None or target == source or target in cites.get(source, []):
+                        continue
+                    cites.setdefault(source, []).append(target)
+                    cited_by.setdefault(target, []).append(source)
+        
+        self._reference_graph = {
+            'signature': signature,
+            'documents': documents,
+            'cites': cites,
+            'cited_by': cited_by
+        }
+        return self._reference_graph
+    
+    def get_document_structure(self, document_type):
+        """Obtém a estrutura hierárquica do documento (capítulos, seções, artigos)"""
         try:
-            with open(json_path, 'r', encoding='utf-8') as f:
-                articles = json.load(f)
+            document = self._load_document(document_type)
+            if not document:
+                return None
+            articles = document['articles']
             
             # Analisar a estrutura do documento
             structure = {}
@@ -88,42 +470,45 @@ class DocumentConsultManager:
             return None
     
     def search_documents(self, search_term, document_type=None):
-        """Pesquisa nos documentos por termo específico"""
+        """Pesquisa nos documentos por termo específico, tolerando erros de digitação"""
         results = []
         
-        # Determinar quais arquivos JSON pesquisar
-        json_files = []
+        # Determinar quais documentos pesquisar
+        sources = []
         if document_type == "regimento_interno" or document_type is None:
-            json_files.append(("regimento_interno_artigos.json", "Regimento Interno"))
+            sources.append(("regimento_interno", "Regimento Interno"))
         if document_type == "convencao_condominial" or document_type is None:
-            json_files.append(("convencao_condominial_artigos.json", "Convenção Condominial"))
+            sources.append(("convencao_condominial", "Convenção Condominial"))
         
         # Preparar termos de busca
-        search_terms = search_term.lower().split()
+        search_terms = tokenize(search_term)
         
-        # Buscar em cada arquivo JSON
-        for json_file, source_name in json_files:
-            file_path = os.path.join(self.processed_docs_folder, json_file)
-            if not os.path.exists(file_path):
-                continue
-            
+        # Buscar em cada documento
+        for source_type, source_name in sources:
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    articles = json.load(f)
+                document = self._load_document(source_type)
+                if not document:
+                    continue
                 
-                for article in articles:
-                    # Verificar se algum termo de busca está presente no título ou texto do artigo
-                    article_text = (article.get('title', '') + ' ' + article.get('text', '')).lower()
-                    
-                    # Calcular relevância (número de termos encontrados)
-                    relevance = sum(1 for term in search_terms if term in article_text)
+                # Expandir cada termo para as grafias próximas existentes no vocabulário do documento
+                term_variants = []
+                for term in search_terms:
+                    variants = [term] + [t for t, _ in document['vocabulary'].expand(term) if t != term]
+                    term_variants.append(variants)
+                
+                for article, article_text in zip(document['articles'], document['search_texts']):
+                    # Calcular relevância (número de termos encontrados, diretamente ou por aproximação)
+                    matched = []
+                    relevance = 0
+                    for variants in term_variants:
+                        found = [v for v in variants if v in article_text]
+                        if found:
+                            matched.extend(found)
+                            relevance += 1
                     
                     if relevance > 0:
-                        # Destacar os termos de busca no texto
-                        highlighted_text = article.get('text', '')
-                        for term in search_terms:
-                            pattern = re.compile(re.escape(term), re.IGNORECASE)
-                            highlighted_text = pattern.sub(f'<mark>{term}</mark>', highlighted_text)
+                        # Destacar os termos encontrados no texto
+                        highlighted_text = highlight_terms(article.get('text', ''), matched)
                         
                         results.append({
                             'title': article.get('title', ''),
@@ -133,69 +518,184 @@ class DocumentConsultManager:
                             'relevance': relevance
                         })
             except Exception as e:
-                print(f"Erro ao processar {json_file}: {e}")
+                print(f"Erro ao processar {source_type}: {e}")
         
         # Ordenar resultados por relevância (mais relevantes primeiro)
         results.sort(key=lambda x: x['relevance'], reverse=True)
         
         return results
     
+    def _find_article(self, document_type, article_reference):
+        """Resolve uma referência no índice do documento: (documento, posição, trecho) ou None"""
+        key = parse_article_reference(article_reference)
+        if not key:
+            return None
+        document = self._load_document(document_type)
+        if not document:
+            return None
+        entry = document['article_index'].get(key)
+        if entry is None:
+            return None
+        position, excerpt = entry
+        return document, position, excerpt
+    
     def get_article_by_reference(self, document_type, article_reference):
         """Obtém um artigo específico pelo seu número/referência"""
-        json_path = os.path.join(self.processed_docs_folder, f"{document_type}_artigos.json")
-        if not os.path.exists(json_path):
-            return None
-        
         try:
-            with open(json_path, 'r', encoding='utf-8') as f:
-                articles = json.load(f)
-            
-            for article in articles:
-                if article.get('title', '').startswith(article_reference):
-                    return article
-            
-            return None
+            found = self._find_article(document_type, article_reference)
+            return found[0]['articles'][found[1]] if found else None
         except Exception as e:
             print(f"Erro ao buscar artigo: {e}")
             return None
     
-    def get_related_articles(self, document_type, article_reference):
-        """Obtém artigos relacionados (anterior e posterior)"""
-        json_path = os.path.join(self.processed_docs_folder, f"{document_type}_artigos.json")
-        if not os.path.exists(json_path):
+    def get_article_excerpt(self, document_type, article_reference):
+        """Obtém o trecho do parágrafo/inciso referenciado (None se a referência for ao artigo inteiro)"""
+        try:
+            found = self._find_article(document_type, article_reference)
+            return found[2] if found else None
+        except Exception as e:
+            print(f"Erro ao buscar trecho do artigo: {e}")
             return None
-        
+    
+    def get_related_articles(self, document_type, article_reference):
+        """Obtém artigos relacionados (anterior, posterior, citados e que o citam)"""
         try:
-            with open(json_path, 'r', encoding='utf-8') as f:
-                articles = json.load(f)
-            
-            # Extrair número do artigo de referência
-            ref_match = re.match(r'Artigo (\d+)', article_reference)
-            if not ref_match:
+            found = self._find_article(document_type, article_reference)
+            if not found:
                 return None
             
-            ref_num = int(ref_match.group(1))
-            related = {'previous': None, 'next': None}
+            document, position, _ = found
+            previous_position, next_position = document['neighbors'].get(position, (None, None))
             
-            # Encontrar artigos anterior e posterior
-            for article in articles:
-                title = article.get('title', '')
-                article_match = re.match(r'Artigo (\d+)', title)
-                if article_match:
-                    article_num = int(article_match.group(1))
-                    
-                    if article_num == ref_num - 1:
-                        related['previous'] = article
-                    elif article_num == ref_num + 1:
-                        related['next'] = article
+            # Artigos citados por este e que citam este (grafo pré-calculado)
+            graph = self._get_reference_graph()
+            node = (document_type, position)
+            
+            def describe(target):
+                target_type, target_position = target
+                article = graph['documents'][target_type]['articles'][target_position]
+                return dict(article, document_type=target_type, source=DOCUMENT_TYPES[target_type])
             
-            return related
+            return {
+                'previous': document['articles'][previous_position] if previous_position is not None else None,
+                'next': document['articles'][next_position] if next_position is not None else None,
+                'cites': [describe(target) for target in graph['cites'].get(node, [])],
+                'cited_by': [describe(source) for source in graph['cited_by'].get(node, [])]
+            }
         except Exception as e:
             print(f"Erro ao buscar artigos relacionados: {e}")
             return None
     
+    def _get_law_suggestions(self, db_session):
+        """Entradas de autocompletar para títulos e números das leis ativas (recarregadas quando o catálogo muda)"""
+        now = time.monotonic()
+        if self._law_suggestions is not None and now - self._law_checked_at < self.LAW_SUGGESTIONS_RECHECK_SECONDS:
+            return self._law_suggestions
+        
+        signature = tuple(db_session.query(func.count(Law.id), func.max(Law.updated_at)).one())
+        if self._law_suggestions is None or signature != self._law_suggestions[0]:
+            laws = db_session.query(Law.id, Law.title, Law.number).filter(Law.is_active == True).all()
+            self._law_suggestions = (signature, [
+                {'text': title, 'type': 'lei', 'law_id': law_id, 'number': number}
+                for law_id, title, number in laws
+            ])
+        self._law_checked_at = now
+        return self._law_suggestions
+    
+    def _get_suggestion_index(self, db_session):
+        """Obtém o índice de prefixos do autocompletar, reconstruído quando documentos ou leis mudam"""
+        documents = {
+            document_type: self._load_document(document_type)
+            for document_type in DOCUMENT_TYPES
+        }
+        law_signature, law_entries = self._get_law_suggestions(db_session)
+        signature = (
+            tuple((t, d['mtime'] if d else None) for t, d in documents.items()),
+            law_signature
+        )
+        if self._suggestion_index is not None and signature == self._suggestion_signature:
+            return self._suggestion_index
+        
+        entries = []
+        for document_type, document in documents.items():
+            if not document:
+                continue
+            for article in document['articles']:
+                title = article.get('title', '')
+                if title:
+                    entries.append((title, {'text': title, 'type': 'artigo', 'document_type': document_type}, 1))
+            # Vocabulário normalizado do documento, ponderado pela frequência
+            for term, count in document['term_counts'].items():
+                if len(term) >= 3 and not term.isdigit():
+                    entries.append((term, {'text': term, 'type': 'termo'}, count))
+        
+        for entry in law_entries:
+            # Títulos e números de leis são indexados a partir de cada palavra ("silêncio" -> "Lei do Silêncio")
+            for text in (entry['text'], entry['number']):
+                normalized = normalize_text(text)
+                for match in re.finditer(r'\w+', normalized):
+                    entries.append((normalized[match.start():], entry, 1))
+        
+        self._suggestion_index = PrefixIndex(entries)
+        self._suggestion_signature = signature
+        return self._suggestion_index
+    
+    def _get_user_search_terms(self, db_session, user_id):
+        """Contagem dos termos pesquisados pelo usuário (com cache curto por usuário)"""
+        # Retorna cópias feitas sob o lock: save_search_history altera o Counter em cache
+        with self._user_terms_lock:
+            terms = self._user_terms_cache.get(user_id)
+            if terms is not None:
+                return Counter(terms)
+        
+        terms = Counter()
+        for search in self.get_search_history(db_session, user_id, limit=100):
+            terms[normalize_text(search.search_term).strip()] += 1
+        with self._user_terms_lock:
+            self._user_terms_cache[user_id] = terms
+            return Counter(terms)
+    
+    def suggest(self, db_session, user_id, query, limit=8):
+        """Sugestões de autocompletar: histórico do usuário, artigos, leis e vocabulário dos documentos"""
+        prefix = normalize_text(query).strip()
+        if not prefix:
+            return []
+        
+        user_terms = self._get_user_search_terms(db_session, user_id)
+        history = [
+            {'text': term, 'type': 'historico'}
+            for term, _ in user_terms.most_common() if term.startswith(prefix) and term != prefix
+        ][:limit]
+        
+        # Termos já pesquisados pelo usuário sobem no ranking do vocabulário
+        boost = {}
+        for term, count in user_terms.items():
+            for word in tokenize(term):
+                boost[word] = boost.get(word, 0) + count * self.HISTORY_WEIGHT
+        
+        suggestions = history + self._get_suggestion_index(db_session).complete(prefix, limit, boost)
+        
+        unique = []
+        seen = set()
+        for suggestion in suggestions:
+            kind = 'termo' if suggestion['type'] == 'historico' else suggestion['type']
+            key = (kind, normalize_text(suggestion['text']))
+            if key not in seen:
+                seen.add(key)
+                unique.append(suggestion)
+        return unique[:limit]
+    
     def save_search_history(self, db_session, user_id, search_term, document_type=None):
-        """Salva histórico de pesquisa do usuário"""
+        """Salva histórico de pesquisa do usuário (enfileirado, quando há fila de gravação)"""
+        with self._user_terms_lock:
+            terms = self._user_terms_cache.get(user_id)
+            if terms is not None:
+                terms[normalize_text(search_term).strip()] += 1
+        
+        if self.history_buffer:
+            self.history_buffer.add(user_id, search_term, document_type)
+            return
+        
         search = DocumentSearch(
             user_id=user_id,
             search_term=search_term,
@@ -206,23 +706,31 @@ class DocumentConsultManager:
     
     def get_search_history(self, db_session, user_id, limit=10):
         """Obtém histórico de pesquisas do usuário"""
-        return db_session.query(DocumentSearch).filter_by(
+        # Pendentes lidos antes do banco: um evento gravado entre as duas leituras aparece nas duas, nunca em nenhuma
+        pending = self.history_buffer.pending_for_user(user_id) if self.history_buffer else []
+        history = db_session.query(DocumentSearch).filter_by(
             user_id=user_id
         ).order_by(DocumentSearch.created_at.desc()).limit(limit).all()
+        
+        if pending:
+            # Incluir pesquisas recentes que ainda não foram gravadas, sem repetir as já gravadas
+            stored = {(h.user_id, h.search_term, h.created_at) for h in history}
+            pending = [DocumentSearch(**event) for event in pending
+                       if (event['user_id'], event['search_term'], event['created_at']) not in stored]
+            history = sorted(pending + history, key=lambda h: h.created_at, reverse=True)[:limit]
+        
+        return history
     
     def toggle_favorite(self, db_session, user_id, document_type, article_reference, article_text):
         """Adiciona ou remove um artigo dos favoritos"""
-        favorite = db_session.query(DocumentFavorite).filter_by(
+        # Remover diretamente evita a consulta prévia; se nada foi removido, o artigo não era favorito
+        removed = db_session.query(DocumentFavorite).filter_by(
             user_id=user_id,
             document_type=document_type,
             article_reference=article_reference
-        ).first()
+        ).delete(synchronize_session=False)
         
-        if favorite:
-            db_session.delete(favorite)
-            db_session.commit()
-            return False  # Removido dos favoritos
-        else:
+        if not removed:
             favorite = DocumentFavorite(
                 user_id=user_id,
                 document_type=document_type,
@@ -230,14 +738,34 @@ class DocumentConsultManager:
                 article_text=article_text
             )
             db_session.add(favorite)
-            db_session.commit()
-            return True  # Adicionado aos favoritos
+        db_session.commit()
+        
+        with self._favorites_lock:
+            self._favorites_cache.pop(user_id, None)
+        
+        return not removed  # True se adicionado aos favoritos
     
     def get_favorites(self, db_session, user_id):
-        """Obtém artigos favoritos do usuário"""
-        return db_session.query(DocumentFavorite).filter_by(
-            user_id=user_id
-        ).order_by(DocumentFavorite.created_at.desc()).all()
+        """Obtém artigos favoritos do usuário (com cache por usuário)"""
+        with self._favorites_lock:
+            favorites = self._favorites_cache.get(user_id)
+        if favorites is not None:
+            return favorites
+        
+        favorites = [
+            {
+                'document_type': f.document_type,
+                'article_reference': f.article_reference,
+                'article_text': f.article_text,
+                'created_at': f.created_at
+            } for f in db_session.query(DocumentFavorite).filter_by(
+                user_id=user_id
+            ).order_by(DocumentFavorite.created_at.desc()).all()
+        ]
+        
+        with self._favorites_lock:
+            self._favorites_cache[user_id] = favorites
+        return favorites
 
 # Função para criar tabelas no banco de dados
 def create_document_consult_tables(engine):
@@ -247,7 +775,17 @@ def create_document_consult_tables(engine):
 # Rotas Flask para a interface de consulta avulsa (a serem integradas ao app.py)
 def register_document_consult_routes(app, db):
     """Registra as rotas para a interface de consulta avulsa"""
-    document_manager = DocumentConsultManager(app.config)
+    def get_engine():
+        with app.app_context():
+            return db.engine
+    
+    history_buffer = SearchHistoryBuffer(
+        get_engine,
+        flush_interval=app.config.get('SEARCH_HISTORY_FLUSH_INTERVAL', 2.0),
+        batch_size=app.config.get('SEARCH_HISTORY_BATCH_SIZE', 200)
+    )
+    history_buffer.start()
+    document_manager = DocumentConsultManager(app.config, history_buffer)
     
     @app.route('/consulta')
     @login_required
@@ -275,6 +813,20 @@ def register_document_consult_routes(app, db):
             'count': len(results)
         })
     
+    @app.route('/api/document/suggest')
+    @login_required
+    def api_document_suggest():
+        """API de autocompletar para a consulta de documentos"""
+        query = request.args.get('q', '')
+        limit = min(request.args.get('limit', 8, type=int), 20)
+        
+        suggestions = document_manager.suggest(db.session, current_user.id, query, limit)
+        
+        return jsonify({
+            'suggestions': suggestions,
+            'count': len(suggestions)
+        })
+    
     @app.route('/api/document/structure')
     @login_required
     def api_document_structure():
@@ -305,6 +857,7 @@ def register_document_consult_routes(app, db):
         
         return jsonify({
             'article': article,
+            'excerpt': document_manager.get_article_excerpt(document_type, article_reference),
             'related': related
         })
     
@@ -341,12 +894,7 @@ def register_document_consult_routes(app, db):
         
         return jsonify({
             'favorites': [
-                {
-                    'document_type': f.document_type,
-                    'article_reference': f.article_reference,
-                    'article_text': f.article_text,
-                    'created_at': f.created_at.isoformat()
-                } for f in favorites
+                dict(f, created_at=f['created_at'].isoformat()) for f in favorites
             ]
         })
     
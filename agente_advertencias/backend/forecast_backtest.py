@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""Backtest do modelo de taxas sazonais (occurrence_forecast): calibração das probabilidades previstas.
+
+Para cada data de corte, ajusta o modelo ao histórico anterior e compara a probabilidade prevista para cada
+(unidade, categoria, período, dia) dos dias seguintes com o que de fato ocorreu.
+"""
+import numpy as np
+
+from occurrence_forecast import SeasonalRateModel
+
+def calibration_report(probabilities, outcomes, bins=10):
+    """Brier, log loss, erro de calibração esperado (ECE) e tabela de confiabilidade"""
+    probabilities = np.asarray(probabilities, dtype=np.float64).ravel()
+    outcomes = np.asarray(outcomes, dtype=np.float64).ravel()
+    if not probabilities.size:
+        return {'samples': 0}
+
+    clipped = np.clip(probabilities, 1e-9, 1 - 1e-9)
+    base_rate = outcomes.mean()
+    brier = np.mean((probabilities - outcomes) ** 2)
+    # Referência: prever sempre a frequência média observada
+    reference = np.mean((base_rate - outcomes) ** 2)
+
+    bin_index = np.minimum((probabilities * bins).astype(np.int64), bins - 1)
+    counts = np.bincount(bin_index, minlength=bins)
+    predicted = np.bincount(bin_index, weights=probabilities, minlength=bins)
+    observed = np.bincount(bin_index, weights=outcomes, minlength=bins)
+    reliability = [{
+        'bin': f"{i / bins:.1f}-{(i + 1) / bins:.1f}",
+        'samples': int(counts[i]),
+        'mean_predicted': float(predicted[i] / counts[i]),
+        'observed_frequency': float(observed[i] / counts[i])
+    } for i in range(bins) if counts[i]]
+
+    return {
+        'samples': int(probabilities.size),
+        'base_rate': float(base_rate),
+        'brier': float(brier),
+        'brier_skill': float(1 - brier / reference) if reference else 0.0,
+        'log_loss': float(-np.mean(outcomes * np.log(clipped) + (1 - outcomes) * np.log(1 - clipped))),
+        'ece': float(np.abs(predicted - observed).sum() / probabilities.size),
+        'reliability': reliability
+    }
+
+def rolling_origin_backtest(unit_index, category_index, timestamps, n_units, n_categories, origins,
+                            horizon_days=7, training_days=365, bins=10, **model_params):
+    """Ajusta o modelo antes de cada data de corte e avalia os horizon_days dias seguintes"""
+    unit_index = np.asarray(unit_index, dtype=np.int64)
+    category_index = np.asarray(category_index, dtype=np.int64)
+    timestamps = np.asarray(timestamps, dtype='datetime64[m]')
+    days = timestamps.astype('datetime64[D]')
+
+    probabilities = []
+    outcomes = []
+    for origin in origins:
+        origin = np.datetime64(origin, 'D')
+        model = SeasonalRateModel(n_units, n_categories, **model_params).fit(
+            unit_index, category_index, timestamps, start=origin - training_days, end=origin)
+        dates = np.arange(origin, origin + horizon_days, dtype='datetime64[D]')
+        # [unidade, categoria, período, data]
+        probabilities.append(model.predict_proba(dates, keep=('unit', 'category', 'period')))
+
+        future = (days >= origin) & (days < origin + horizon_days)
+        hours = ((timestamps[future] - days[future]) // np.timedelta64(1, 'h')).astype(np.int64)
+        n_periods = len(model.periods)
+        cells = (((unit_index[future] * n_categories + category_index[future]) * n_periods
+                  + model.hour_period[hours]) * horizon_days + (days[future] - origin).astype(np.int64))
+        happened = np.bincount(cells, minlength=n_units * n_categories * n_periods * horizon_days) > 0
+        outcomes.append(happened.reshape(n_units, n_categories, n_periods, horizon_days))
+
+    report = calibration_report(
+        np.concatenate([p.ravel() for p in probabilities]) if probabilities else [],
+        np.concatenate([o.ravel() for o in outcomes]) if outcomes else [],
+        bins
+    )
+    report['origins'] = [str(np.datetime64(origin, 'D')) for origin in origins]
+    report['horizon_days'] = horizon_days
+    return report
+
+def format_calibration_report(report):
+    """Relatório de calibração em texto"""
+    if not report.get('samples'):
+        return "Sem amostras para avaliar."
+    lines = [
+        f"Amostras: {report['samples']} (frequência de ocorrência {report['base_rate']:.4f})",
+        f"Brier: {report['brier']:.5f} (skill {report['brier_skill']:.3f})  "
+        f"Log loss: {report['log_loss']:.4f}  ECE: {report['ece']:.4f}",
+        "Faixa      Amostras  Prevista  Observada"
+    ]
+    for row in report['reliability']:
+        lines.append(f"{row['bin']:<10} {row['samples']:>8}  {row['mean_predicted']:>8.4f}  {row['observed_frequency']:>9.4f}")
+    return '\n'.join(lines)
@@ -0,0 +1,347 @@
+# -*- coding: utf-8 -*-
+"""Importação em lote de textos legais (HTML, XML ou texto das publicações oficiais) para Law/LawArticle.
+
+Uso (a partir de agente_advertencias/backend):
+    python law_importer.py dumps/codigo_civil.html dumps/municipais/ --category barulho
+"""
+import os
+import re
+import sys
+import time
+import argparse
+from html.parser import HTMLParser
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from law_integration import Base, Law, LawArticle, RegulationLawMapping
+from legal_citations import canonical_law_key
+
+SUPPORTED_EXTENSIONS = ('.html', '.htm', '.xml', '.txt')
+READ_CHUNK_SIZE = 64 * 1024
+
+# Início de artigo: "Art. 1º", "Art. 1.336-A.", "Artigo 12 -" no começo da linha
+_ARTICLE_START_RE = re.compile(
+    r'^\s*Art(?:igo|\.)?\s*(?P<number>\d{1,3}(?:\.\d{3})+|\d+)\s*(?:º|°|o\b)?(?P<suffix>-[A-Z])?\s*[.\-–—]?\s*',
+    re.IGNORECASE
+)
+# Cabeçalho da lei: "LEI Nº 10.406, DE 10 DE JANEIRO DE 2002"
+_LAW_HEADER_RE = re.compile(r'^\s*(?:LEI|DECRETO(?:-LEI)?)\b.*\d', re.IGNORECASE)
+# Espécie, número e ano no cabeçalho: "LEI COMPLEMENTAR Nº 95, DE 26 DE FEVEREIRO DE 1998", "Lei nº 4.591/64"
+_LAW_NUMBER_RE = re.compile(
+    r'^\s*(?P<kind>decreto-lei|decreto|lei(?:\s+complementar)?)(?:\s+(?P<scope>municipal|estadual|federal|distrital))?'
+    r'\s*(?:n\s*[º°o.]*\s*|n[úu]mero\s+)?(?P<number>\d{1,3}(?:\.\d{3})+|\d+)'
+    r'(?:\s*/\s*(?P<year>\d{4}|\d{2})\b|.*?\bde\s+(?P<year_long>\d{4})\b)?',
+    re.IGNORECASE
+)
+_JURISDICTION_RE = re.compile(r'\b(municipal|estadual|federal)\b', re.IGNORECASE)
+_CHARSET_RE = re.compile(rb'(?:charset|encoding)\s*=\s*["\']?([\w-]+)', re.IGNORECASE)
+# Elementos que terminam uma linha de texto
+_BLOCK_TAGS = {'p', 'br', 'div', 'li', 'tr', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'title', 'caput', 'artigo', 'paragrafo', 'inciso'}
+_SKIPPED_TAGS = {'script', 'style', 'head'}
+
+class _TextExtractor(HTMLParser):
+    """Extrai linhas de texto de HTML/XML alimentado em pedaços, sem montar a árvore do documento"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.lines = []
+        self._current = []
+        self._skip_depth = 0
+
+    def _end_line(self):
+        line = ' '.join(''.join(self._current).split())
+        if line:
+            self.lines.append(line)
+        self._current = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIPPED_TAGS:
+            self._skip_depth += 1
+        elif tag in _BLOCK_TAGS:
+            self._end_line()
+
+    def handle_endtag(self, tag):
+        if tag in _SKIPPED_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in _BLOCK_TAGS:
+            self._end_line()
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self._current.append(data)
+
+    def close(self):
+        super().close()
+        self._end_line()
+
+def _detect_encoding(path):
+    """Codificação declarada no início do arquivo; publicações antigas costumam usar windows-1252"""
+    with open(path, 'rb') as f:
+        head = f.read(4096)
+    match = _CHARSET_RE.search(head)
+    if match:
+        return match.group(1).decode('ascii').lower()
+    try:
+        head.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'cp1252'
+
+def iter_text_lines(path):
+    """Gera as linhas de texto de um arquivo, lendo-o em pedaços"""
+    encoding = _detect_encoding(path)
+    markup = path.lower().endswith(('.html', '.htm', '.xml'))
+    with open(path, 'r', encoding=encoding, errors='replace') as f:
+        if not markup:
+            for line in f:
+                line = ' '.join(line.split())
+                if line:
+                    yield line
+            return
+        parser = _TextExtractor()
+        while True:
+            chunk = f.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            parser.feed(chunk)
+            yield from parser.lines
+            parser.lines = []
+        parser.close()
+        yield from parser.lines
+
+def iter_articles(lines):
+    """Divide as linhas de uma lei em artigos.
+
+    Gera ('preambulo', linhas) uma única vez e depois ('Art. N', linhas) para cada artigo, na ordem do texto.
+    Citações de outros dispositivos entre aspas não iniciam artigo, pois não começam com "Art.".
+    """
+    label = None
+    buffer = []
+    for line in lines:
+        match = _ARTICLE_START_RE.match(line)
+        if match:
+            yield (label or 'preambulo'), buffer
+            number = match.group('number') + ('º' if len(match.group('number')) == 1 and not match.group('suffix') else '')
+            label = f"Art. {number}{(match.group('suffix') or '').upper()}"
+            buffer = [line]
+        else:
+            buffer.append(line)
+    yield (label or 'preambulo'), buffer
+
+def parse_law_number(header):
+    """Número da lei no formato usado nas citações ("LEI Nº 10.406, DE 10 DE JANEIRO DE 2002" -> "Lei nº 10.406/2002")"""
+    match = _LAW_NUMBER_RE.match(header or '')
+    if not match:
+        return None
+    kind = ' '.join(match.group('kind').split()).title()
+    scope = f" {match.group('scope').title()}" if match.group('scope') else ''
+    year = match.group('year') or match.group('year_long')
+    return f"{kind}{scope} nº {match.group('number')}{'/' + year if year else ''}"
+
+class StatuteReader:
+    """Lê um arquivo de lei em fluxo: os metadados vêm do preâmbulo e os artigos são gerados um a um.
+
+    Só as linhas do texto integral (Law.full_text) ficam em memória até o fim da leitura.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lines = []
+        self._sections = iter_articles(self._collect(iter_text_lines(path)))
+        # iter_articles sempre gera o preâmbulo primeiro (vazio se o arquivo começar por um artigo)
+        _, preamble = next(self._sections)
+        self.metadata = self._parse_preamble(preamble)
+
+    def _collect(self, lines):
+        for line in lines:
+            self._lines.append(line)
+            yield line
+
+    def _parse_preamble(self, lines):
+        title = None
+        summary_lines = []
+        for line in lines:
+            if title is None and _LAW_HEADER_RE.match(line):
+                title = line
+            elif title is not None and len(summary_lines) < 3:
+                summary_lines.append(line)
+        title = title or os.path.splitext(os.path.basename(self.path))[0]
+        jurisdiction = _JURISDICTION_RE.search(title)
+        return {
+            'title': title[:255],
+            # Sem número reconhecível no cabeçalho (ex.: título tirado do nome do arquivo), fica o próprio título
+            'number': (parse_law_number(title) or title)[:50],
+            'law_key': canonical_law_key(title),
+            'jurisdiction': jurisdiction.group(1).lower() if jurisdiction else 'federal',
+            'summary': ' '.join(summary_lines) or title
+        }
+
+    def articles(self):
+        """Gera (número do artigo, texto) na ordem do arquivo"""
+        seen = set()
+        for label, lines in self._sections:
+            if label in seen:
+                # Numeração repetida (ex.: texto consolidado com redação anterior): manter a primeira
+                continue
+            seen.add(label)
+            # O conteúdo do artigo não repete o rótulo ("Art. 1º -")
+            yield label, '\n'.join([_ARTICLE_START_RE.sub('', lines[0], count=1)] + lines[1:]).strip()
+
+    @property
+    def full_text(self):
+        """Texto integral lido até aqui (completo depois de consumir articles())"""
+        return '\n'.join(self._lines)
+
+def parse_statute(path):
+    """Lê um arquivo inteiro e retorna os metadados da lei (com o texto integral) e a lista de (número do artigo, texto)"""
+    reader = StatuteReader(path)
+    articles = list(reader.articles())
+    return dict(reader.metadata, full_text=reader.full_text), articles
+
+def iter_corpus_files(paths):
+    """Arquivos suportados nos caminhos informados (diretórios são percorridos recursivamente)"""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in sorted(files):
+                    if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                        yield os.path.join(root, name)
+        elif path.lower().endswith(SUPPORTED_EXTENSIONS):
+            yield path
+
+class LawImporter:
+    """Importa leis e seus artigos em lote; reimportar o mesmo arquivo não duplica linhas"""
+
+    def __init__(self, db_session, batch_size=1000, category='geral'):
+        self.db_session = db_session
+        self.batch_size = batch_size
+        self.category = category
+        self.stats = {'files': 0, 'laws_created': 0, 'laws_updated': 0,
+                      'articles_inserted': 0, 'articles_updated': 0, 'articles_unchanged': 0, 'articles_deleted': 0}
+        # Leis já cadastradas, pela chave canônica "número/ano" (ou pelo título, se não houver número)
+        self._laws_by_key = {}
+        for law_id, number, title in self.db_session.query(Law.id, Law.number, Law.title):
+            self._laws_by_key.setdefault(canonical_law_key(number) or title, law_id)
+
+    def _flush_batch(self, inserts, updates, stats):
+        if inserts:
+            self.db_session.bulk_insert_mappings(LawArticle, inserts)
+            stats['articles_inserted'] += len(inserts)
+            inserts.clear()
+        if updates:
+            self.db_session.bulk_update_mappings(LawArticle, updates)
+            stats['articles_updated'] += len(updates)
+            updates.clear()
+
+    def import_file(self, path):
+        """Importa um arquivo em uma única transação, gravando os artigos em lotes à medida que são lidos.
+
+        Artigos que não estão mais no arquivo (e seus vínculos com o regimento) são removidos. As contagens
+        do arquivo só entram em self.stats depois do commit: um arquivo que falha não conta nos totais.
+        """
+        stats = dict.fromkeys(self.stats, 0)
+        reader = StatuteReader(path)
+        metadata = dict(reader.metadata)
+        key = metadata.pop('law_key') or metadata['title']
+        try:
+            law_id = self._laws_by_key.get(key)
+            law = self.db_session.query(Law).filter_by(id=law_id).first() if law_id else None
+            if law is None:
+                # O texto integral só é conhecido ao fim da leitura
+                law = Law(category=self.category, is_active=True, full_text='', **metadata)
+                self.db_session.add(law)
+                self.db_session.flush()
+                stats['laws_created'] += 1
+                existing = {}
+            else:
+                for field, value in metadata.items():
+                    setattr(law, field, value)
+                stats['laws_updated'] += 1
+                existing = {
+                    article_number: (article_id, content)
+                    for article_id, article_number, content in self.db_session.query(
+                        LawArticle.id, LawArticle.article_number, LawArticle.content
+                    ).filter(LawArticle.law_id == law.id)
+                }
+
+            inserts = []
+            updates = []
+            imported = set()
+            changed = False
+            for article_number, content in reader.articles():
+                imported.add(article_number)
+                current = existing.get(article_number)
+                if current is None:
+                    inserts.append({'law_id': law.id, 'article_number': article_number, 'content': content})
+                elif current[1] != content:
+                    updates.append({'id': current[0], 'content': content})
+                else:
+                    stats['articles_unchanged'] += 1
+                    continue
+                changed = True
+                if len(inserts) + len(updates) >= self.batch_size:
+                    self._flush_batch(inserts, updates, stats)
+            self._flush_batch(inserts, updates, stats)
+            law.full_text = reader.full_text
+
+            stale = [article_id for article_number, (article_id, _) in existing.items() if article_number not in imported]
+            for start in range(0, len(stale), self.batch_size):
+                chunk = stale[start:start + self.batch_size]
+                self.db_session.query(RegulationLawMapping).filter(
+                    RegulationLawMapping.law_article_id.in_(chunk)).delete(synchronize_session=False)
+                self.db_session.query(LawArticle).filter(LawArticle.id.in_(chunk)).delete(synchronize_session=False)
+            if stale:
+                stats['articles_deleted'] += len(stale)
+                changed = True
+
+            if changed:
+                # Operações em lote não passam pelo ORM: marcar a lei como alterada invalida os índices em memória
+                law.updated_at = datetime.utcnow()
+            self.db_session.commit()
+        except Exception:
+            self.db_session.rollback()
+            raise
+        # Lei nova só é lembrada depois de gravada (após um rollback o id não existiria)
+        self._laws_by_key[key] = law.id
+        stats['files'] = 1
+        for name, count in stats.items():
+            self.stats[name] += count
+
+    def import_paths(self, paths):
+        """Importa todos os arquivos suportados e retorna as estatísticas, incluindo linhas por segundo"""
+        started = time.perf_counter()
+        for path in iter_corpus_files(paths):
+            try:
+                self.import_file(path)
+            except Exception as e:
+                print(f"Erro ao importar {path}: {e}")
+        elapsed = time.perf_counter() - started
+        rows = self.stats['articles_inserted'] + self.stats['articles_updated'] + self.stats['articles_unchanged']
+        return dict(self.stats, seconds=round(elapsed, 3), rows_per_second=round(rows / elapsed, 1) if elapsed else 0.0)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('paths', nargs='+', help='Arquivos ou diretórios com os textos das leis')
+    parser.add_argument('--database', default=os.environ.get('DATABASE_URL', 'sqlite:///site.db'))
+    parser.add_argument('--category', default='geral', help='Categoria atribuída às leis novas')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    engine = create_engine(args.database)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        stats = LawImporter(session, batch_size=args.batch_size, category=args.category).import_paths(args.paths)
+    finally:
+        session.close()
+
+    print(f"{stats['files']} arquivo(s): {stats['laws_created']} lei(s) criada(s), {stats['laws_updated']} atualizada(s)")
+    print(f"Artigos: {stats['articles_inserted']} inseridos, {stats['articles_updated']} atualizados, "
+          f"{stats['articles_unchanged']} inalterados, {stats['articles_deleted']} removidos")
+    print(f"{stats['seconds']} s ({stats['rows_per_second']} linhas/s)")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,15 +2,42 @@
 import os
 import re
 import json
+import time
+import queue
+import atexit
+import threading
 from flask import Flask, render_template, request, jsonify, redirect, url_for, flash
 from flask_login import login_required, current_user
-from sqlalchemy import create_engine, Column, Integer, String, Text, Boolean, DateTime, ForeignKey
+from sqlalchemy import create_engine, Column, Integer, Float, String, Text, Boolean, DateTime, ForeignKey, UniqueConstraint, Index, and_, func, event, inspect
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship, sessionmaker
+from sqlalchemy.orm import relationship, sessionmaker, object_session
 from datetime import datetime
 
+from search_index import TrigramIndex, MultiPatternMatcher, RankedIndex, make_snippet, tokenize
+from legal_citations import canonical_law_key, canonical_article_number, parse_legal_citations_bulk
+
 Base = declarative_base()
 
+# Mapeamento de palavras-chave de ocorrências para categorias de leis
+CATEGORY_KEYWORDS = {
+    'barulho': ['barulho', 'som', 'ruído', 'música', 'festa'],
+    'obras': ['obra', 'reforma', 'construção', 'manutenção'],
+    'animais': ['animal', 'cachorro', 'gato', 'pet', 'latido'],
+    'estacionamento': ['estacionamento', 'vaga', 'garagem', 'veículo', 'carro'],
+    'áreas_comuns': ['área comum', 'piscina', 'salão', 'playground', 'academia'],
+    'segurança': ['segurança', 'incêndio', 'emergência', 'acidente'],
+    'lixo': ['lixo', 'resíduo', 'descarte', 'sujeira']
+}
+
+# Vocabulário das ocorrências (palavras-chave simples), para reconhecer grafias aproximadas
+OCCURRENCE_VOCABULARY = TrigramIndex(
+    term for terms in CATEGORY_KEYWORDS.values() for term in terms if ' ' not in term
+)
+OCCURRENCE_TERM_CATEGORIES = {
+    tokenize(term)[0]: category
+    for category, terms in CATEGORY_KEYWORDS.items() for term in terms if ' ' not in term
+}
+
 # Modelos para a integração com leis vigentes
 class Law(Base):
     __tablename__ = 'law'
@@ -46,6 +73,9 @@ class LawArticle(Base):
 
 class RegulationLawMapping(Base):
     __tablename__ = 'regulation_law_mapping'
+    __table_args__ = (
+        UniqueConstraint('document_type', 'article_reference', 'law_article_id', name='uq_regulation_law_mapping'),
+    )
     
     id = Column(Integer, primary_key=True)
     document_type = Column(String(50), nullable=False)  # regimento_interno, convencao_condominial
@@ -57,11 +87,59 @@ class RegulationLawMapping(Base):
     # Relacionamentos
     law_article = relationship("LawArticle", back_populates="mappings")
 
+class OccurrenceLawRelevance(Base):
+    """Relevância de cada lei para cada ocorrência, calculada na gravação da ocorrência"""
+    __tablename__ = 'occurrence_law_relevance'
+    __table_args__ = (
+        UniqueConstraint('occurrence_id', 'law_id', name='uq_occurrence_law_relevance'),
+        Index('ix_occurrence_law_relevance_lookup', 'occurrence_id', 'relevance_score'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    occurrence_id = Column(Integer, nullable=False)  # Ocorrência (tabela do app principal)
+    law_id = Column(Integer, ForeignKey('law.id', ondelete='CASCADE'), nullable=False)
+    relevance_score = Column(Float, nullable=False, default=0)
+    computed_at = Column(DateTime, default=datetime.utcnow)
+
+class OccurrenceLawRelevanceMarker(Base):
+    """Ocorrências cuja relevância já foi calculada (inclusive as sem nenhuma lei relevante)"""
+    __tablename__ = 'occurrence_law_relevance_marker'
+    
+    occurrence_id = Column(Integer, primary_key=True, autoincrement=False)
+    law_count = Column(Integer, nullable=False, default=0)
+    computed_at = Column(DateTime, default=datetime.utcnow)
+
+# Versão do catálogo de leis neste processo, incrementada a cada alteração em Law/LawArticle pelo ORM
+LAW_CATALOG_STATE = {'version': 0}
+
+def _bump_law_catalog_version(mapper, connection, target):
+    LAW_CATALOG_STATE['version'] += 1
+
+for _model in (Law, LawArticle):
+    for _event in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(_model, _event, _bump_law_catalog_version)
+
 # Classe para gerenciar a integração com leis vigentes
 class LawIntegrationManager:
+    # Intervalo mínimo entre verificações de alteração no catálogo de leis
+    CATALOG_RECHECK_SECONDS = 30
+    # Peso dos campos no ranqueamento da busca
+    TITLE_WEIGHT = 3
+    SUMMARY_WEIGHT = 2
+    # Quantos artigos de cada lei são devolvidos na busca
+    ARTICLE_HITS_PER_LAW = 3
+    # Pontuação base das leis da categoria da ocorrência (a busca textual só desempata)
+    CATEGORY_SCORE = 100.0
+    
     def __init__(self, db_session, processed_docs_folder):
         self.db_session = db_session
         self.processed_docs_folder = processed_docs_folder
+        self._catalog_signature = None
+        self._catalog_version = None
+        self._catalog_checked_at = 0
+        self._law_summaries = None
+        self._law_search_index = None
+        self._law_reference_matcher = None
     
     def get_laws_by_category(self, category=None):
         """Obtém leis por categoria"""
@@ -78,56 +156,181 @@ class LawIntegrationManager:
         """Obtém um artigo de lei específico pelo ID"""
         return self.db_session.query(LawArticle).filter_by(id=article_id).first()
     
+    def _law_catalog_signature(self):
+        """Assinatura barata do catálogo de leis, usada para invalidar índices em memória.
+        
+        Alterações feitas por este processo são percebidas na hora; as de outros processos,
+        em até CATALOG_RECHECK_SECONDS.
+        """
+        now = time.monotonic()
+        version = LAW_CATALOG_STATE['version']
+        if self._catalog_signature is None or version != self._catalog_version or \
+           now - self._catalog_checked_at >= self.CATALOG_RECHECK_SECONDS:
+            law_count, last_update = self.db_session.query(func.count(Law.id), func.max(Law.updated_at)).one()
+            article_count = self.db_session.query(func.count(LawArticle.id)).scalar()
+            self._catalog_signature = (law_count, last_update, article_count)
+            self._catalog_version = version
+            self._catalog_checked_at = now
+        return self._catalog_signature
+    
+    def _get_law_summaries(self):
+        """Resumo das leis ativas e mapa categoria -> ids, mantidos em memória até o catálogo mudar"""
+        signature = self._law_catalog_signature()
+        if self._law_summaries and self._law_summaries['signature'] == signature:
+            return self._law_summaries
+        
+        laws = {}
+        categories = {}
+        rows = self.db_session.query(
+            Law.id, Law.title, Law.number, Law.jurisdiction, Law.category, Law.summary, Law.official_link
+        ).filter(Law.is_active == True).order_by(Law.jurisdiction, Law.title)
+        for law_id, title, number, jurisdiction, category, summary, official_link in rows:
+            laws[law_id] = {
+                'id': law_id,
+                'title': title,
+                'number': number,
+                'jurisdiction': jurisdiction,
+                'summary': summary,
+                'official_link': official_link
+            }
+            categories.setdefault(category, []).append(law_id)
+        
+        self._law_summaries = {'signature': signature, 'laws': laws, 'categories': categories}
+        return self._law_summaries
+    
+    def _get_law_search_index(self):
+        """Índice de busca das leis ativas e de seus artigos, reconstruído apenas quando o catálogo muda"""
+        signature = self._law_catalog_signature()
+        if self._law_search_index and self._law_search_index['signature'] == signature:
+            return self._law_search_index
+        
+        index = RankedIndex()
+        texts = {}
+        laws = self.db_session.query(Law.id, Law.title, Law.summary, Law.full_text).filter(Law.is_active == True).all()
+        for law_id, title, summary, full_text in laws:
+            index.add(('law', law_id, None), [(title, self.TITLE_WEIGHT), (summary, self.SUMMARY_WEIGHT), (full_text, 1)])
+            texts[('law', law_id, None)] = f"{summary} {full_text}"
+        
+        active_ids = {law_id for law_id, _, _, _ in laws}
+        articles = self.db_session.query(
+            LawArticle.id, LawArticle.law_id, LawArticle.article_number, LawArticle.content, LawArticle.summary
+        ).all()
+        for article_id, law_id, article_number, content, summary in articles:
+            if law_id not in active_ids:
+                continue
+            key = ('article', law_id, article_id)
+            index.add(key, [(article_number, 1), (content, 1), (summary or '', self.SUMMARY_WEIGHT)])
+            texts[key] = content
+        
+        self._law_search_index = {
+            'signature': signature,
+            'index': index,
+            'texts': texts,
+            'article_numbers': {article_id: article_number for article_id, _, article_number, _, _ in articles}
+        }
+        return self._law_search_index
+    
+    def _rank_laws(self, search_term, limit=20):
+        """Ranqueia leis pelo índice em memória: [(law_id, pontuação, termos, [(article_id, pontuação)])]"""
+        catalog = self._get_law_search_index()
+        # Mais documentos que o limite, já que vários artigos podem pertencer à mesma lei
+        hits, terms = catalog['index'].search(search_term, limit=limit * (self.ARTICLE_HITS_PER_LAW + 1))
+        
+        ranked = {}
+        for (kind, law_id, article_id), score in hits:
+            entry = ranked.setdefault(law_id, {'score': 0, 'law_score': 0, 'articles': []})
+            if kind == 'law':
+                entry['law_score'] = score
+            elif len(entry['articles']) < self.ARTICLE_HITS_PER_LAW:
+                entry['articles'].append((article_id, score))
+        
+        results = []
+        for law_id, entry in ranked.items():
+            # Lei pontua pelo próprio texto e pelo melhor artigo
+            best_article = entry['articles'][0][1] if entry['articles'] else 0
+            results.append((law_id, entry['law_score'] + best_article, entry['articles']))
+        results.sort(key=lambda result: result[1], reverse=True)
+        return results[:limit], list(terms)
+    
+    def search_laws_ranked(self, search_term, limit=20):
+        """Pesquisa leis (tolerando erros de digitação), com pontuação, trecho destacado e artigos encontrados"""
+        ranked, terms = self._rank_laws(search_term, limit)
+        if not ranked:
+            return []
+        
+        catalog = self._law_search_index
+        laws = {
+            law.id: law for law in self.db_session.query(Law).filter(Law.id.in_([law_id for law_id, _, _ in ranked]))
+        }
+        results = []
+        for law_id, score, articles in ranked:
+            law = laws.get(law_id)
+            if law is None:
+                continue
+            results.append({
+                'law': law,
+                'score': round(score, 4),
+                'snippet': make_snippet(catalog['texts'].get(('law', law_id, None), ''), terms),
+                'articles': [
+                    {
+                        'id': article_id,
+                        'article_number': catalog['article_numbers'].get(article_id),
+                        'score': round(article_score, 4),
+                        'snippet': make_snippet(catalog['texts'].get(('article', law_id, article_id), ''), terms)
+                    } for article_id, article_score in articles
+                ]
+            })
+        return results
+    
     def search_laws(self, search_term):
-        """Pesquisa leis por termo"""
-        search_pattern = f"%{search_term}%"
-        return self.db_session.query(Law).filter(
-            (Law.title.ilike(search_pattern)) |
-            (Law.summary.ilike(search_pattern)) |
-            (Law.full_text.ilike(search_pattern))
-        ).filter(Law.is_active == True).all()
+        """Pesquisa leis por termo (tolerando erros de digitação), da mais à menos relevante"""
+        return [result['law'] for result in self.search_laws_ranked(search_term)]
+    
+    def score_laws_for_occurrence(self, keywords):
+        """[(law_id, pontuação)] das leis relevantes para uma ocorrência, da mais à menos relevante, calculadas em memória"""
+        summaries = self._get_law_summaries()
+        ranked, _ = self._rank_laws(keywords)
+        
+        # Leis das categorias identificadas pelas palavras-chave
+        law_ids = []
+        for category in self._identify_categories_from_keywords(keywords):
+            law_ids.extend(summaries['categories'].get(category, ()))
+        if law_ids:
+            text_scores = {law_id: score for law_id, score, _ in ranked}
+            scored = [(law_id, self.CATEGORY_SCORE + text_scores.get(law_id, 0)) for law_id in dict.fromkeys(law_ids)]
+            return sorted(scored, key=lambda item: item[1], reverse=True)
+        
+        # Se não encontrou leis por categoria, usa a busca por todas as palavras-chave de uma vez no índice
+        return [(law_id, score) for law_id, score, _ in ranked]
+    
+    def get_relevant_law_ids_for_occurrence(self, keywords):
+        """Ids das leis relevantes para uma ocorrência, resolvidos em memória"""
+        return [law_id for law_id, _ in self.score_laws_for_occurrence(keywords)]
     
     def get_relevant_laws_for_occurrence(self, keywords):
-        """Obtém leis relevantes para uma ocorrência com base em palavras-chave"""
-        # Identificar categorias relevantes com base nas palavras-chave
-        categories = self._identify_categories_from_keywords(keywords)
-        
-        # Buscar leis nas categorias identificadas
-        laws = []
-        for category in categories:
-            category_laws = self.get_laws_by_category(category)
-            laws.extend(category_laws)
-        
-        # Se não encontrou leis por categoria, tenta busca direta
-        if not laws:
-            for keyword in keywords.split():
-                keyword_laws = self.search_laws(keyword)
-                for law in keyword_laws:
-                    if law not in laws:
-                        laws.append(law)
-        
-        return laws
+        """Obtém leis relevantes para uma ocorrência com base em palavras-chave (uma única consulta)"""
+        law_ids = self.get_relevant_law_ids_for_occurrence(keywords)
+        if not law_ids:
+            return []
+        laws = {law.id: law for law in self.db_session.query(Law).filter(Law.id.in_(law_ids))}
+        return [laws[law_id] for law_id in law_ids if law_id in laws]
     
     def _identify_categories_from_keywords(self, keywords):
         """Identifica categorias de leis com base em palavras-chave"""
         keywords_lower = keywords.lower()
         categories = []
         
-        # Mapeamento de palavras-chave para categorias
-        category_keywords = {
-            'barulho': ['barulho', 'som', 'ruído', 'música', 'festa'],
-            'obras': ['obra', 'reforma', 'construção', 'manutenção'],
-            'animais': ['animal', 'cachorro', 'gato', 'pet', 'latido'],
-            'estacionamento': ['estacionamento', 'vaga', 'garagem', 'veículo', 'carro'],
-            'áreas_comuns': ['área comum', 'piscina', 'salão', 'playground', 'academia'],
-            'segurança': ['segurança', 'incêndio', 'emergência', 'acidente'],
-            'lixo': ['lixo', 'resíduo', 'descarte', 'sujeira']
-        }
-        
-        for category, terms in category_keywords.items():
+        for category, terms in CATEGORY_KEYWORDS.items():
             if any(term in keywords_lower for term in terms):
                 categories.append(category)
         
+        # Palavras com erro de digitação ("cachoro", "baruho") são aproximadas do vocabulário
+        for word in set(tokenize(keywords)):
+            best = OCCURRENCE_VOCABULARY.best_match(word)
+            category = OCCURRENCE_TERM_CATEGORIES.get(best)
+            if category and category not in categories:
+                categories.append(category)
+        
         return categories
     
     def get_mappings_for_regulation_article(self, document_type, article_reference):
@@ -161,13 +364,102 @@ class LawIntegrationManager:
         self.db_session.commit()
         return mapping
     
+    def bulk_upsert_mappings(self, mappings):
+        """Cria ou atualiza vários mapeamentos em uma única transação"""
+        if not mappings:
+            return 0
+        
+        document_types = {m['document_type'] for m in mappings}
+        existing = {
+            (document_type, article_reference, law_article_id): mapping_id
+            for mapping_id, document_type, article_reference, law_article_id in self.db_session.query(
+                RegulationLawMapping.id,
+                RegulationLawMapping.document_type,
+                RegulationLawMapping.article_reference,
+                RegulationLawMapping.law_article_id
+            ).filter(RegulationLawMapping.document_type.in_(document_types))
+        }
+        
+        inserts = []
+        updates = []
+        seen = set()
+        for mapping in mappings:
+            key = (mapping['document_type'], mapping['article_reference'], mapping['law_article_id'])
+            if key in seen:
+                continue
+            seen.add(key)
+            if key in existing:
+                updates.append(dict(mapping, id=existing[key]))
+            else:
+                inserts.append(mapping)
+        
+        try:
+            if inserts:
+                self.db_session.bulk_insert_mappings(RegulationLawMapping, inserts)
+            if updates:
+                self.db_session.bulk_update_mappings(RegulationLawMapping, updates)
+            self.db_session.commit()
+        except Exception:
+            self.db_session.rollback()
+            raise
+        
+        return len(inserts) + len(updates)
+    
+    def _get_law_reference_matcher(self):
+        """Autômato e índices (número da lei, número do artigo) das leis ativas, recompilados apenas quando o catálogo muda"""
+        signature = self._law_catalog_signature()
+        if self._law_reference_matcher and self._law_reference_matcher['signature'] == signature:
+            return self._law_reference_matcher
+        
+        laws = self.db_session.query(Law.id, Law.number, Law.title).filter(Law.is_active == True).all()
+        # Todos os artigos das leis em uma única consulta, indexados por (lei, número do artigo)
+        article_index = {}
+        first_articles = {}
+        for article_id, law_id, article_number in self.db_session.query(
+            LawArticle.id, LawArticle.law_id, LawArticle.article_number
+        ).order_by(LawArticle.id):
+            first_articles.setdefault(law_id, article_id)
+            article_index.setdefault((law_id, canonical_article_number(article_number)), article_id)
+        
+        patterns = []
+        law_keys = {}
+        for law_id, number, title in laws:
+            patterns.append((number, law_id))
+            patterns.append((title, law_id))
+            for key in (canonical_law_key(number), canonical_law_key(title)):
+                if key:
+                    law_keys.setdefault(key, law_id)
+        
+        self._law_reference_matcher = {
+            'signature': signature,
+            'matcher': MultiPatternMatcher(patterns),
+            'titles': {law_id: title for law_id, _, title in laws},
+            'law_keys': law_keys,
+            'article_index': article_index,
+            'first_articles': first_articles
+        }
+        return self._law_reference_matcher
+    
+    def _resolve_citation(self, catalog, citation):
+        """Resolve uma citação para (law_id, law_article_id, exato?), ou None se a lei não estiver cadastrada"""
+        law_id = catalog['law_keys'].get(citation['law_key'])
+        if law_id is None:
+            return None
+        if citation['article']:
+            law_article_id = catalog['article_index'].get((law_id, citation['article']))
+            if law_article_id:
+                return law_id, law_article_id, True
+        law_article_id = catalog['first_articles'].get(law_id)
+        return (law_id, law_article_id, False) if law_article_id else None
+    
     def analyze_regulation_for_law_references(self):
         """Analisa o regimento/convenção para identificar referências a leis"""
-        # Obter todas as leis ativas
-        laws = self.db_session.query(Law).filter_by(is_active=True).all()
-        if not laws:
+        # Números e títulos de todas as leis ativas compilados em um único autômato
+        catalog = self._get_law_reference_matcher()
+        if not catalog['titles']:
             return False
         
+        mappings = []
         # Para cada tipo de documento
         for document_type in ['regimento_interno', 'convencao_condominial']:
             json_path = os.path.join(self.processed_docs_folder, f"{document_type}_artigos.json")
@@ -178,51 +470,360 @@ class LawIntegrationManager:
                 with open(json_path, 'r', encoding='utf-8') as f:
                     articles = json.load(f)
                 
-                # Para cada artigo no documento
-                for article in articles:
+                # Citações ("art. 1.336, IV, do Código Civil"); sequencial, pois roda no processo do app web
+                citations_per_article = parse_legal_citations_bulk(article.get('text', '') for article in articles)
+                
+                for article, citations in zip(articles, citations_per_article):
                     title = article.get('title', '')
-                    text = article.get('text', '')
+                    cited_laws = set()
+                    for citation in citations:
+                        resolved = self._resolve_citation(catalog, citation)
+                        if not resolved:
+                            continue
+                        law_id, law_article_id, exact = resolved
+                        cited_laws.add(law_id)
+                        if exact:
+                            subdivisions = ', '.join(filter(None, [
+                                f"§ {citation['paragraph']}" if citation['paragraph'] else None,
+                                f"inciso {citation['inciso']}" if citation['inciso'] else None
+                            ]))
+                            notes = f"Citação do art. {citation['article']}" + (f" ({subdivisions})" if subdivisions else '') + \
+                                f" da {catalog['titles'][law_id]} encontrada no texto do artigo."
+                        else:
+                            notes = f"Citação da {catalog['titles'][law_id]} sem artigo cadastrado correspondente; mapeado para o primeiro artigo."
+                        mappings.append({
+                            'document_type': document_type,
+                            'article_reference': title,
+                            'law_article_id': law_article_id,
+                            'relevance_score': 10 if exact else 8,
+                            'notes': notes
+                        })
                     
-                    # Para cada lei
-                    for law in laws:
-                        # Verificar se há menção à lei no texto do artigo
-                        if law.number.lower() in text.lower() or law.title.lower() in text.lower():
-                            # Criar mapeamento para o primeiro artigo da lei (simplificado)
-                            if law.articles:
-                                first_article = law.articles[0]
-                                self.create_or_update_mapping(
-                                    document_type=document_type,
-                                    article_reference=title,
-                                    law_article_id=first_article.id,
-                                    relevance_score=10,  # Alta relevância por menção direta
-                                    notes=f"Menção direta à {law.title} encontrada no texto do artigo."
-                                )
+                    # Menções por título ou número sem citação reconhecida: cada artigo é percorrido uma única vez
+                    for law_id in catalog['matcher'].find_all(article.get('text', '')) - cited_laws:
+                        # Mapeamento para o primeiro artigo da lei (simplificado)
+                        law_article_id = catalog['first_articles'].get(law_id)
+                        if law_article_id:
+                            mappings.append({
+                                'document_type': document_type,
+                                'article_reference': title,
+                                'law_article_id': law_article_id,
+                                'relevance_score': 8,
+                                'notes': f"Menção direta à {catalog['titles'][law_id]} encontrada no texto do artigo."
+                            })
             except Exception as e:
                 print(f"Erro ao analisar {document_type} para referências a leis: {e}")
         
+        try:
+            self.bulk_upsert_mappings(mappings)
+        except Exception as e:
+            print(f"Erro ao gravar mapeamentos de referências a leis: {e}")
+            return False
+        
         return True
     
+    def suggest_mappings_by_similarity(self, top_k=3, min_similarity=0.2):
+        """Preenche mapeamentos candidatos ligando cada artigo do regimento/convenção aos artigos de lei de texto mais parecido.
+        
+        Mapeamentos já existentes (ex.: citações explícitas) são preservados. Retorna quantos candidatos foram gravados.
+        """
+        from law_similarity import similar_law_articles  # NumPy/SciPy carregados apenas quando necessário
+        
+        regulation_articles = []
+        for document_type in ['regimento_interno', 'convencao_condominial']:
+            json_path = os.path.join(self.processed_docs_folder, f"{document_type}_artigos.json")
+            if not os.path.exists(json_path):
+                continue
+            with open(json_path, 'r', encoding='utf-8') as f:
+                for article in json.load(f):
+                    regulation_articles.append((document_type, article.get('title', ''), article.get('text', '')))
+        
+        law_articles = self.db_session.query(LawArticle.id, LawArticle.content, LawArticle.summary).join(Law).filter(
+            Law.is_active == True
+        ).all()
+        if not regulation_articles or not law_articles:
+            return 0
+        
+        pairs = similar_law_articles(
+            [text for _, _, text in regulation_articles],
+            [f"{content} {summary or ''}" for _, content, summary in law_articles],
+            k=top_k,
+            min_similarity=min_similarity
+        )
+        
+        existing = set(self.db_session.query(
+            RegulationLawMapping.document_type, RegulationLawMapping.article_reference, RegulationLawMapping.law_article_id
+        ))
+        mappings = []
+        for regulation_index, law_index, similarity in pairs:
+            document_type, title, _ = regulation_articles[regulation_index]
+            law_article_id = law_articles[law_index][0]
+            if (document_type, title, law_article_id) in existing:
+                continue
+            mappings.append({
+                'document_type': document_type,
+                'article_reference': title,
+                'law_article_id': law_article_id,
+                # Candidatos por similaridade ficam abaixo das citações explícitas (8-10)
+                'relevance_score': max(1, round(similarity * 7)),
+                'notes': f"Candidato por similaridade textual (cosseno {similarity:.2f})."
+            })
+        return self.bulk_upsert_mappings(mappings)
+    
     def get_law_references_for_occurrence(self, occurrence):
-        """Obtém referências a leis para uma ocorrência específica"""
+        """Obtém referências a leis para uma ocorrência específica (mesmos campos de get_stored_law_references)"""
         # Extrair palavras-chave da ocorrência
         keywords = f"{occurrence.title} {occurrence.description}"
         
-        # Obter leis relevantes
-        relevant_laws = self.get_relevant_laws_for_occurrence(keywords)
+        # Leis relevantes, formatadas a partir do resumo em memória (sem consultar o banco no caso comum)
+        laws = self._get_law_summaries()['laws']
+        return [
+            dict(laws[law_id], relevance_score=round(score, 4))
+            for law_id, score in self.score_laws_for_occurrence(keywords) if law_id in laws
+        ]
+
+    def store_occurrence_relevance(self, occurrences):
+        """Recalcula e grava a relevância das leis para as ocorrências [(id, título, descrição)] em uma única transação"""
+        occurrences = list(occurrences)
+        if not occurrences:
+            return 0
         
-        # Formatar resultados
-        results = []
-        for law in relevant_laws:
-            results.append({
-                'id': law.id,
-                'title': law.title,
-                'number': law.number,
-                'jurisdiction': law.jurisdiction,
-                'summary': law.summary,
-                'official_link': law.official_link
-            })
+        computed_at = datetime.utcnow()
+        rows = [
+            {
+                'occurrence_id': occurrence_id,
+                'law_id': law_id,
+                'relevance_score': round(score, 4),
+                'computed_at': computed_at
+            }
+            for occurrence_id, title, description in occurrences
+            for law_id, score in self.score_laws_for_occurrence(f"{title} {description}")
+        ]
+        law_counts = {occurrence[0]: 0 for occurrence in occurrences}
+        for row in rows:
+            law_counts[row['occurrence_id']] += 1
+        occurrence_ids = list(law_counts)
+        try:
+            self.db_session.query(OccurrenceLawRelevance).filter(
+                OccurrenceLawRelevance.occurrence_id.in_(occurrence_ids)
+            ).delete(synchronize_session=False)
+            self.db_session.query(OccurrenceLawRelevanceMarker).filter(
+                OccurrenceLawRelevanceMarker.occurrence_id.in_(occurrence_ids)
+            ).delete(synchronize_session=False)
+            if rows:
+                self.db_session.bulk_insert_mappings(OccurrenceLawRelevance, rows)
+            # Marcador por ocorrência: distingue "sem leis relevantes" de "ainda não calculada"
+            self.db_session.bulk_insert_mappings(OccurrenceLawRelevanceMarker, [
+                {'occurrence_id': occurrence_id, 'law_count': count, 'computed_at': computed_at}
+                for occurrence_id, count in law_counts.items()
+            ])
+            self.db_session.commit()
+        except Exception:
+            self.db_session.rollback()
+            raise
+        return len(rows)
+    
+    def delete_occurrence_relevance(self, occurrence_ids):
+        """Remove a relevância calculada para ocorrências excluídas"""
+        occurrence_ids = list(occurrence_ids)
+        try:
+            self.db_session.query(OccurrenceLawRelevance).filter(
+                OccurrenceLawRelevance.occurrence_id.in_(occurrence_ids)
+            ).delete(synchronize_session=False)
+            self.db_session.query(OccurrenceLawRelevanceMarker).filter(
+                OccurrenceLawRelevanceMarker.occurrence_id.in_(occurrence_ids)
+            ).delete(synchronize_session=False)
+            self.db_session.commit()
+        except Exception:
+            self.db_session.rollback()
+            raise
+    
+    def recompute_all_occurrence_relevance(self, occurrence_model, batch_size=500):
+        """Recalcula a relevância de todas as ocorrências, em lotes percorridos pelo id"""
+        last_id = 0
+        total = 0
+        while True:
+            batch = self.db_session.query(
+                occurrence_model.id, occurrence_model.title, occurrence_model.description
+            ).filter(occurrence_model.id > last_id).order_by(occurrence_model.id).limit(batch_size).all()
+            if not batch:
+                return total
+            self.store_occurrence_relevance(batch)
+            last_id = batch[-1][0]
+            total += len(batch)
+    
+    def get_stored_law_references(self, occurrence_id):
+        """Referências a leis já calculadas para a ocorrência, em uma única consulta pelo índice.
         
-        return results
+        Retorna None se a relevância da ocorrência ainda não foi calculada ([] se não há leis relevantes).
+        """
+        rows = self.db_session.query(
+            Law.id, Law.title, Law.number, Law.jurisdiction, Law.summary, Law.official_link,
+            OccurrenceLawRelevance.relevance_score
+        ).select_from(OccurrenceLawRelevanceMarker).outerjoin(
+            OccurrenceLawRelevance, OccurrenceLawRelevance.occurrence_id == OccurrenceLawRelevanceMarker.occurrence_id
+        ).outerjoin(
+            Law, and_(Law.id == OccurrenceLawRelevance.law_id, Law.is_active == True)
+        ).filter(
+            OccurrenceLawRelevanceMarker.occurrence_id == occurrence_id
+        ).order_by(OccurrenceLawRelevance.relevance_score.desc()).all()
+        if not rows:
+            return None
+        return [
+            {
+                'id': law_id,
+                'title': title,
+                'number': number,
+                'jurisdiction': jurisdiction,
+                'summary': summary,
+                'official_link': official_link,
+                'relevance_score': relevance_score
+            } for law_id, title, number, jurisdiction, summary, official_link, relevance_score in rows
+            if law_id is not None
+        ]
+
+# Manutenção da tabela de relevância em segundo plano
+class OccurrenceRelevanceWorker:
+    """Recalcula a relevância das ocorrências gravadas e, quando o catálogo de leis muda, de todas elas.
+    
+    Usa sessão própria; as ocorrências são enfileiradas após o commit de quem as gravou. O modelo de
+    ocorrência é obtido por load_occurrence_model já na thread, e não no registro das rotas (import circular).
+    """
+    
+    def __init__(self, engine_getter, load_occurrence_model, processed_docs_folder, batch_size=200, watched_session=None):
+        self._engine_getter = engine_getter
+        self._load_occurrence_model = load_occurrence_model
+        self._occurrence_model = None
+        self._watched_session = watched_session
+        self._processed_docs_folder = processed_docs_folder
+        self.batch_size = batch_size
+        self._queue = queue.Queue()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._manager = None
+        self._computed_signature = None
+    
+    def start(self):
+        """Inicia a thread de recálculo em segundo plano"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='occurrence-law-relevance', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+    
+    def stop(self):
+        """Interrompe a thread (o que estiver na fila é recalculado na próxima consulta ou mudança de catálogo)"""
+        self._stopped.set()
+        self._queue.put(None)
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=5)
+        if self._manager is not None and not (self._thread and self._thread.is_alive()):
+            # Sessão própria do worker; se a thread ainda estiver rodando, ela continua usando-a
+            self._manager.db_session.close()
+            self._manager = None
+    
+    def enqueue(self, occurrence_id, title=None, description=None, deleted=False):
+        """Agenda o recálculo (ou a remoção) da relevância de uma ocorrência"""
+        self._queue.put((occurrence_id, title, description, deleted))
+    
+    def watch(self, session, occurrence_model):
+        """Enfileira ocorrências criadas, editadas (título/descrição) ou excluídas, somente após o commit"""
+        def remember(target, deleted):
+            target_session = object_session(target)
+            if target_session is not None:
+                pending = target_session.info.setdefault('occurrence_relevance_pending', {})
+                pending[target.id] = (target.title, target.description, deleted)
+        
+        def after_insert(mapper, connection, target):
+            remember(target, False)
+        
+        def after_update(mapper, connection, target):
+            state = inspect(target)
+            if state.attrs.title.history.has_changes() or state.attrs.description.history.has_changes():
+                remember(target, False)
+        
+        def after_delete(mapper, connection, target):
+            remember(target, True)
+        
+        def after_commit(committed_session):
+            pending = committed_session.info.pop('occurrence_relevance_pending', {})
+            for occurrence_id, (title, description, deleted) in pending.items():
+                self.enqueue(occurrence_id, title, description, deleted)
+        
+        def after_rollback(rolled_back_session):
+            rolled_back_session.info.pop('occurrence_relevance_pending', None)
+        
+        event.listen(occurrence_model, 'after_insert', after_insert)
+        event.listen(occurrence_model, 'after_update', after_update)
+        event.listen(occurrence_model, 'after_delete', after_delete)
+        event.listen(session, 'after_commit', after_commit)
+        event.listen(session, 'after_rollback', after_rollback)
+    
+    def _attach(self):
+        """Obtém o modelo de ocorrência e passa a observar suas gravações (uma vez, antes do primeiro recálculo)"""
+        if self._occurrence_model is None:
+            occurrence_model = self._load_occurrence_model()
+            if self._watched_session is not None:
+                self.watch(self._watched_session, occurrence_model)
+            self._occurrence_model = occurrence_model
+    
+    def _get_manager(self):
+        if self._manager is None:
+            session = sessionmaker(bind=self._engine_getter())()
+            self._manager = LawIntegrationManager(session, self._processed_docs_folder)
+        return self._manager
+    
+    def _process(self, items):
+        manager = self._get_manager()
+        updates = {}
+        deletions = set()
+        for occurrence_id, title, description, deleted in items:
+            if deleted:
+                deletions.add(occurrence_id)
+                updates.pop(occurrence_id, None)
+            else:
+                updates[occurrence_id] = (occurrence_id, title, description)
+                deletions.discard(occurrence_id)
+        if updates:
+            manager.store_occurrence_relevance(updates.values())
+        if deletions:
+            manager.delete_occurrence_relevance(deletions)
+    
+    def _check_catalog(self):
+        """Recalcula tudo quando o catálogo de leis muda (e na primeira execução)"""
+        manager = self._get_manager()
+        signature = manager._law_catalog_signature()
+        if signature != self._computed_signature:
+            manager.recompute_all_occurrence_relevance(self._occurrence_model)
+            self._computed_signature = signature
+    
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                # Observar antes do recálculo completo: o que for gravado depois entra pela fila
+                self._attach()
+                self._check_catalog()
+                item = self._queue.get(timeout=LawIntegrationManager.CATALOG_RECHECK_SECONDS)
+            except queue.Empty:
+                continue
+            except Exception as e:
+                print(f"Erro ao recalcular a relevância das ocorrências: {e}")
+                self._stopped.wait(LawIntegrationManager.CATALOG_RECHECK_SECONDS)
+                continue
+            
+            items = [item] if item else []
+            while len(items) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item:
+                    items.append(item)
+            try:
+                self._process(items)
+            except Exception as e:
+                print(f"Erro ao recalcular a relevância das ocorrências: {e}")
 
 # Função para criar tabelas no banco de dados
 def create_law_integration_tables(engine):
@@ -367,6 +968,19 @@ def register_law_integration_routes(app, db):
     """Registra as rotas para a integração com leis vigentes"""
     law_manager = LawIntegrationManager(db.session, app.config['PROCESSED_DOCS_FOLDER'])
     
+    def get_engine():
+        with app.app_context():
+            return db.engine
+    
+    def load_occurrence_model():
+        from models import Occurrence  # Importar aqui para evitar circular import
+        return Occurrence
+    
+    # Relevância ocorrência -> leis mantida na gravação das ocorrências e nas mudanças do catálogo
+    relevance_worker = OccurrenceRelevanceWorker(get_engine, load_occurrence_model, app.config['PROCESSED_DOCS_FOLDER'],
+                                                 watched_session=db.session)
+    relevance_worker.start()
+    
     @app.route('/leis')
     @login_required
     def law_list():
@@ -394,33 +1008,40 @@ def register_law_integration_routes(app, db):
         if not search_term:
             return jsonify({'error': 'Termo de busca não fornecido'}), 400
         
-        laws = law_manager.search_laws(search_term)
+        results = law_manager.search_laws_ranked(search_term, limit=min(request.args.get('limit', 20, type=int), 100))
         
         return jsonify({
             'laws': [
                 {
-                    'id': law.id,
-                    'title': law.title,
-                    'number': law.number,
-                    'jurisdiction': law.jurisdiction,
-                    'category': law.category,
-                    'summary': law.summary
-                } for law in laws
+                    'id': result['law'].id,
+                    'title': result['law'].title,
+                    'number': result['law'].number,
+                    'jurisdiction': result['law'].jurisdiction,
+                    'category': result['law'].category,
+                    'summary': result['law'].summary,
+                    'score': result['score'],
+                    'snippet': result['snippet'],
+                    'articles': result['articles']
+                } for result in results
             ],
-            'count': len(laws)
+            'count': len(results)
         })
     
     @app.route('/api/laws/for-occurrence/<int:occurrence_id>')
     @login_required
     def api_laws_for_occurrence(occurrence_id):
         """API para obter leis relevantes para uma ocorrência"""
-        from models import Occurrence  # Importar aqui para evitar circular import
+        # Caso comum: relevância já calculada na gravação da ocorrência
+        law_references = law_manager.get_stored_law_references(occurrence_id)
         
-        occurrence = db.session.query(Occurrence).filter_by(id=occurrence_id).first()
-        if not occurrence:
-            return jsonify({'error': 'Ocorrência não encontrada'}), 404
-        
-        law_references = law_manager.get_law_references_for_occurrence(occurrence)
+        if law_references is None:
+            # Ocorrência ainda não processada: calcular agora e agendar a gravação
+            from models import Occurrence  # Importar aqui para evitar circular import
+            occurrence = db.session.query(Occurrence).filter_by(id=occurrence_id).first()
+            if not occurrence:
+                return jsonify({'error': 'Ocorrência não encontrada'}), 404
+            law_references = law_manager.get_law_references_for_occurrence(occurrence)
+            relevance_worker.enqueue(occurrence.id, occurrence.title, occurrence.description)
         
         return jsonify({
             'occurrence_id': occurrence_id,
@@ -441,3 +1062,18 @@ def register_law_integration_routes(app, db):
             return jsonify({'message': 'Análise concluída com sucesso'})
         else:
             return jsonify({'error': 'Erro ao analisar documentos'}), 500
+    
+    @app.route('/api/laws/similarity-mappings', methods=['POST'])
+    @login_required
+    def api_similarity_mappings():
+        """API para sugerir mapeamentos entre regimento/convenção e artigos de lei por similaridade textual"""
+        top_k = min(request.args.get('top_k', 3, type=int), 10)
+        min_similarity = request.args.get('min_similarity', 0.2, type=float)
+        
+        try:
+            created = law_manager.suggest_mappings_by_similarity(top_k, min_similarity)
+        except Exception as e:
+            print(f"Erro ao calcular similaridade entre artigos: {e}")
+            return jsonify({'error': 'Erro ao calcular similaridade entre artigos'}), 500
+        
+        return jsonify({'message': 'Análise concluída com sucesso', 'mappings': created})
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+import zlib
+import numpy as np
+import scipy.sparse as sp
+
+from search_index import STOPWORDS, tokenize
+
+class HashedTfidfVectorizer:
+    """TF-IDF sobre unigramas e bigramas de palavras, com hashing (sem vocabulário em memória)"""
+
+    def __init__(self, n_features=2 ** 18, ngram_range=(1, 2), max_df=0.5):
+        self.n_features = n_features
+        self.ngram_range = ngram_range
+        # N-gramas presentes em mais que essa fração dos textos não distinguem nada e só adensam o produto
+        self.max_df = max_df
+        self.idf = None
+
+    def _features(self, text):
+        """Índices (hash estável entre processos) dos n-gramas do texto"""
+        words = [word for word in tokenize(text) if word not in STOPWORDS]
+        features = []
+        for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
+            for i in range(len(words) - n + 1):
+                features.append(zlib.crc32(' '.join(words[i:i + n]).encode('utf-8')) % self.n_features)
+        return features
+
+    def _term_counts(self, texts):
+        """Matriz esparsa (CSR) de contagens de n-gramas por texto"""
+        indptr = [0]
+        indices = []
+        for text in texts:
+            indices.extend(self._features(text))
+            indptr.append(len(indices))
+        data = np.ones(len(indices), dtype=np.float32)
+        counts = sp.csr_matrix(
+            (data, np.asarray(indices, dtype=np.int32), np.asarray(indptr, dtype=np.int64)),
+            shape=(len(texts), self.n_features)
+        )
+        counts.sum_duplicates()
+        return counts
+
+    def fit_transform(self, texts):
+        """Calcula o IDF sobre os textos e retorna os vetores TF-IDF normalizados (norma L2)"""
+        counts = self._term_counts(texts)
+        document_frequency = np.bincount(counts.indices, minlength=self.n_features)
+        self.idf = (np.log((1 + counts.shape[0]) / (1 + document_frequency)) + 1).astype(np.float32)
+        if counts.shape[0] >= 100:
+            # Em coleções pequenas a frequência relativa não é confiável: só podar a partir de 100 textos
+            self.idf[document_frequency > self.max_df * counts.shape[0]] = 0
+        return self._weight(counts)
+
+    def transform(self, texts):
+        """Vetores TF-IDF normalizados com o IDF já calculado"""
+        if self.idf is None:
+            raise ValueError("Vetorizador ainda não ajustado (chame fit_transform antes)")
+        return self._weight(self._term_counts(texts))
+
+    def _weight(self, counts):
+        # TF sublinear (1 + log tf) ponderado pelo IDF
+        counts.data = (1 + np.log(counts.data)) * self.idf[counts.indices]
+        counts.eliminate_zeros()
+        norms = np.sqrt(np.asarray(counts.multiply(counts).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        return sp.csr_matrix(sp.diags(1 / norms).dot(counts))
+
+def top_k_cosine(queries, candidates, k=3, min_similarity=0.0, batch_size=1000):
+    """Para cada linha de queries, os k candidatos mais similares (vetores já normalizados).
+
+    O produto esparso é feito em lotes de linhas, limitando a memória ao tamanho de um lote.
+    Retorna três arrays: linha da consulta, coluna do candidato e similaridade (cosseno).
+    """
+    candidates_t = sp.csr_matrix(candidates.T)
+    rows, cols, scores = [], [], []
+    for start in range(0, queries.shape[0], batch_size):
+        similarities = sp.csr_matrix(queries[start:start + batch_size].dot(candidates_t))
+        for offset in range(similarities.shape[0]):
+            begin, end = similarities.indptr[offset], similarities.indptr[offset + 1]
+            if begin == end:
+                continue
+            data = similarities.data[begin:end]
+            indices = similarities.indices[begin:end]
+            if end - begin > k:
+                best = np.argpartition(-data, k)[:k]
+                data, indices = data[best], indices[best]
+            keep = data >= min_similarity
+            order = np.argsort(-data[keep])
+            rows.append(np.full(order.size, start + offset, dtype=np.int64))
+            cols.append(indices[keep][order])
+            scores.append(data[keep][order])
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(scores)
+
+def similar_law_articles(regulation_texts, law_texts, k=3, min_similarity=0.2, batch_size=1000):
+    """Liga textos do regimento/convenção aos artigos de lei mais parecidos.
+
+    O IDF é calculado sobre os dois conjuntos juntos. Retorna [(índice do texto, índice do artigo de lei, similaridade)].
+    """
+    if not regulation_texts or not law_texts:
+        return []
+    vectorizer = HashedTfidfVectorizer()
+    vectors = vectorizer.fit_transform(list(regulation_texts) + list(law_texts))
+    split = len(regulation_texts)
+    rows, cols, scores = top_k_cosine(vectors[:split], vectors[split:], k, min_similarity, batch_size)
+    return list(zip(rows.tolist(), cols.tolist(), scores.tolist()))
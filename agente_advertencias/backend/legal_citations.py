@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+import re
+import unicodedata
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+from search_index import normalize_text
+
+# Leis conhecidas pelo nome, mapeadas para a chave canônica "número/ano"
+NAMED_LAWS = {
+    'codigo civil': '10406/2002',
+    'cc': '10406/2002',
+    'lei de condominios': '4591/1964',
+    'lei do condominio': '4591/1964',
+    'lei do inquilinato': '8245/1991',
+    'codigo de defesa do consumidor': '8078/1990',
+    'cdc': '8078/1990',
+    'codigo penal': '2848/1940',
+    'lei de contravencoes penais': '3688/1941',
+    'estatuto da cidade': '10257/2001'
+}
+
+# Os padrões são aplicados sobre o texto normalizado (minúsculas, sem acentos): º vira "o"
+_NUMBER = r'\d{1,3}(?:\.\d{3})+|\d+'
+_LAW_RE = re.compile(
+    r'\b(?:lei|decreto(?:-lei)?)(?:\s+(?:federal|estadual|municipal|complementar|ordinaria|distrital))?'
+    r'\s*(?:n\s*[o.]*\s*|numero\s+)?(?P<number>' + _NUMBER + r')'
+    r'(?:\s*/\s*(?P<year>\d{4}|\d{2})\b|,?\s+de\s+\d{1,2}o?\s+de\s+[a-z]+\s+de\s+(?P<year_long>\d{4})\b)'
+    r'|\b(?P<named>' + '|'.join(sorted((re.escape(name) for name in NAMED_LAWS), key=len, reverse=True)) + r')\b'
+)
+_ARTICLE_RE = re.compile(
+    r'\barts?\.?\s*(?P<articles>(?:' + _NUMBER + r')\s*o?(?:\s*(?:,|\be\b)\s*(?:' + _NUMBER + r')\s*o?(?![\d/]))*)'
+    r'|\bartigos?\s+(?P<articles_long>(?:' + _NUMBER + r')\s*o?(?:\s*(?:,|\be\b)\s*(?:' + _NUMBER + r')\s*o?(?![\d/]))*)'
+)
+_ARTICLE_NUMBER_RE = re.compile(_NUMBER)
+_PARAGRAPH_RE = re.compile(r'§\s*(\d+)|paragrafo\s+(unico|\d+)')
+# Incisos em algarismos romanos: procurados no texto original, já que a normalização os põe em minúsculas
+_INCISO_RE = re.compile(r'(?:\b[Ii]nciso\s+([IVXLCivxlc]+)|,\s*([IVXLC]+))\b')
+# Trecho permitido entre o artigo e a lei citada ("art. 1.336, IV, do Código Civil")
+_ARTICLE_TO_LAW_GAP_RE = re.compile(r'^[\s,]*(?:(?:§\s*\d+o?|paragrafo\s+\w+|inciso\s+[ivxlc]+|[ivxlc]+|alinea\s+\W?[a-z]\W?)[\s,]*)*(?:d[oa]s?\s+|desta\s+|deste\s+)?$')
+# Parágrafo/inciso citado antes do artigo ("§ 2º do art. 1.336", "inciso IV do parágrafo único do art. 9º")
+_LEADING_SUBDIVISION_RE = re.compile(
+    r'(?:\binciso\s+(?P<inciso>[ivxlc]+)o?\s*,?\s*(?:d[oa]\s+)?)?'
+    r'(?:(?:§\s*(?P<paragraph>\d+)|\bparagrafo\s+(?P<paragraph_word>unico|\d+))o?\s*,?\s*(?:d[oa]\s+)?)?$'
+)
+# Trecho permitido entre a lei e o artigo ("Lei nº 4.591/64, art. 9º")
+_LAW_TO_ARTICLE_GAP_RE = re.compile(r'^\s*,?\s*(?:em\s+seu\s+|no\s+)?$')
+
+def canonical_law_key(text):
+    """Chave canônica de uma lei a partir do número ("Lei nº 4.591/64" -> "4591/1964") ou do nome"""
+    normalized = normalize_text(text)
+    match = _LAW_RE.search(normalized)
+    if not match:
+        return None
+    return _match_law_key(match)
+
+def canonical_article_number(text):
+    """Número canônico de um artigo ("Art. 1.336" -> "1336", "Art. 1º" -> "1")"""
+    match = _ARTICLE_NUMBER_RE.search(text or '')
+    return str(int(match.group(0).replace('.', ''))) if match else None
+
+def _match_law_key(match):
+    """Chave canônica de uma ocorrência de _LAW_RE"""
+    if match.group('named'):
+        return NAMED_LAWS[match.group('named')]
+    return _law_key(match.group('number'), match.group('year') or match.group('year_long'))
+
+def _law_key(number, year):
+    year = int(year)
+    if year < 100:
+        # Anos com dois dígitos: "64" -> 1964, "16" -> 2016
+        year += 2000 if year <= datetime.utcnow().year % 100 else 1900
+    return f"{int(number.replace('.', ''))}/{year}"
+
+def _aligned_normalization(text):
+    """Texto normalizado, o texto com a caixa original alinhado a ele e a posição no original de cada caractere.
+
+    Usado quando a normalização muda o comprimento (acentos decompostos, ligaduras): os incisos em romanos
+    são lidos com a caixa original, e as posições das citações são convertidas de volta ao texto recebido.
+    """
+    normalized, cased, origin = [], [], []
+    for index, char in enumerate(text):
+        for decomposed in unicodedata.normalize('NFKD', char):
+            if unicodedata.combining(decomposed):
+                continue
+            for lowered in decomposed.lower():
+                normalized.append(lowered)
+                cased.append(decomposed)
+                origin.append(index)
+    origin.append(len(text))
+    return ''.join(normalized), ''.join(cased), origin
+
+def _subdivisions(original_segment, normalized_segment):
+    """Extrai parágrafo e inciso do trecho entre o número do artigo e o fim da citação"""
+    paragraph = None
+    paragraph_match = _PARAGRAPH_RE.search(normalized_segment)
+    if paragraph_match:
+        paragraph = 'unico' if paragraph_match.group(2) == 'unico' else str(int(paragraph_match.group(1) or paragraph_match.group(2)))
+    inciso_match = _INCISO_RE.search(original_segment)
+    inciso = (inciso_match.group(1) or inciso_match.group(2)).upper() if inciso_match else None
+    return paragraph, inciso
+
+def _leading_subdivisions(normalized, article_start):
+    """Parágrafo, inciso e início do trecho citado antes do artigo ("§ 2º do art. 1.336"), se houver"""
+    match = _LEADING_SUBDIVISION_RE.search(normalized, max(0, article_start - 60), article_start)
+    if not match or not (match.group('inciso') or match.group('paragraph') or match.group('paragraph_word')):
+        return None, None, article_start
+    paragraph = match.group('paragraph') or match.group('paragraph_word')
+    if paragraph and paragraph != 'unico':
+        paragraph = str(int(paragraph))
+    inciso = match.group('inciso').upper() if match.group('inciso') else None
+    return paragraph, inciso, match.start()
+
+def parse_legal_citations(text):
+    """Reconhece citações legais no texto.
+
+    Retorna uma lista de dicionários com law_key ("número/ano"), article (ou None),
+    paragraph, inciso e a posição (start, end) da citação no texto.
+    """
+    if not text:
+        return []
+    normalized = normalize_text(text)
+    origin = None
+    if len(normalized) != len(text):
+        # A normalização mudou o comprimento: texto com a caixa original alinhado ao normalizado
+        normalized, text, origin = _aligned_normalization(text)
+
+    laws = [(m.start(), m.end(), m) for m in _LAW_RE.finditer(normalized)]
+    articles = [(m.start(), m.end(), m) for m in _ARTICLE_RE.finditer(normalized)]
+
+    citations = []
+    used_laws = set()
+    for article_start, article_end, article_match in articles:
+        numbers = _ARTICLE_NUMBER_RE.findall(article_match.group('articles') or article_match.group('articles_long'))
+        law = None
+        # Forma "art. 9º da Lei 4.591/64": a lei vem logo depois do artigo
+        for index, (law_start, law_end, law_match) in enumerate(laws):
+            if law_start >= article_end and law_start - article_end <= 60 and \
+               _ARTICLE_TO_LAW_GAP_RE.match(normalized[article_end:law_start]):
+                law = (index, law_start, law_end, law_match)
+                segment_end = law_start
+                break
+        # Forma "Lei nº 4.591/64, art. 9º": a lei vem logo antes do artigo
+        if law is None:
+            for index, (law_start, law_end, law_match) in enumerate(laws):
+                if law_end <= article_start and _LAW_TO_ARTICLE_GAP_RE.match(normalized[law_end:article_start]):
+                    law = (index, law_start, law_end, law_match)
+                    segment_end = min(len(normalized), article_end + 40)
+                    break
+        if law is None:
+            continue  # Artigo sem lei identificada (provavelmente do próprio regimento)
+
+        index, law_start, law_end, law_match = law
+        used_laws.add(index)
+        law_key = _match_law_key(law_match)
+        paragraph, inciso = _subdivisions(text[article_end:segment_end], normalized[article_end:segment_end])
+        citation_start = article_start
+        if len(numbers) == 1 and paragraph is None and inciso is None:
+            # Forma "§ 2º do art. 1.336": as subdivisões vêm antes do artigo
+            paragraph, inciso, citation_start = _leading_subdivisions(normalized, article_start)
+        for number in numbers:
+            citations.append({
+                'law_key': law_key,
+                'article': str(int(number.replace('.', ''))),
+                'paragraph': paragraph if len(numbers) == 1 else None,
+                'inciso': inciso if len(numbers) == 1 else None,
+                'start': min(citation_start, law_start),
+                'end': max(article_end, law_end)
+            })
+
+    # Leis citadas sem artigo
+    for index, (law_start, law_end, law_match) in enumerate(laws):
+        if index in used_laws:
+            continue
+        citations.append({
+            'law_key': _match_law_key(law_match),
+            'article': None,
+            'paragraph': None,
+            'inciso': None,
+            'start': law_start,
+            'end': law_end
+        })
+
+    if origin is not None:
+        for citation in citations:
+            citation['start'] = origin[citation['start']]
+            citation['end'] = origin[citation['end'] - 1] + 1
+    citations.sort(key=lambda c: c['start'])
+    return citations
+
+def _parse_batch(texts):
+    return [parse_legal_citations(text) for text in texts]
+
+def parse_legal_citations_bulk(texts, workers=None, parallel_threshold=None, chunk_size=200):
+    """Reconhece citações em muitos textos; em paralelo (processos) só a partir de parallel_threshold textos.
+
+    Sem parallel_threshold o processamento é sequencial: é o caso do app web, cujo processo mantém threads
+    em segundo plano. Scripts offline podem ativar o paralelismo; os processos são criados com 'spawn',
+    nunca com fork de um processo que tenha threads com locks adquiridos.
+    """
+    texts = list(texts)
+    if parallel_threshold is None or len(texts) < parallel_threshold:
+        return _parse_batch(texts)
+
+    chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            return [citations for batch in executor.map(_parse_batch, chunks) for citations in batch]
+    except (OSError, RuntimeError) as e:
+        # Ambientes sem suporte a multiprocessamento: processar sequencialmente
+        print(f"Processamento paralelo indisponível ({e}); processando sequencialmente.")
+        return _parse_batch(texts)
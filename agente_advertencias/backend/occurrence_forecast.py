@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+# Eixos do tensor de taxas: unidade x categoria x dia da semana x período do dia
+AXES = ('unit', 'category', 'weekday', 'period')
+
+def weekdays_of(days):
+    """Dia da semana (segunda = 0) de um array datetime64[D]; 1970-01-01 foi uma quinta-feira (3)"""
+    return (np.asarray(days, dtype='datetime64[D]').astype('int64') + 3) % 7
+
+def hour_periods(periods):
+    """Array de 24 posições com o índice do período de cada hora; períodos podem cruzar a meia-noite"""
+    lookup = np.full(24, -1, dtype=np.int64)
+    for index, (start, end) in enumerate(periods.values()):
+        hours = np.arange(start, end) if start < end else np.r_[np.arange(start, 24), np.arange(0, end)]
+        lookup[hours] = index
+    if (lookup < 0).any():
+        raise ValueError("Os períodos do dia precisam cobrir as 24 horas")
+    return lookup
+
+class SeasonalRateModel:
+    """Taxas de ocorrência por (unidade, categoria, dia da semana, período do dia), modelo Gamma-Poisson.
+
+    A taxa de cada célula é a média a posteriori entre a contagem observada e uma taxa a priori: o perfil
+    semanal da categoria (média das unidades, suavizado entre dias e períodos vizinhos) multiplicado pela
+    intensidade da unidade naquela categoria. Com distribution='negbin' as probabilidades vêm da preditiva
+    a posteriori (binomial negativa), que inclui a incerteza das taxas; com 'poisson', da taxa média.
+    """
+
+    def __init__(self, n_units, n_categories, periods=None, prior_strength=30.0, unit_shrinkage=2.0,
+                 smoothing=0.25, half_life_days=None, distribution='negbin'):
+        if distribution not in ('negbin', 'poisson'):
+            raise ValueError("distribution deve ser 'negbin' ou 'poisson'")
+        self.n_units = n_units
+        self.n_categories = n_categories
+        self.periods = periods or {'dia': (0, 24)}
+        self.hour_period = hour_periods(self.periods)
+        # Peso da taxa a priori, em dias de observação equivalentes
+        self.prior_strength = prior_strength
+        # Pseudo-contagens que puxam a intensidade de unidades com poucos dados para a média
+        self.unit_shrinkage = unit_shrinkage
+        # Fração do perfil repassada a cada vizinho (dia da semana e período) na suavização sazonal
+        self.smoothing = smoothing
+        # Meia-vida (dias) do peso das ocorrências antigas; None pesa todo o histórico igualmente
+        self.half_life_days = half_life_days
+        self.distribution = distribution
+        self.shape_ = None
+        self.rate_ = None
+
+    def _smooth(self, profile):
+        """Suavização circular do perfil [categoria, dia da semana, período] entre vizinhos"""
+        s = self.smoothing
+        for axis in (1, 2):
+            if profile.shape[axis] > 2:
+                profile = (1 - 2 * s) * profile + s * (np.roll(profile, 1, axis) + np.roll(profile, -1, axis))
+        return profile
+
+    def fit(self, unit_index, category_index, timestamps, start=None, end=None):
+        """Ajusta as taxas às ocorrências no intervalo de dias [start, end) (padrão: todo o histórico)"""
+        unit_index = np.asarray(unit_index, dtype=np.int64)
+        category_index = np.asarray(category_index, dtype=np.int64)
+        timestamps = np.asarray(timestamps, dtype='datetime64[m]')
+        days = timestamps.astype('datetime64[D]')
+        if start is None:
+            start = days.min() if days.size else np.datetime64('today', 'D')
+        if end is None:
+            end = days.max() + 1 if days.size else np.datetime64(start, 'D') + 1
+        start, end = np.datetime64(start, 'D'), np.datetime64(end, 'D')
+
+        selected = (days >= start) & (days < end)
+        days = days[selected]
+        hours = ((timestamps[selected] - days) // np.timedelta64(1, 'h')).astype(np.int64)
+        n_periods = len(self.periods)
+        cells = (((unit_index[selected] * self.n_categories + category_index[selected]) * 7
+                  + weekdays_of(days)) * n_periods + self.hour_period[hours])
+
+        calendar = np.arange(start, end, dtype='datetime64[D]')
+        if self.half_life_days:
+            # Peso decai com a idade contada a partir do último dia do intervalo
+            event_weights = 0.5 ** ((end - 1 - days).astype('int64') / self.half_life_days)
+            day_weights = 0.5 ** ((end - 1 - calendar).astype('int64') / self.half_life_days)
+        else:
+            event_weights = None
+            day_weights = np.ones(calendar.size)
+
+        shape = (self.n_units, self.n_categories, 7, n_periods)
+        counts = np.bincount(cells, weights=event_weights, minlength=int(np.prod(shape))).reshape(shape)
+        # Exposição: dias (ponderados) observados de cada dia da semana
+        exposure = np.bincount(weekdays_of(calendar), weights=day_weights, minlength=7)
+
+        # Perfil da categoria: taxa média por unidade em cada (dia da semana, período)
+        profile = np.divide(counts.sum(axis=0), self.n_units * exposure[None, :, None],
+                            out=np.zeros(shape[1:]), where=exposure[None, :, None] > 0)
+        profile = self._smooth(profile)
+        # Intensidade de cada unidade em cada categoria relativa ao perfil, encolhida para 1
+        expected = (profile * exposure[None, :, None]).sum(axis=(1, 2))
+        unit_factor = (counts.sum(axis=(2, 3)) + self.unit_shrinkage) / (expected[None, :] + self.unit_shrinkage)
+        prior_rate = unit_factor[:, :, None, None] * profile[None]
+
+        # Posteriori Gamma(shape, rate): o rate depende só do dia da semana (exposição comum a todas as células)
+        self.shape_ = counts + self.prior_strength * prior_rate
+        self.rate_ = exposure + self.prior_strength
+        return self
+
+    def expected_share(self, axis, dates=None):
+        """Fração das ocorrências esperadas que cai em cada valor do eixo ('unit', 'category', 'weekday' ou 'period').
+
+        Sem dates, a fração é sobre uma semana inteira; com dates (eixos que não o dia da semana), é a de cada
+        data entre as ocorrências esperadas no dia da semana dela, com a data por último: [valor, data].
+        """
+        if self.shape_ is None:
+            raise ValueError("Modelo ainda não ajustado (chame fit antes)")
+        position = AXES.index(axis)
+        # Taxa média a posteriori de cada célula
+        expected = self.shape_ / self.rate_[None, None, :, None]
+        if dates is None:
+            totals = expected.sum(axis=tuple(i for i in range(len(AXES)) if i != position))
+            total = totals.sum()
+            return totals / total if total > 0 else np.full(totals.size, 1 / totals.size)
+        if axis == 'weekday':
+            raise ValueError("A fração por data não se aplica ao eixo do dia da semana")
+        weekday = AXES.index('weekday')
+        per_weekday = expected.sum(axis=tuple(i for i in range(len(AXES)) if i not in (position, weekday)))
+        if position > weekday:
+            per_weekday = per_weekday.T
+        totals = per_weekday[:, weekdays_of(dates)]
+        sums = totals.sum(axis=0)
+        return np.divide(totals, sums, out=np.full(totals.shape, 1 / totals.shape[0]), where=sums > 0)
+
+    def predict_proba(self, dates, keep=(), units=None, categories=None, periods=None):
+        """Probabilidade de ao menos uma ocorrência em cada data, nas células selecionadas.
+
+        units, categories e periods restringem as células (None = todas); os eixos listados em keep
+        ('unit', 'category', 'period') são mantidos no resultado, na ordem de AXES, e a data fica por último.
+        """
+        if self.shape_ is None:
+            raise ValueError("Modelo ainda não ajustado (chame fit antes)")
+        shape = self.shape_
+        for axis, selection in ((0, units), (1, categories), (3, periods)):
+            if selection is not None:
+                shape = np.take(shape, np.asarray(selection, dtype=np.int64), axis=axis)
+        summed = tuple(axis for axis, name in enumerate(AXES) if name != 'weekday' and name not in keep)
+        if summed:
+            shape = shape.sum(axis=summed)
+
+        # Soma de Gammas com o mesmo rate é Gamma com a soma dos shapes
+        weekdays = weekdays_of(dates)
+        shape = np.take(shape, weekdays, axis=shape.ndim - 2 if 'period' in keep else shape.ndim - 1)
+        if 'period' in keep:
+            # [..., data, período] -> [..., período, data]
+            shape = np.swapaxes(shape, -1, -2)
+        rate = self.rate_[weekdays]
+        if self.distribution == 'negbin':
+            return -np.expm1(shape * np.log(rate / (rate + 1)))
+        return -np.expm1(-shape / rate)
@@ -0,0 +1,455 @@
+# -*- coding: utf-8 -*-
+import re
+import math
+import heapq
+import unicodedata
+from bisect import bisect_left, bisect_right
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Classes de caracteres para casar termos normalizados no texto original (com acentos)
+_ACCENT_CLASSES = {
+    'a': '[aáàâãä]',
+    'e': '[eéèêë]',
+    'i': '[iíìîï]',
+    'o': '[oóòôõö]',
+    'u': '[uúùûü]',
+    'c': '[cç]',
+    'n': '[nñ]'
+}
+
+def normalize_text(text):
+    """Normaliza texto para busca (minúsculas e sem acentos)"""
+    if not text:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+def tokenize(text, normalize=True):
+    """Divide o texto em termos, normalizados por padrão"""
+    if not text:
+        return []
+    return _TOKEN_RE.findall(normalize_text(text) if normalize else text.lower())
+
+def accent_insensitive_pattern(terms):
+    """Compila um padrão que casa qualquer um dos termos com ou sem acentos"""
+    alternatives = []
+    for term in sorted({normalize_text(t) for t in terms if t}, key=len, reverse=True):
+        alternatives.append(''.join(_ACCENT_CLASSES.get(c, re.escape(c)) for c in term))
+    if not alternatives:
+        return None
+    return re.compile('|'.join(alternatives), re.IGNORECASE)
+
+def highlight_terms(text, terms):
+    """Destaca os termos no texto com <mark>, em uma única passada"""
+    pattern = accent_insensitive_pattern(terms)
+    if not pattern or not text:
+        return text
+    return pattern.sub(lambda m: f'<mark>{m.group(0)}</mark>', text)
+
+def edit_distance_budget(term):
+    """Número máximo de edições toleradas para um termo, conforme seu tamanho"""
+    if len(term) <= 4:
+        return 0
+    if len(term) <= 7:
+        return 1
+    return 2
+
+def bounded_edit_distance(a, b, max_distance):
+    """Distância de edição (com transposição) entre a e b, ou max_distance + 1 se exceder o limite"""
+    if a == b:
+        return 0
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    before_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if before_previous is not None and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, before_previous[j - 2] + 1)
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        # Nenhum caminho pode voltar abaixo do limite: abandonar cedo
+        if row_min > max_distance:
+            return max_distance + 1
+        before_previous, previous = previous, current
+    distance = previous[-1]
+    return distance if distance <= max_distance else max_distance + 1
+
+class TrigramIndex:
+    """Índice de trigramas sobre um vocabulário, para expansão de termos com erros de digitação"""
+
+    MIN_TERM_LENGTH = 3
+    EXPANSION_CACHE_SIZE = 4096
+
+    def __init__(self, words=()):
+        self.terms = []
+        self._term_ids = {}
+        self._surface_forms = []
+        self._postings = {}
+        self._expansion_cache = {}
+        self.add_terms(words)
+
+    @staticmethod
+    def trigrams(term):
+        """Trigramas do termo, com preenchimento para valorizar o início da palavra"""
+        padded = f"  {term} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    def add_terms(self, words):
+        """Adiciona palavras ao vocabulário (a forma original é guardada para consultas SQL)"""
+        for word in words:
+            surface = word.lower()
+            term = normalize_text(surface)
+            if len(term) < self.MIN_TERM_LENGTH:
+                continue
+            term_id = self._term_ids.get(term)
+            if term_id is not None:
+                self._surface_forms[term_id].add(surface)
+                continue
+            term_id = len(self.terms)
+            self.terms.append(term)
+            self._term_ids[term] = term_id
+            self._surface_forms.append({surface})
+            for gram in self.trigrams(term):
+                self._postings.setdefault(gram, []).append(term_id)
+        self._expansion_cache.clear()
+
+    def __contains__(self, word):
+        return normalize_text(word) in self._term_ids
+
+    def __len__(self):
+        return len(self.terms)
+
+    def surface_forms(self, term):
+        """Formas originais (com acentos) em que um termo normalizado aparece no corpus"""
+        term_id = self._term_ids.get(normalize_text(term))
+        return sorted(self._surface_forms[term_id]) if term_id is not None else []
+
+    def expand(self, word, max_distance=None, limit=5):
+        """Retorna [(termo, distância)] do vocabulário dentro do orçamento de edições, do mais próximo ao mais distante"""
+        term = normalize_text(word)
+        if max_distance is None:
+            max_distance = edit_distance_budget(term)
+
+        key = (term, max_distance, limit)
+        cached = self._expansion_cache.get(key)
+        if cached is not None:
+            return cached
+
+        if term in self._term_ids:
+            # Termo conhecido: não há o que corrigir
+            expansions = [(term, 0)]
+        elif max_distance <= 0 or len(term) < self.MIN_TERM_LENGTH:
+            expansions = []
+        else:
+            grams = self.trigrams(term)
+            # Cada edição altera no máximo 4 trigramas (transposição), o que limita os candidatos
+            min_shared = max(1, len(grams) - 4 * max_distance)
+            shared = {}
+            for gram in grams:
+                for term_id in self._postings.get(gram, ()):
+                    shared[term_id] = shared.get(term_id, 0) + 1
+
+            candidates = []
+            for term_id, count in shared.items():
+                if count < min_shared:
+                    continue
+                candidate = self.terms[term_id]
+                distance = bounded_edit_distance(term, candidate, max_distance)
+                if distance <= max_distance:
+                    candidates.append((distance, -count, candidate))
+            candidates.sort()
+            expansions = [(candidate, distance) for distance, _, candidate in candidates[:limit]]
+
+        if len(self._expansion_cache) >= self.EXPANSION_CACHE_SIZE:
+            self._expansion_cache.clear()
+        self._expansion_cache[key] = expansions
+        return expansions
+
+    def best_match(self, word, max_distance=None):
+        """Termo do vocabulário mais próximo da palavra, ou None"""
+        expansions = self.expand(word, max_distance, limit=1)
+        return expansions[0][0] if expansions else None
+
+class PrefixIndex:
+    """Índice de prefixos sobre um array ordenado (busca binária), para autocompletar.
+
+    Uma árvore de segmentos com a posição de maior peso de cada intervalo permite extrair, em ordem
+    de peso, as entradas de qualquer faixa de prefixo sem percorrê-la inteira.
+    """
+
+    def __init__(self, entries=()):
+        """entries: iterável de (texto, payload, peso); o mesmo payload pode aparecer sob vários textos"""
+        rows = []
+        for text, payload, weight in entries:
+            key = normalize_text(text).strip()
+            if key:
+                rows.append((key, weight, payload))
+        rows.sort(key=lambda row: row[0])
+        self._keys = [row[0] for row in rows]
+        self._weights = [row[1] for row in rows]
+        self._payloads = [row[2] for row in rows]
+
+        size = 1
+        while size < len(rows):
+            size *= 2
+        tree = [-1] * (2 * size)
+        tree[size:size + len(rows)] = range(len(rows))
+        for node in range(size - 1, 0, -1):
+            tree[node] = self._heavier(tree[2 * node], tree[2 * node + 1])
+        self._size = size
+        self._tree = tree
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _heavier(self, a, b):
+        """Das duas posições (-1 = nenhuma), a de maior peso"""
+        if a < 0:
+            return b
+        if b < 0 or self._weights[a] >= self._weights[b]:
+            return a
+        return b
+
+    def _argmax(self, start, end):
+        """Posição de maior peso em [start, end)"""
+        best = -1
+        start += self._size
+        end += self._size
+        while start < end:
+            if start & 1:
+                best = self._heavier(best, self._tree[start])
+                start += 1
+            if end & 1:
+                end -= 1
+                best = self._heavier(best, self._tree[end])
+            start >>= 1
+            end >>= 1
+        return best
+
+    def _by_weight(self, start, end):
+        """Posições de [start, end) em ordem decrescente de peso, geradas sob demanda"""
+        heap = []
+
+        def push(lo, hi):
+            if lo < hi:
+                position = self._argmax(lo, hi)
+                heapq.heappush(heap, (-self._weights[position], position, lo, hi))
+
+        push(start, end)
+        while heap:
+            _, position, lo, hi = heapq.heappop(heap)
+            push(lo, position)
+            push(position + 1, hi)
+            yield position
+
+    def complete(self, prefix, limit=8, boost=None):
+        """Retorna até limit payloads cujo texto começa com o prefixo, ordenados por peso (+ reforço opcional por chave)"""
+        prefix = normalize_text(prefix).strip()
+        if not prefix:
+            return []
+        start = bisect_left(self._keys, prefix)
+        end = bisect_left(self._keys, prefix + '\uffff', lo=start)
+
+        # Chaves reforçadas (ex.: histórico do usuário) que casam o prefixo entram como candidatas já com o
+        # reforço; as demais vêm da faixa em ordem de peso, e as duas sequências são intercaladas
+        boosted = []
+        for key, extra in (boost or {}).items():
+            if extra and key.startswith(prefix):
+                lo = bisect_left(self._keys, key, start, end)
+                hi = bisect_right(self._keys, key, lo, end)
+                boosted.extend((self._weights[position] + extra, position) for position in range(lo, hi))
+        boosted.sort(key=lambda item: (-item[0], item[1]))
+        boosted_positions = {position for _, position in boosted}
+        ranked = (position for position in self._by_weight(start, end) if position not in boosted_positions)
+
+        results = []
+        seen = set()
+        candidate = next(ranked, None)
+        index = 0
+        while len(results) < limit and (candidate is not None or index < len(boosted)):
+            if index < len(boosted) and (candidate is None or boosted[index][0] >= self._weights[candidate]):
+                position = boosted[index][1]
+                index += 1
+            else:
+                position = candidate
+                candidate = next(ranked, None)
+            payload = self._payloads[position]
+            if id(payload) in seen:
+                continue
+            seen.add(id(payload))
+            results.append(payload)
+        return results
+
+class MultiPatternMatcher:
+    """Autômato de Aho-Corasick: encontra todos os padrões de um conjunto em uma única passada pelo texto"""
+
+    def __init__(self, patterns=()):
+        """patterns: iterável de (texto_do_padrão, valor); o texto é normalizado como o da busca"""
+        self._goto = [{}]
+        self._fail = [0]
+        self._outputs = [[]]
+        self._output_link = [None]
+        for pattern, value in patterns:
+            self._add(normalize_text(pattern).strip(), value)
+        self._build_links()
+
+    def _add(self, pattern, value):
+        if not pattern:
+            return
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+                self._output_link.append(None)
+                self._goto[state][char] = next_state
+            state = next_state
+        self._outputs[state].append(value)
+
+    def _build_links(self):
+        """Calcula as ligações de falha (busca em largura) e as ligações para o próximo estado com saída"""
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for char, child in self._goto[state].items():
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                link = self._fail[child]
+                self._output_link[child] = link if self._outputs[link] else self._output_link[link]
+                queue.append(child)
+
+    def find_all(self, text):
+        """Retorna o conjunto de valores dos padrões presentes no texto"""
+        found = set()
+        goto = self._goto
+        fail = self._fail
+        outputs = self._outputs
+        output_link = self._output_link
+        state = 0
+        for char in normalize_text(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            match_state = state if outputs[state] else output_link[state]
+            while match_state:
+                found.update(outputs[match_state])
+                match_state = output_link[match_state]
+        return found
+
+# Palavras muito frequentes que não ajudam a ranquear
+STOPWORDS = frozenset([
+    'a', 'o', 'as', 'os', 'e', 'de', 'da', 'do', 'das', 'dos', 'em', 'no', 'na', 'nos', 'nas',
+    'um', 'uma', 'ao', 'aos', 'para', 'por', 'com', 'que', 'se', 'ou'
+])
+
+def make_snippet(text, terms, width=200):
+    """Trecho do texto em torno da primeira ocorrência dos termos, com os termos destacados"""
+    if not text:
+        return ''
+    pattern = accent_insensitive_pattern(terms)
+    match = pattern.search(text) if pattern else None
+    if not match:
+        return text[:width] + ('...' if len(text) > width else '')
+    start = max(0, match.start() - width // 3)
+    end = min(len(text), start + width)
+    # Não cortar palavras ao meio
+    if start > 0:
+        space = text.find(' ', start, match.start())
+        start = space + 1 if space != -1 else start
+    if end < len(text):
+        space = text.rfind(' ', match.end(), end)
+        end = space if space != -1 else end
+    snippet = highlight_terms(text[start:end], terms)
+    return ('...' if start > 0 else '') + snippet + ('...' if end < len(text) else '')
+
+class RankedIndex:
+    """Índice invertido em memória com ranqueamento BM25 e expansão de termos com erros de digitação"""
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self):
+        self.payloads = []
+        self._lengths = []
+        self._postings = {}
+        self._vocabulary = None
+
+    def add(self, payload, fields):
+        """Indexa um documento; fields: iterável de (texto, peso)"""
+        doc_id = len(self.payloads)
+        frequencies = {}
+        length = 0
+        for text, weight in fields:
+            for term in tokenize(text):
+                if term in STOPWORDS:
+                    continue
+                frequencies[term] = frequencies.get(term, 0) + weight
+                length += 1
+        for term, frequency in frequencies.items():
+            self._postings.setdefault(term, []).append((doc_id, frequency))
+        self.payloads.append(payload)
+        self._lengths.append(length)
+        self._vocabulary = None
+        return doc_id
+
+    def __len__(self):
+        return len(self.payloads)
+
+    @property
+    def vocabulary(self):
+        """Índice de trigramas dos termos indexados, construído sob demanda"""
+        if self._vocabulary is None:
+            self._vocabulary = TrigramIndex(self._postings)
+        return self._vocabulary
+
+    def query_terms(self, query, fuzzy=True):
+        """Termos do índice que correspondem à consulta, com o peso de cada um (termos aproximados valem menos)"""
+        weights = {}
+        for word in tokenize(query):
+            if word in STOPWORDS:
+                continue
+            if word in self._postings:
+                expansions = [(word, 0)]
+            elif fuzzy:
+                expansions = self.vocabulary.expand(word, limit=3)
+            else:
+                expansions = []
+            for term, distance in expansions:
+                weight = 1.0 / (1 + distance)
+                if weight > weights.get(term, 0):
+                    weights[term] = weight
+        return weights
+
+    def search(self, query, limit=20, fuzzy=True):
+        """Retorna [(payload, pontuação)] ordenados pela pontuação BM25, e os termos usados na consulta"""
+        terms = self.query_terms(query, fuzzy)
+        if not terms or not self.payloads:
+            return [], terms
+
+        count = len(self.payloads)
+        average_length = (sum(self._lengths) / count) or 1
+        scores = {}
+        for term, weight in terms.items():
+            postings = self._postings[term]
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, frequency in postings:
+                norm = self.K1 * (1 - self.B + self.B * self._lengths[doc_id] / average_length)
+                scores[doc_id] = scores.get(doc_id, 0) + weight * idf * frequency * (self.K1 + 1) / (frequency + norm)
+
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return [(self.payloads[doc_id], score) for doc_id, score in best], terms
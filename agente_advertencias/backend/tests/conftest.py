@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import types
+from datetime import datetime
+
+# Os módulos do backend são importados pelo nome (como em app.py), a partir de agente_advertencias/backend
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import models  # noqa: F401
+except ImportError:
+    # O módulo de modelos do app principal (com Occurrence) não faz parte deste diretório: para os testes,
+    # uma tabela com as colunas que os módulos de IA e de leis consultam
+    from sqlalchemy import Column, Integer, String, Text, DateTime
+    from ai_warning_system import Base
+
+    class Occurrence(Base):
+        __tablename__ = 'occurrence'
+
+        id = Column(Integer, primary_key=True)
+        title = Column(String(100), nullable=False)
+        description = Column(Text, nullable=False)
+        unit_number = Column(String(20))
+        created_at = Column(DateTime, default=datetime.utcnow)
+
+    models = types.ModuleType('models')
+    models.Occurrence = Occurrence
+    sys.modules['models'] = models
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+import threading
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from ai_warning_system import (
+    PIPELINE_INTERVAL_SECONDS, AIPipelineWorker, AIWarningManager, AnalysisWatermark, Base, OccurrenceAggregate,
+    OccurrencePattern, OccurrencePrediction, PipelineRun, PreventiveAlert
+)
+from models import Occurrence
+
+
+def make_database(tmp_path, occurrences=60):
+    engine = create_engine(f"sqlite:///{tmp_path / 'ai.db'}", connect_args={'timeout': 30})
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    start = datetime(2026, 1, 5, 8)
+    session.bulk_insert_mappings(Occurrence, [
+        {'title': 'Barulho', 'description': 'Som alto', 'unit_number': str(100 + i % 3),
+         'created_at': start + timedelta(hours=7 * i)}
+        for i in range(occurrences)
+    ])
+    session.add(AnalysisWatermark(name='analyze_patterns', last_occurrence_id=0))
+    session.commit()
+    session.close()
+    return Session
+
+
+def aggregate_totals(session):
+    totals = {}
+    for aggregate in session.query(OccurrenceAggregate):
+        totals[aggregate.dimension] = totals.get(aggregate.dimension, 0) + aggregate.count
+    return totals
+
+
+def test_overlapping_analyses_count_each_occurrence_once(tmp_path):
+    Session = make_database(tmp_path)
+    first = AIWarningManager(Session(), str(tmp_path))
+    second = AIWarningManager(Session(), str(tmp_path))
+
+    # A primeira análise para no meio da contagem até a segunda terminar
+    paused = threading.Event()
+    resume = threading.Event()
+    categorize = first._categorize_occurrence_type
+
+    def categorize_after_second_run(title, description):
+        if not paused.is_set():
+            paused.set()
+            resume.wait(10)
+        return categorize(title, description)
+
+    first._categorize_occurrence_type = categorize_after_second_run
+    errors = []
+
+    def run_first():
+        try:
+            first.analyze_patterns()
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=run_first)
+    thread.start()
+    assert paused.wait(10)
+    second.analyze_patterns()
+    resume.set()
+    thread.join(30)
+
+    assert not errors
+    session = Session()
+    assert aggregate_totals(session) == {'weekday': 60, 'month': 60, 'hour': 60, 'unit': 60, 'type': 60}
+    assert session.query(AnalysisWatermark).one().last_occurrence_id == 60
+
+
+def test_incremental_analysis_adds_only_new_occurrences(tmp_path):
+    Session = make_database(tmp_path, occurrences=10)
+    session = Session()
+    manager = AIWarningManager(session, str(tmp_path))
+    manager.analyze_patterns()
+    session.add(Occurrence(title='Obra', description='Reforma', unit_number='101', created_at=datetime(2026, 3, 2, 9)))
+    session.commit()
+    manager.analyze_patterns()
+    assert aggregate_totals(session)['type'] == 11
+    manager.analyze_patterns(full=True)
+    assert aggregate_totals(session)['type'] == 11
+
+
+def test_concurrent_pipeline_claims_start_a_single_run(tmp_path):
+    Session = make_database(tmp_path, occurrences=10)
+    engine = Session.kw['bind']
+    workers = [AIPipelineWorker(lambda: engine, str(tmp_path)) for _ in range(2)]
+
+    # Os dois processos veem o pipeline como devido antes de qualquer um registrar a execução
+    triggers = [worker._due_trigger() for worker in workers]
+    assert triggers == ['agendado', 'agendado']
+    runs = [worker._get_manager()._claim_pipeline_run(trigger) for worker, trigger in zip(workers, triggers)]
+
+    assert sum(run is not None for run in runs) == 1
+    assert workers[1]._get_manager().run_pipeline('manual') is None
+    assert Session().query(PipelineRun).count() == 1
+
+
+def test_stale_pipeline_run_does_not_block_new_runs(tmp_path):
+    Session = make_database(tmp_path, occurrences=10)
+    session = Session()
+    session.add(PipelineRun(trigger='agendado', status='executando',
+                            started_at=datetime.utcnow() - timedelta(seconds=PIPELINE_INTERVAL_SECONDS + 60)))
+    session.commit()
+
+    run = AIWarningManager(Session(), str(tmp_path))._claim_pipeline_run('agendado')
+
+    assert run is not None
+    session.expire_all()
+    assert [r.status for r in session.query(PipelineRun).order_by(PipelineRun.id)] == ['falhou', 'executando']
+
+
+def heavy_history_forecast(tmp_path):
+    Session = make_database(tmp_path, occurrences=0)
+    session = Session()
+    # Um ano de histórico intenso, com o triplo de ocorrências às segundas-feiras, metade de barulho e metade
+    # de estacionamento, das 8h às 19h
+    start = datetime(2025, 1, 6)
+    rows = []
+    for day in range(364):
+        for i in range(30 if day % 7 == 0 else 10):
+            title, description = ('Barulho', 'Som alto') if i % 2 == 0 else ('Vaga ocupada', 'Carro na vaga')
+            rows.append({'title': title, 'description': description, 'unit_number': str(100 + i),
+                         'created_at': start + timedelta(days=day, hours=8 + i % 12)})
+    session.bulk_insert_mappings(Occurrence, rows)
+    session.commit()
+    manager = AIWarningManager(session, str(tmp_path))
+    today = date(2026, 1, 5)
+    return manager, today, manager._occurrence_forecast(today)
+
+
+def predicted(manager, pattern, today, forecast):
+    return [row['probability'] for row in manager._prediction_rows([pattern], today=today, forecast=forecast)]
+
+
+def test_weekday_and_month_forecasts_do_not_saturate(tmp_path):
+    manager, today, forecast = heavy_history_forecast(tmp_path)
+
+    weekday = predicted(manager, OccurrencePattern(id=1, pattern_type='sazonal', dimension='weekday', weekday=0,
+                                                   confidence=0.33), today, forecast)
+    month = predicted(manager, OccurrencePattern(id=2, pattern_type='sazonal', dimension='month', month=3,
+                                                 confidence=0.12), today, forecast)
+
+    # A chance de ao menos uma ocorrência no condomínio seria ~1: a previsão é a fração das segundas
+    assert 0.25 < weekday[0] < 0.4
+    assert weekday == sorted(weekday, reverse=True)
+    assert month == [0.12]
+
+
+def test_hour_type_and_unit_forecasts_are_shares(tmp_path):
+    manager, today, forecast = heavy_history_forecast(tmp_path)
+
+    morning = predicted(manager, OccurrencePattern(id=1, pattern_type='sazonal', dimension='hour', hour_start=6,
+                                                   hour_end=12, confidence=0.4), today, forecast)
+    noise = predicted(manager, OccurrencePattern(id=2, pattern_type='tipo', dimension='type',
+                                                 occurrence_type='barulho', confidence=0.5), today, forecast)
+    unit = predicted(manager, OccurrencePattern(id=3, pattern_type='localização', dimension='unit', unit='100',
+                                                confidence=0.08), today, forecast)
+
+    # Frações (período, categoria, unidade) do modelo, não a chance de ao menos uma ocorrência no condomínio
+    assert all(0.2 < probability < 0.6 for probability in morning)
+    assert all(0.3 < probability < 0.6 for probability in noise)
+    assert all(0.01 < probability < 0.15 for probability in unit)
+    # Amanhã é terça: a unidade 100 é uma de 10 (às segundas, uma de 30)
+    assert unit[0] > unit[6]
+
+
+def test_concurrent_alert_generation_does_not_duplicate_alerts(tmp_path):
+    Session = make_database(tmp_path, occurrences=0)
+    session = Session()
+    pattern = OccurrencePattern(pattern_type='sazonal', dimension='weekday', dimension_value='0', weekday=0,
+                                description='Segundas', confidence=0.9)
+    session.add(pattern)
+    session.flush()
+    session.add_all([OccurrencePrediction(pattern_id=pattern.id, prediction_type='tipo', occurrence_type='barulho',
+                                          probability=0.9, status='ativa') for _ in range(3)])
+    session.commit()
+    first = AIWarningManager(Session(), str(tmp_path))
+    second = AIWarningManager(Session(), str(tmp_path))
+
+    # A segunda execução já consultou as previsões quando a primeira grava os alertas
+    alert_text = second._alert_text
+    generated = []
+
+    def alert_text_after_first_run(prediction):
+        if not generated:
+            generated.extend(first.generate_preventive_alerts(prediction_id=1))
+        return alert_text(prediction)
+
+    second._alert_text = alert_text_after_first_run
+    alerts = second.generate_preventive_alerts()
+
+    assert [alert['prediction_id'] for alert in generated] == [1]
+    assert sorted(alert['prediction_id'] for alert in alerts) == [2, 3]
+    rows = Session().query(PreventiveAlert.prediction_id, PreventiveAlert.id).order_by(PreventiveAlert.prediction_id).all()
+    assert [prediction for prediction, _ in rows] == [1, 2, 3]
+    assert {alert['id'] for alert in alerts + generated} == {alert_id for _, alert_id in rows}
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+from collections import Counter
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from document_consult import DocumentConsultManager, DocumentSearch, SearchHistoryBuffer, extract_article_citations
+
+
+class FailingEngine:
+    """Engine cuja transação falha; antes de falhar, chegam novas pesquisas na fila"""
+
+    def __init__(self, buffer, arriving):
+        self.buffer = buffer
+        self.arriving = arriving
+
+    def begin(self):
+        for term in self.arriving:
+            self.buffer.add(1, term)
+        raise RuntimeError("banco indisponível")
+
+
+def test_failed_flush_with_full_buffer_drops_oldest_events():
+    buffer = SearchHistoryBuffer(None, max_pending=5)
+    for i in range(5):
+        buffer.add(1, f"antiga {i}")
+    buffer._engine_getter = lambda: FailingEngine(buffer, ['nova 0', 'nova 1'])
+
+    assert buffer.flush() == 0
+
+    terms = [event['search_term'] for event in buffer.pending_for_user(1)]
+    # O lote devolvido vai à frente; o excedente sai pelo lado mais antigo, preservando as novas
+    assert terms == ['antiga 2', 'antiga 3', 'antiga 4', 'nova 0', 'nova 1']
+    assert buffer.dropped == 2
+
+
+def test_add_beyond_max_pending_counts_dropped_events():
+    buffer = SearchHistoryBuffer(None, max_pending=3)
+    for i in range(5):
+        buffer.add(1, str(i))
+    assert [event['search_term'] for event in buffer.pending_for_user(1)] == ['2', '3', '4']
+    assert buffer.dropped == 2
+
+
+def test_history_lists_event_committed_but_still_in_flight_once():
+    engine = create_engine('sqlite://')
+    with engine.begin() as connection:
+        # A chave estrangeira para user.id não é necessária aqui: tabela criada só com as colunas
+        connection.execute(text("CREATE TABLE document_search (id INTEGER PRIMARY KEY, user_id INTEGER, "
+                                "search_term VARCHAR(255) NOT NULL, document_type VARCHAR(50), created_at DATETIME)"))
+    buffer = SearchHistoryBuffer(lambda: engine)
+    buffer.add(1, 'barulho')
+    buffer.add(1, 'garagem')
+    # O gravador já gravou o lote mas ainda não o tirou da lista em gravação
+    batch = buffer.pending_for_user(1)
+    with engine.begin() as connection:
+        connection.execute(DocumentSearch.__table__.insert(), batch)
+    buffer._pending.clear()
+    buffer._in_flight = batch
+    manager = DocumentConsultManager({'PROCESSED_DOCS_FOLDER': ''}, history_buffer=buffer)
+
+    history = manager.get_search_history(sessionmaker(bind=engine)(), 1)
+
+    assert [h.search_term for h in history] == ['garagem', 'barulho']
+
+
+def test_cached_user_terms_are_not_changed_while_iterated():
+    manager = DocumentConsultManager({'PROCESSED_DOCS_FOLDER': ''}, history_buffer=SearchHistoryBuffer(None))
+    manager._user_terms_cache[1] = Counter({'barulho': 2, 'garagem': 1})
+
+    terms = manager._get_user_search_terms(None, 1)
+    iterator = iter(terms.items())
+    next(iterator)
+    # Pesquisa concorrente do mesmo usuário com um termo novo
+    manager.save_search_history(None, 1, 'piscina')
+
+    assert list(iterator) == [('garagem', 1)]
+    assert manager._get_user_search_terms(None, 1)['piscina'] == 1
+
+
+def test_citation_qualifier_far_after_article_is_external():
+    text = "Aplica-se o disposto no art. 1.336, § 2º, incisos I e II, e no parágrafo único do Código Civil."
+    assert extract_article_citations(text, 'regimento_interno') == []
+
+
+def test_unrelated_law_in_next_clause_keeps_citation_internal():
+    text = "Conforme o art. 12, o infrator pagará multa na forma da lei."
+    assert extract_article_citations(text, 'regimento_interno') == [('regimento_interno', '12')]
+
+
+def test_citation_qualifiers_in_same_clause():
+    assert extract_article_citations("Ver arts. 3º e 4º da Convenção.", 'regimento_interno') == [
+        ('convencao_condominial', '3'), ('convencao_condominial', '4')]
+    assert extract_article_citations("Nos termos do art. 9º da Lei nº 4.591/64.", 'regimento_interno') == []
+    assert extract_article_citations("Observe o art. 5º; a lei municipal também se aplica.", 'convencao_condominial') == [
+        ('convencao_condominial', '5')]
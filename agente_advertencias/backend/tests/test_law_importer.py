@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from law_importer import LawImporter, parse_law_number
+from law_integration import Base, Law, LawArticle, RegulationLawMapping
+
+
+def test_parse_law_number_from_header():
+    assert parse_law_number("LEI Nº 10.406, DE 10 DE JANEIRO DE 2002") == "Lei nº 10.406/2002"
+    assert parse_law_number("LEI MUNICIPAL Nº 1234/2020") == "Lei Municipal nº 1234/2020"
+    assert parse_law_number("DECRETO-LEI Nº 3.688, DE 3 DE OUTUBRO DE 1941") == "Decreto-Lei nº 3.688/1941"
+    assert parse_law_number("Institui o Código Civil") is None
+
+
+def write_statute(path, articles):
+    path.write_text("LEI Nº 4.591, DE 16 DE DEZEMBRO DE 1964\nDispõe sobre o condomínio.\n"
+                    + ''.join(f"Art. {number}º {text}\n" for number, text in articles), encoding='utf-8')
+
+
+def test_reimport_updates_number_and_deletes_removed_articles(tmp_path):
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    path = tmp_path / 'lei_4591.txt'
+
+    write_statute(path, [(1, "Primeiro."), (2, "Segundo."), (3, "Terceiro.")])
+    LawImporter(session, batch_size=2).import_paths([str(path)])
+    law = session.query(Law).one()
+    assert law.number == "Lei nº 4.591/1964"
+    removed = session.query(LawArticle).filter_by(article_number='Art. 3º').one()
+    session.add(RegulationLawMapping(document_type='regimento_interno', article_reference='Art. 5',
+                                     law_article_id=removed.id))
+    session.commit()
+
+    write_statute(path, [(1, "Primeiro."), (2, "Segundo, alterado.")])
+    stats = LawImporter(session, batch_size=2).import_paths([str(path)])
+
+    assert stats['laws_updated'] == 1 and stats['articles_deleted'] == 1 and stats['articles_updated'] == 1
+    assert [a.article_number for a in session.query(LawArticle).order_by(LawArticle.id)] == ['Art. 1º', 'Art. 2º']
+    assert session.query(RegulationLawMapping).count() == 0
+    assert session.query(Law).one().full_text.endswith("Art. 2º Segundo, alterado.")
+
+
+def test_failed_file_is_not_counted_in_stats(tmp_path, monkeypatch):
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    write_statute(tmp_path / 'a_falha.txt', [(1, "Primeiro."), (2, "Segundo.")])
+    (tmp_path / 'b_ok.txt').write_text("LEI Nº 8.245, DE 18 DE OUTUBRO DE 1991\nDispõe sobre as locações.\n"
+                                      "Art. 1º Primeiro.\n", encoding='utf-8')
+    commit = session.commit
+    calls = []
+
+    def commit_failing_first():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("banco indisponível")
+        commit()
+
+    monkeypatch.setattr(session, 'commit', commit_failing_first)
+    stats = LawImporter(session).import_paths([str(tmp_path)])
+
+    assert (stats['files'], stats['laws_created'], stats['articles_inserted']) == (1, 1, 1)
+    assert session.query(LawArticle).count() == 1
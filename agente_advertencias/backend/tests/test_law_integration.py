@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from law_integration import Base, LawIntegrationManager, OccurrenceRelevanceWorker, populate_sample_laws
+
+
+def make_manager(tmp_path):
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    populate_sample_laws(session)
+    return LawIntegrationManager(session, str(tmp_path))
+
+
+def test_stored_references_distinguish_not_computed_from_no_relevant_laws(tmp_path):
+    manager = make_manager(tmp_path)
+    assert manager.get_stored_law_references(1) is None
+
+    manager.store_occurrence_relevance([(1, "Lâmpada queimada", "Troca pendente no hall"),
+                                        (2, "Barulho", "Som alto e festa de madrugada")])
+    assert manager.get_stored_law_references(1) == []
+    references = manager.get_stored_law_references(2)
+    assert references and all(reference['relevance_score'] > 0 for reference in references)
+
+    manager.delete_occurrence_relevance([1, 2])
+    assert manager.get_stored_law_references(1) is None
+    assert manager.get_stored_law_references(2) is None
+
+
+def test_worker_loads_occurrence_model_only_when_running(tmp_path):
+    loaded = []
+    worker = OccurrenceRelevanceWorker(lambda: None, lambda: loaded.append(True) or object, str(tmp_path))
+    assert loaded == []
+    worker._attach()
+    worker._attach()
+    assert loaded == [True]
+
+
+def test_fallback_references_match_stored_references(tmp_path):
+    manager = make_manager(tmp_path)
+    occurrence = SimpleNamespace(id=2, title="Barulho", description="Som alto e festa de madrugada")
+
+    computed = manager.get_law_references_for_occurrence(occurrence)
+    manager.store_occurrence_relevance([(occurrence.id, occurrence.title, occurrence.description)])
+
+    assert computed and computed == manager.get_stored_law_references(occurrence.id)
+
+
+def test_worker_stop_closes_its_session(tmp_path):
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    worker = OccurrenceRelevanceWorker(lambda: engine, lambda: object, str(tmp_path))
+    session = worker._get_manager().db_session
+    session.connection()
+
+    worker.stop()
+
+    assert worker._manager is None
+    assert not session.in_transaction()
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+import unicodedata
+
+import legal_citations
+from legal_citations import parse_legal_citations, parse_legal_citations_bulk
+
+
+def citation_keys(text):
+    return [(c['law_key'], c['article'], c['paragraph'], c['inciso']) for c in parse_legal_citations(text)]
+
+
+def test_paragraph_after_article():
+    assert citation_keys("art. 1.336, § 2º, do Código Civil") == [('10406/2002', '1336', '2', None)]
+
+
+def test_paragraph_before_article():
+    text = "Aplica-se a multa do § 2º do art. 1.336 do Código Civil."
+    citations = parse_legal_citations(text)
+    assert [(c['law_key'], c['article'], c['paragraph'], c['inciso']) for c in citations] == [
+        ('10406/2002', '1336', '2', None)]
+    assert text[citations[0]['start']:citations[0]['end']] == "§ 2º do art. 1.336 do Código Civil"
+
+
+def test_paragrafo_unico_and_inciso_before_article():
+    assert citation_keys("conforme o parágrafo único do art. 9º da Lei nº 4.591/64") == [
+        ('4591/1964', '9', 'unico', None)]
+    assert citation_keys("nos termos do inciso IV do § 1º do art. 1.336 do Código Civil") == [
+        ('10406/2002', '1336', '1', 'IV')]
+
+
+def test_law_without_article():
+    assert citation_keys("Lei do Inquilinato") == [('8245/1991', None, None, None)]
+
+
+def test_decomposed_accents_keep_inciso_and_positions():
+    text = unicodedata.normalize('NFD', "Conforme o art. 1.336, IV, do Código Civil.")
+    citations = parse_legal_citations(text)
+    assert [(c['law_key'], c['article'], c['paragraph'], c['inciso']) for c in citations] == [
+        ('10406/2002', '1336', None, 'IV')]
+    assert text[citations[0]['start']:citations[0]['end']] == unicodedata.normalize(
+        'NFD', "art. 1.336, IV, do Código Civil")
+
+
+def test_bulk_parsing_is_sequential_unless_enabled(monkeypatch):
+    def no_processes(*args, **kwargs):
+        raise AssertionError("pool de processos criado sem parallel_threshold")
+
+    monkeypatch.setattr(legal_citations, 'ProcessPoolExecutor', no_processes)
+    texts = ["art. 1.336, IV, do Código Civil"] * 600
+    assert parse_legal_citations_bulk(texts) == [parse_legal_citations(texts[0])] * 600
+
+
+def test_bulk_parsing_in_spawned_processes_matches_sequential():
+    texts = ["art. 1.336, § 2º, do Código Civil", "Lei nº 4.591/64, art. 9º", "sem citações", "Lei do Inquilinato"]
+    assert parse_legal_citations_bulk(texts, workers=2, parallel_threshold=2, chunk_size=2) == [
+        parse_legal_citations(text) for text in texts]
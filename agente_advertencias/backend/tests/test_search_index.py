@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+import random
+
+from search_index import PrefixIndex
+
+
+def brute_force(entries, prefix, limit, boost):
+    """Referência: ordena todas as entradas que casam o prefixo pelo peso com reforço"""
+    matching = [(weight + boost.get(text, 0), text) for text, _, weight in entries if text.startswith(prefix)]
+    return [text for _, text in sorted(matching, key=lambda item: -item[0])][:limit]
+
+
+def test_short_prefix_brings_up_boosted_history_term_outside_corpus_top():
+    entries = [(f"ba{i:03d}", {'text': f"ba{i:03d}"}, 100 + i) for i in range(100)]
+    entries.append(("barulho", {'text': "barulho"}, 1))
+    index = PrefixIndex(entries)
+
+    assert "barulho" not in [r['text'] for r in index.complete("ba", limit=8)]
+    results = index.complete("ba", limit=8, boost={'barulho': 1000})
+    assert results[0]['text'] == "barulho"
+
+
+def test_long_prefix_ranks_whole_range_not_first_entries_alphabetically():
+    entries = [(f"condominio{i:05d}", {'text': f"c{i}"}, 1) for i in range(5000)]
+    entries.append(("condominioz", {'text': "mais pesado"}, 50))
+    index = PrefixIndex(entries)
+
+    assert index.complete("condominio", limit=1)[0]['text'] == "mais pesado"
+
+
+def test_complete_matches_brute_force_ranking():
+    rng = random.Random(7)
+    texts = sorted({''.join(rng.choice('abc') for _ in range(rng.randint(1, 6))) for _ in range(400)})
+    entries = [(text, {'text': text}, rng.randint(1, 50)) for text in texts]
+    index = PrefixIndex(entries)
+    boost = {text: rng.randint(1, 40) for text in rng.sample(texts, 30)}
+
+    for prefix in ['a', 'b', 'ab', 'ca', 'abc', 'bba']:
+        for limit in (1, 5, 20):
+            expected = brute_force(entries, prefix, limit, boost)
+            got = [r['text'] for r in index.complete(prefix, limit, boost)]
+            # Empates de peso podem sair em qualquer ordem: comparar os pesos
+            score = {text: weight + boost.get(text, 0) for text, _, weight in entries}
+            assert [score[t] for t in got] == [score[t] for t in expected]
+            assert all(t.startswith(prefix) for t in got)
+
+
+def test_same_payload_under_several_keys_is_returned_once():
+    law = {'text': "Lei do Silêncio"}
+    index = PrefixIndex([("lei do silencio", law, 1), ("silencio", law, 1), ("silvicultura", {'text': "x"}, 1)])
+    assert index.complete("si", limit=5) == [law, {'text': "x"}]